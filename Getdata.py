@@ -41,17 +41,50 @@
 # 25Feb2014*rlc
 #   - Bug fix for forceQuote option when the quote feature isn't being used
 
+# 17Oct2026*nt
+#   - Download accounts through ofx.getOFXList(), which can run several downloads at once
+#   - Use the shared site_cfg object.  Show the number of sites.dat parses in DEBUG mode
+#   - Account settings are read from the account store (acctstore.py).  Only the accounts being
+#     downloaded are decrypted.
+#   - Accounts can be selected on the command line, by site name, and by account type (CHECKING,
+#     SAVINGS, MONEYMRKT, CREDITLINE, CREDITCARD, INVESTMENT) or statement type (BASTMT, CCSTMT,
+#     INVSTMT).  Given both, an account must match a site and a type.  Example: Getdata.py CHASE SAVINGS
+#   - Save the time spent in each download phase (per account), the quotes and combineOfx to
+#     timing.json and timing.prom once the files are ready, before they're sent to Money (see timing.py)
+#   - Statement dates for IncrementalDownloads, and FITIDs for FitidFilter, are saved after the files
+#     are sent to Money (ofx.imported)
+#   - Added --profile[=<acct>] (or PS_PROFILE in the environment): run under cProfile, without
+#     stopping for input, and save getdata.prof plus a summary (see profiler.py)
+
 import os, sys, glob, time
-import ofx, quotes, site_cfg
+import ofx, quotes, site_cfg, acctstore, timing, profiler
 from control2 import *
 from rlib1 import *
 
+#account selectors for statement types (the sites that support them)
+StmtTypes = {'BASTMT': 'BASTMT', 'CCSTMT': 'CCSTMT', 'INVSTMT': 'INVSTMT',
+             'CREDITCARD': 'CCSTMT', 'INVESTMENT': 'INVSTMT'}
+
+def saveTimings():
+    #write timing.json and timing.prom for this run
+    summary = timing.run.save()
+    if Debug: print "Timings saved to", timingJsonFile, "and", timingPromFile, "(%.1f secs)" % summary['seconds']
+
 if __name__=="__main__":
 
     stat1 = True    #overall status flag across all operations (true == no errors getting data)
     print AboutTitle + ", Ver: " + AboutVersion + "\n"
     
     if Debug: print "***Running in DEBUG mode.  See Control2.py to disable***\n"
+    
+    #profile the run?  (--profile or --profile=<acct>, see profiler.py)
+    profScope, args = profiler.parseArgs(sys.argv[1:])
+    prof = None
+    if profScope is not None:
+        prof = profiler.RunProfile(getdataProfFile, profScope)
+        print "***Profiling" + (profScope and " " + profScope or "") + ".  Results are saved to", getdataProfFile, "***\n"
+        prof.start()
+    
     #always doit
     doit = 'Y'
     #doit = raw_input("Download transactions? (Y/N/I=Interactive) [Y] ").upper()
@@ -59,27 +92,55 @@ if __name__=="__main__":
     if doit == '': doit = 'Y'
     if doit in "YI":
 
-        userdat = site_cfg.site_cfg()
+        userdat = site_cfg.shared_cfg()
         
         #get download interval, if promptInterval=Yes in sites.dat
         interval = userdat.defaultInterval
-        if userdat.promptInterval:
+        if userdat.promptInterval and not prof:
             try:
                 p = int2(raw_input("Download interval (days) [" + str(interval) + "]: "))
                 if p>0: interval = p
             except:
                 print "Invalid entry. Using defaultInterval=" + str(interval)
         
+        #select accounts by site, and by account type or statement type (default = all accounts).
+        #sites and types are each OR-ed, and an account must match both: CHASE SAVINGS = Chase savings accounts
+        sites, types, typeSites = None, None, None      #None = no filter
+        unknown = []
+        for arg in args:
+            arg = arg.upper()
+            if arg in userdat.sites:
+                sites = (sites or []) + [arg]
+            elif arg in StmtTypes:
+                types = types or []
+                typeSites = (typeSites or []) + [s for s in userdat.sites if StmtTypes[arg] in FieldVal(userdat.sites[s], 'CAPS')]
+            elif arg in BankTypes:
+                types = (types or []) + [arg]
+                typeSites = typeSites or []
+            else:
+                unknown.append(arg)
+        if unknown:
+            print "** Unknown site or account type:", ' '.join(unknown)
+            print "   Account types:", ', '.join(BankTypes + sorted(StmtTypes))
+            if not prof: raw_input("Press <Enter> to continue...")
+            sys.exit(1)
+        selected = sites is not None or types is not None
+        
         #get account info
         #AcctArray = [['SiteName', 'Account#', 'AcctType', 'UserName', 'PassWord'], ...]
-        pwkey, getquotes, AcctArray = get_cfg()
+        store = acctstore.openStore()
+        pwkey, getquotes = store.pwkey, store.getquotes
         ofxList = []
         quoteFile1, quoteFile2, htmFileName = '','',''
 
-        if len(AcctArray) > 0 and pwkey <> '':
-            #if accounts are encrypted... decrypt them
+        if store.count() > 0 and pwkey <> '':
+            #if accounts are encrypted... only the selected accounts are decrypted
             pwkey=decrypt_pw(pwkey)
-            AcctArray = acctDecrypt(AcctArray, pwkey)
+            store.unlock(pwkey)
+        AcctArray = store.accounts(sites, types, typeSites)
+        store.close()
+        if selected and not AcctArray:
+            print "No accounts match", ' '.join(args)
     
         #delete old data files
         ofxfiles = xfrdir+'*.ofx'
@@ -101,17 +162,16 @@ if __name__=="__main__":
         for QEntry in Queue:
 
             if QEntry == 'Accts':
-               if len(AcctArray) == 0:
+               if len(AcctArray) == 0 and not selected:
                   print "No accounts have been configured. Run SETUP.PY to add accounts"
 
-               #process accounts
-               for acct in AcctArray:
-                  status, ofxFile = ofx.getOFX(acct, interval)
+               #process accounts (downloads may run in parallel, but results come back in AcctArray order)
+               results = ofx.getOFXList(AcctArray, interval)
+               for acct, (status, ofxFile) in zip(AcctArray, results):
                   #status == False if ofxFile doesn't exist
                   stat1 = stat1 and status
                   if status: 
                      ofxList.append([acct[0], acct[1], ofxFile])
-                  print ""
                         
             #get stock/fund quotes
             if QEntry == 'Quotes' and getquotes:
@@ -131,21 +191,26 @@ if __name__=="__main__":
             gogo = 'Y'
             if userdat.combineofx and gogo <> 'V':
                 cfile=combineOfx(ofxList)       #create combined file
+            saveTimings()
 
-            if doit == 'I' or Debug:
+            if (doit == 'I' or Debug) and not prof:
                 gogo = raw_input('Upload online data to Money? (Y/N/V=Verify) [Y] ').upper()
                 if len(gogo) > 1: gogo = gogo[:1]    #keep first letter
                 if gogo == '': gogo = 'Y'
 
-            if gogo in 'YV':
+            if prof:
+                print "Profiling: the statements are left in", xfrdir, "(not sent to Money)"
+            elif gogo in 'YV':
                 if glob.glob(quoteFile2) <> []: 
                     if Debug: print "Importing ForceQuotes statement: " + quoteFile2
                     runFile(quoteFile2)  #force transactions for MoneyUK
                     raw_input('ForceQuote statement loaded.  Accept in Money and press <Enter> to continue.')
 
                 print '\nSending statement(s) to Money...'
+                sent = []       #statement files sent to Money
                 if userdat.combineofx and cfile and gogo <> 'V':
                     runFile(cfile)
+                    sent = [file[2] for file in ofxList]
                 else:
                     for file in ofxList:
                         upload = True
@@ -156,21 +221,28 @@ if __name__=="__main__":
                         if upload: 
                            if Debug: print "Importing " + file[2]
                            runFile(file[2])
+                           sent.append(file[2])
                         
                         time.sleep(0.5)   #slight delay, to force load order in Money
+                
+                #save the statement dates and FITIDs for the next run, for what was imported
+                ofx.imported(sent)
 
             #ask to show quotes.htm if defined in sites.dat
-            if userdat.askquotehtm:
+            if userdat.askquotehtm and not prof:
                 ask = raw_input('Open <Quotes.htm> in the default browser (y/n)?').upper()
                 if ask=='Y': os.startfile(htmFileName)  #don't wait for browser close
                     
         else:
+            saveTimings()
             if len(AcctArray)>0 or (getquotes and len(userdat.stocks)>0):
                 print "\nNo files were downloaded. Verify network connection and try again later."
-            raw_input("Press <Enter> to continue...")
+            if not prof: raw_input("Press <Enter> to continue...")
         
+        if prof: prof.stop()
         if Debug:
-            raw_input("DEBUG END:  Press <Enter> to continue...")
+            print "sites.dat parsed", site_cfg.parseCount, "time(s)"
+            if not prof: raw_input("DEBUG END:  Press <Enter> to continue...")
         elif not stat1:
             print "\nOne or more accounts (or quotes) may not have downloaded correctly."
-            raw_input("Review and press <Enter> to continue...")
+            if not prof: raw_input("Review and press <Enter> to continue...")
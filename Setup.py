@@ -15,9 +15,16 @@
 # 19Sep2013*rlc
 #   - Single line change to menu text
 
+# 17Oct2026*nt
+#   - Use the shared site_cfg object
+#   - Account settings are kept in the account store (acctstore.py).  Each change is saved when
+#     it's made (one account at a time), rather than rewriting the file on exit.
+#   - Added "Setup.py [--profile[=<acct>]] test <acct> ...": test accounts without the menu or any
+#     prompts, optionally under cProfile (see profiler.py)
+
 import os, sys, glob, pickle, shutil, time
 
-import pyDes, ofx, quotes, site_cfg, filecmp, rlib1
+import pyDes, ofx, quotes, site_cfg, filecmp, rlib1, acctstore, profiler, latency
 from control2 import *   #common control/utilities
 
 if Debug:
@@ -25,9 +32,9 @@ if Debug:
 
 #global vars
 #-----------
-BankTypes = ['CHECKING', 'SAVINGS', 'MONEYMRKT', 'CREDITLINE']
 AcctArray = []
 Sites = []
+store = None        #acctstore.AcctStore
 
 # each account stored as:  acct = [sitename, account, acctype, username, password]
 
@@ -109,7 +116,7 @@ def config_account():
         else:
             print "Adding", account, "for", sitename
         
-        acct = [sitename, account, acctype, username, password]
+        acct = store.put([sitename, account, acctype, username, password])
         AcctArray.append(acct)
         
         #test the new account?
@@ -117,16 +124,37 @@ def config_account():
         if test=='Y':
             test_acct(acct)
             
-def test_acct(acct):
+def test_acct(acct, interactive=True):
     status, ofxfile = ofx.getOFX(acct,31)
+    latency.save()
     if  status:
         print 'Download completed successfully\n\n'
+        if not interactive: return status
         test = raw_input('Send the results to Money (y/n)? ').upper()
         if test=='Y':
             rlib1.runFile(ofxfile)
             raw_input('Press Enter to continue...')
     else:
         print 'An online error occurred while testing the new account.'
+    return status
+
+def test_accounts(selectors, profScope=None):
+    #test the accounts matching a site name, account# or its last digits (all accounts if none given),
+    #without any prompts.  profScope = profile the tests (see profiler.parseArgs)
+    accts = [acct for acct in AcctArray if not selectors or [s for s in selectors if profiler.matches(acct, s)]]
+    if not accts:
+        print "No accounts match", ' '.join(selectors)
+        return False
+    prof = None
+    if profScope is not None:
+        prof = profiler.RunProfile(setupProfFile, profScope)
+        prof.start()
+    status = True
+    for acct in accts:
+        print 'Testing', acct[0], ':', acct[1]
+        status = test_acct(acct, False) and status
+    if prof: prof.stop()
+    return status
         
         
 def test_quotes(): 
@@ -163,7 +191,7 @@ if __name__=="__main__":
         if backup: shutil.copy('sites.dat', 'sites.bak')
             
     #get the user parameters
-    userdat = site_cfg.site_cfg()
+    userdat = site_cfg.shared_cfg()
     Sites = userdat.sites
 
     #build a Sitenames list one time
@@ -173,16 +201,27 @@ if __name__=="__main__":
 
     Sitenames.sort()
     
-    #do we already have a configuration file?  if so, read it in.
-    pwkey, c_getquotes, AcctArray = get_cfg()
+    #open the account store (an existing configuration file is moved into it)
+    store = acctstore.openStore()
+    pwkey, c_getquotes = store.pwkey, store.getquotes
     
     #is the file password protected?  If so, we need to get passkey and decrypt the account info
     if pwkey <> '':
         pwkey=decrypt_pw(pwkey)
-        acctDecrypt(AcctArray, pwkey)
+        store.unlock(pwkey)
+    AcctArray = store.accounts()
    
-    #**********main menu***********
+    #test accounts from the command line?  (Setup.py [--profile[=<acct>]] test <acct> ...)
     menu_option = 1
+    profScope, args = profiler.parseArgs(sys.argv[1:])
+    if args[:1] and args[0].lower() == 'test':
+        test_accounts(args[1:], profScope)
+        menu_option = 0     #skip the menu
+    elif profScope is not None:
+        print "Usage: Setup.py --profile[=<acct>] test <acct> ...   (profiles the account test, see profiler.py)"
+        menu_option = 0
+    
+    #**********main menu***********
     while menu_option <> 0:
 
         if pwkey == '':
@@ -206,7 +245,7 @@ if __name__=="__main__":
         print menu_6
         print "7. Test Account"
         print "8. About"
-        print "0. Save & Exit"
+        print "0. Exit"
         separator_line()
         menu_option=get_int('Selection: [0] ')
 
@@ -231,7 +270,7 @@ if __name__=="__main__":
                 print "Deleting account", AcctArray[acctnum][0], ":", AcctArray[acctnum][1]
                 doit = raw_input('Confirm delete (Y/N) ').upper()
                 if doit == 'Y':
-                    AcctArray.pop(acctnum)
+                    store.delete(AcctArray.pop(acctnum))
             
         elif menu_option == 4:
             #change security settings
@@ -241,6 +280,7 @@ if __name__=="__main__":
                 
                 if pwkey2 == pwkey1:
                     pwkey = pwkey1
+                    store.setPassword(pwkey)
                     break
                 else:
                     print '\nPasswords do not match.  Try again...\n'
@@ -251,10 +291,12 @@ if __name__=="__main__":
                 doit = raw_input('Remove file encryption and password protection (Y/N) ').upper()
                 if doit == 'Y':
                     pwkey=''
+                    store.setPassword(pwkey)
         
         elif menu_option == 6:
             #enable/disable stock quotes
             c_getquotes = not c_getquotes
+            store.setGetquotes(c_getquotes)
             if c_getquotes:
                 doit = (raw_input('Do you want to test Quote downloads? (Y/N)? ').upper() == 'Y')
                 if doit:
@@ -294,19 +336,4 @@ if __name__=="__main__":
             raw_input('Press Enter to continue')
             
     #end_while (master menu)
-    
-    pwkey_e = ''
-    if pwkey <> '':
-        #encrypt the data
-        k = pyDes.des(pwkey)
-        #encrypt the accounts
-        acctEncrypt(AcctArray,pwkey)
-        #encrypt the passkey
-        pwkey_e = k.encrypt(pwkey, ' ')
-  
-    #write the data
-    f = open(cfgFile, 'wb')
-    pickle.dump(pwkey_e, f)      #encrypted key (pw)
-    pickle.dump(c_getquotes, f)  #get stock quotes?
-    pickle.dump(AcctArray, f)    #account info
-    f.close()
\ No newline at end of file
+    store.close()
@@ -0,0 +1,184 @@
+# acctstore.py
+# http://sites.google.com/site/pocketsense/
+# account settings store (sqlite), replacing the pickled ofx_config.cfg file
+# Intial version: nt: Oct-2026
+
+# Notes
+# -----
+#   - One row per account.  The site name and account type are kept in the clear (as they were in
+#     ofx_config.cfg) and indexed, so accounts can be selected without decrypting the others.
+#     The account#, user name and password are encrypted with the master password, if one is set.
+#   - Only the accounts returned by accounts() are decrypted.
+#   - Adding, changing or deleting an account updates that row.  Only a master password change
+#     rewrites every account.
+#   - An existing ofx_config.cfg is copied into the store the first time it's opened (the fields
+#     are already encrypted the same way), and renamed to ofx_config.cfg.bak.  If the file has more than
+#     one entry for the same site and account#, the first is kept and the others are reported.
+#
+# Example:
+#   store = acctstore.openStore()
+#   if store.pwkey <> '': store.unlock(decrypt_pw(store.pwkey))
+#   for acct in store.accounts(sites=['VANGUARD']):
+#       print acct[0], acct[1]          #[sitename, account#, accttype, username, password]
+
+import os, glob, sqlite3, pyDes
+from control2 import *
+
+class Account(list):
+    """[sitename, account#, accttype, username, password], plus the row id in the store"""
+    id = None
+
+class AcctStore:
+    """Account settings, one row per account"""
+
+    def __init__(self, filename):
+        self.des = None         #des object for the master password (None = not encrypted, or locked)
+        self.db = sqlite3.connect(filename)
+        self.db.text_factory = str
+        self.db.execute("CREATE TABLE IF NOT EXISTS setting (name TEXT PRIMARY KEY, value BLOB)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS account ("
+                        "id INTEGER PRIMARY KEY, pos INTEGER, site TEXT, accttype TEXT, "
+                        "acct BLOB, user BLOB, password BLOB, UNIQUE (site, acct))")
+        self.db.execute("CREATE INDEX IF NOT EXISTS account_type ON account (accttype)")
+        self.db.commit()
+
+    def _get(self, name, default):
+        row = self.db.execute("SELECT value FROM setting WHERE name=?", (name,)).fetchone()
+        if row is None: return default
+        return str(row[0])
+
+    def _set(self, name, value):
+        self.db.execute("INSERT OR REPLACE INTO setting VALUES (?,?)", (name, sqlite3.Binary(value)))
+
+    @property
+    def pwkey(self):
+        #encrypted master password ('' = accounts aren't encrypted)
+        return self._get('pwkey', '')
+
+    @property
+    def getquotes(self):
+        return self._get('getquotes', '') == 'Y'
+
+    def setGetquotes(self, getquotes):
+        self._set('getquotes', getquotes and 'Y' or 'N')
+        self.db.commit()
+
+    def unlock(self, pwkey):
+        #pwkey = master password (already checked, see control2.decrypt_pw)
+        self.des = None
+        if pwkey <> '': self.des = pyDes.des(pwkey)
+
+    def _encrypt(self, value):
+        if self.des: value = self.des.encrypt(value, ' ')
+        return sqlite3.Binary(value)
+
+    def _decrypt(self, value):
+        value = str(value)
+        if self.des: value = self.des.decrypt(value, ' ')
+        return value
+
+    def _account(self, row):
+        id, site, accttype, acct, user, password = row
+        a = Account([site, self._decrypt(acct), accttype, self._decrypt(user), self._decrypt(password)])
+        a.id = id
+        return a
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM account").fetchone()[0]
+
+    def accounts(self, sites=None, types=None, typeSites=None):
+        #return the accounts (decrypted), in the order they were added.
+        #sites = site names to select.  types = account types (e.g., CHECKING) to select, and typeSites =
+        #sites whose accounts all count as a type match (e.g., the sites for a statement type).
+        #None = no filter (the default = all accounts).  An account must match both the site and the
+        #type filter, and an empty list matches nothing
+        sql = "SELECT id, site, accttype, acct, user, password FROM account"
+        args = []
+        where = []
+        if sites is not None:
+            if not sites: return []
+            where.append("site IN (" + ','.join('?'*len(sites)) + ")")
+            args += list(sites)
+        if types is not None or typeSites is not None:
+            either = []
+            if types:
+                either.append("accttype IN (" + ','.join('?'*len(types)) + ")")
+                args += list(types)
+            if typeSites:
+                either.append("site IN (" + ','.join('?'*len(typeSites)) + ")")
+                args += list(typeSites)
+            if not either: return []
+            where.append("(" + " OR ".join(either) + ")")
+        if where: sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY pos"
+        return [self._account(row) for row in self.db.execute(sql, args)]
+
+    def put(self, acct):
+        #add acct = [sitename, account#, accttype, username, password], or replace the existing entry
+        #for the same site and account#.  returns the stored Account (moved to the end of the list)
+        site, acctnum, accttype, user, password = acct[:5]
+        pos = self.db.execute("SELECT COALESCE(MAX(pos), 0) + 1 FROM account").fetchone()[0]
+        encAcct = self._encrypt(acctnum)
+        row = self.db.execute("SELECT id FROM account WHERE site=? AND acct=?", (site, encAcct)).fetchone()
+        if row:
+            id = row[0]
+            self.db.execute("UPDATE account SET pos=?, accttype=?, user=?, password=? WHERE id=?",
+                            (pos, accttype, self._encrypt(user), self._encrypt(password), id))
+        else:
+            id = self.db.execute("INSERT INTO account (pos, site, accttype, acct, user, password) VALUES (?,?,?,?,?,?)",
+                                 (pos, site, accttype, encAcct, self._encrypt(user), self._encrypt(password))).lastrowid
+        self.db.commit()
+        a = Account([site, acctnum, accttype, user, password])
+        a.id = id
+        return a
+
+    def delete(self, acct):
+        self.db.execute("DELETE FROM account WHERE id=?", (acct.id,))
+        self.db.commit()
+
+    def setPassword(self, pwkey):
+        #change the master password ('' = remove encryption).  every account is re-encrypted
+        accounts = self.accounts()
+        self.unlock(pwkey)
+        rows = [(self._encrypt(a[1]), self._encrypt(a[3]), self._encrypt(a[4]), a.id) for a in accounts]
+        self.db.execute("DELETE FROM setting WHERE name='pwkey'")
+        if pwkey <> '': self._set('pwkey', pyDes.des(pwkey).encrypt(pwkey, ' '))
+        self.db.executemany("UPDATE account SET acct=?, user=?, password=? WHERE id=?", rows)
+        self.db.commit()
+
+    def migrate(self, cfgfile):
+        #copy the settings and accounts from a pickled config file (see control2.get_cfg), as stored
+        pwkey, getquotes, AcctArray = get_cfg(cfgfile)
+        if pwkey <> '': self._set('pwkey', pwkey)
+        self._set('getquotes', getquotes and 'Y' or 'N')
+        for pos, acct in enumerate(AcctArray):
+            site, acctnum, accttype, user, password = acct
+            n = self.db.execute("INSERT OR IGNORE INTO account (pos, site, accttype, acct, user, password) VALUES (?,?,?,?,?,?)",
+                                (pos + 1, site, accttype, sqlite3.Binary(acctnum), sqlite3.Binary(user), sqlite3.Binary(password))).rowcount
+            if n == 0:
+                #same site and account# as an earlier entry (the store keeps one of each).  keep the first
+                if pwkey == '': acctnum = ' ' + acctnum
+                else: acctnum = ''      #encrypted
+                print "** Warning: entry", pos + 1, "in", cfgfile, "(" + site + acctnum + ", type " + (accttype or 'n/a') + \
+                      ") duplicates an earlier account, and was not copied.  It's kept in", cfgfile + '.bak'
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+def openStore(filename=acctStoreFile):
+    #open the account store.  the first time, the settings in cfgFile (if any) are moved into it
+    new = glob.glob(filename) == []
+    store = AcctStore(filename)
+    if new and glob.glob(cfgFile) <> []:
+        print "Moving account settings from", cfgFile, "to", filename
+        try:
+            store.migrate(cfgFile)
+        except:
+            store.close()
+            os.remove(filename)     #try again next time
+            raise
+        bak = cfgFile + '.bak'
+        if os.path.exists(bak): os.remove(bak)
+        os.rename(cfgFile, bak)
+    return store
@@ -0,0 +1,238 @@
+# asyncofx.py
+# http://sites.google.com/site/pocketsense/
+# non-blocking OFX transport.  Sends many OFX requests at once from a single thread.
+# Intial version: nt: Oct-2026
+
+# Notes
+# -----
+#   - Built on the asyncore event loop (the select() based loop in the Python 2 standard library)
+#   - Each request uses the same timeouts and error messages as OFXClient.doQuery(),
+#     and the same certificate checks as httplib.HTTPSConnection.  The connect timeout also covers
+#     sending the request.  Connect and response times are recorded the same way (see latency.py),
+#     and so are the phase timings (see timing.py)
+#   - Reply bodies are returned in memory, like OFXClient.doQuery().  OFXDownload.check() writes the file
+#   - Queries come from the normal OFXClient builders (baQuery, ccQuery, invstQuery, acctQuery)
+#   - Sites with "compress: Yes" ask for a gzip/deflate reply, same as doQuery().  The reply is kept
+#     compressed until the connection closes, then decoded (see httpzip.py)
+
+import asyncore, socket, ssl, time, httplib, urllib2, re, sys, cStringIO, httpzip, latency
+from control2 import *
+
+_contentLength = re.compile(r'^content-length:\s*(\d+)\s*$', re.IGNORECASE | re.MULTILINE)
+
+class _ReplySocket:
+    #stand-in socket, so that httplib.HTTPResponse can parse a reply that has already been read
+    def __init__(self, data):
+        self.data = data
+    def makefile(self, *args, **kwargs):
+        return cStringIO.StringIO(self.data)
+
+def urlHost(url):
+    #return (host, port, selector) for an https:// url
+    garbage, path = urllib2.splittype(url)
+    host, selector = urllib2.splithost(path)
+    hostname, port = urllib2.splitport(host)
+    return hostname, int(port or httplib.HTTPS_PORT), selector
+
+class OFXChannel(asyncore.dispatcher):
+    """One HTTPS POST of an OFX query.  The reply body is kept in self.body, same as OFXClient.doQuery()"""
+
+    def __init__(self, client, query, map):
+        asyncore.dispatcher.__init__(self, map=map)
+        self.client = client
+        self.body = None
+        self.done = False
+        self.want = ''
+        self.reply = []
+        self.replyLen = 0
+        self.bodyStart = -1
+        self.expect = -1
+        self.started = time.time()
+        self.mark = self.started        #end of the last phase recorded in client.phases (see timing.py)
+        self.queryLen = len(query)
+        self.connectTime = None
+        self.responseTime = None
+        self.connectTimeout, self.responseTimeout = latency.history().timeouts(client.sitename, client.site)
+        self.hostname, port, selector = urlHost(FieldVal(client.site,"url"))
+        self.host = self.hostname
+        if port <> httplib.HTTPS_PORT: self.host += ':' + str(port)
+        self.outbuf = '\r\n'.join(["POST " + selector + " HTTP/1.1",
+                                   "Host: " + self.host,
+                                   "Accept-Encoding: " + httpzip.acceptEncoding(client.site),
+                                   "Content-Length: " + str(len(query)),
+                                   "Content-type: application/x-ofx",
+                                   "Accept: */*, application/x-ofx",
+                                   "Connection: close",
+                                   "", ""]) + query
+
+        self.state = 'connect'
+        self.errmsg = "** An ERROR occurred attempting HTTPS connection to"
+        self.deadline = self.started + self.connectTimeout
+        try:
+            family, socktype, proto, cname, addr = socket.getaddrinfo(self.hostname, port, 0, socket.SOCK_STREAM)[0]
+            self.create_socket(family, socktype)
+            self.connect(addr)
+        except Exception as inst:
+            self.fail(inst)
+
+    def readable(self):
+        return not self.done
+
+    def writable(self):
+        if self.state == 'handshake': return self.want == 'write'
+        return self.state in ('connect', 'send')
+
+    def handle_connect(self):
+        #tcp connection is up.  start the TLS handshake (same certificate checks as httplib)
+        self.mark = self.client.phases.add('connect', self.started)
+        self.del_channel()
+        ctx = ssl._create_default_https_context()
+        sock = ctx.wrap_socket(self.socket, server_hostname=self.hostname, do_handshake_on_connect=False)
+        self.set_socket(sock)
+        self.state = 'handshake'
+        self._handshake()
+
+    def _handshake(self):
+        try:
+            self.socket.do_handshake()
+        except ssl.SSLWantReadError:
+            self.want = 'read'
+            return
+        except ssl.SSLWantWriteError:
+            self.want = 'write'
+            return
+        self.state = 'send'
+        self.errmsg = "** An ERROR occurred sending POST request to"
+        self.connectTime = time.time() - self.started
+        self.mark = self.client.phases.add('tls', self.mark)
+
+    def handle_write(self):
+        if self.state == 'handshake':
+            self._handshake()
+        elif self.state == 'send':
+            try:
+                n = self.socket.send(self.outbuf)
+            except (ssl.SSLWantWriteError, ssl.SSLWantReadError):
+                return
+            self.outbuf = self.outbuf[n:]
+            if not self.outbuf:
+                self.state = 'reply'
+                self.errmsg = "** An ERROR occurred retrieving POST response from"
+                self.sent = self.client.phases.add('send', self.mark, self.queryLen)
+                self.deadline = self.sent + self.responseTimeout
+
+    def handle_read(self):
+        if self.state == 'handshake':
+            self._handshake()
+            return
+        if self.state <> 'reply':
+            return
+        while True:
+            try:
+                data = self.socket.recv(65536)
+            except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                return
+            if not data:
+                self.finish()       #server closed the connection
+                return
+            if self.responseTime is None:
+                self.responseTime = time.time() - self.sent
+                self.mark = self.client.phases.add('wait', self.sent)
+            self.reply.append(data)
+            self.replyLen += len(data)
+            self.deadline = time.time() + self.responseTimeout
+            if self._complete():
+                self.finish()
+                return
+            if not self.socket.pending():
+                return
+
+    def _complete(self):
+        #have we read the full body?  (only known when the server sends a Content-Length)
+        if self.bodyStart < 0:
+            data = ''.join(self.reply)
+            self.reply = [data]
+            i = data.find('\r\n\r\n')
+            if i < 0: return False
+            self.bodyStart = i + 4
+            m = _contentLength.search(data, 0, i + 2)
+            if m: self.expect = int(m.group(1))
+        return self.expect >= 0 and self.replyLen - self.bodyStart >= self.expect
+
+    def handle_close(self):
+        self.finish()
+
+    def handle_error(self):
+        self.fail(sys.exc_info()[1])
+
+    def finish(self):
+        #parse the reply and keep the body
+        if self.done: return
+        self.close()
+        self.done = True
+        try:
+            if self.state <> 'reply': raise socket.error("connection closed by server")
+            response = httplib.HTTPResponse(_ReplySocket(''.join(self.reply)))
+            response.begin()
+            self.reply = []
+            self.body, wire = httpzip.readBody(response)
+            self.client.phases.add('read', self.mark, wire)
+        except Exception as inst:
+            self.done = False
+            self.fail(inst)
+
+    def fail(self, inst):
+        if self.done: return
+        if self.socket: self.close()
+        self.done = True
+        self.client.status = False
+        if latency.timedOut(inst):
+            #record the timeout, so a slow server gets more time on the next run
+            if self.state <> 'reply': self.connectTime = self.connectTimeout
+            elif self.responseTime is None: self.responseTime = self.responseTimeout
+        print self.errmsg, self.hostname
+        print "   Exception type:", type(inst)
+        print "   Exception Val :", inst
+
+def runQueries(requests, maxInFlight=50, maxPerHost=2):
+    #send each query in requests = [[OFXClient, query], ...]
+    #returns the reply body for each request, in the same order (None for a request that fails).
+    #client.status is set to False for any request that fails
+    #at most maxInFlight requests are open at once, and no more than maxPerHost to the same server
+
+    map = {}
+    pending = range(len(requests))
+    hosts = [urlHost(FieldVal(r[0].site,"url"))[:2] for r in requests]    #(hostname, port)
+    active = {}         #host: open requests
+    channels = []
+    replies = [None] * len(requests)
+
+    while pending or channels:
+        #start requests, in order, while we have room
+        n = 0
+        while len(channels) < maxInFlight and n < len(pending):
+            i = pending[n]
+            if active.get(hosts[i], 0) < maxPerHost:
+                del pending[n]
+                client, query = requests[i]
+                ch = OFXChannel(client, query, map)
+                ch.hostKey = hosts[i]
+                ch.index = i
+                active[hosts[i]] = active.get(hosts[i], 0) + 1
+                channels.append(ch)
+            else:
+                n += 1
+
+        if map: asyncore.loop(timeout=0.1, map=map, count=1)
+
+        now = time.time()
+        for ch in channels[:]:
+            if not ch.done and now > ch.deadline:
+                ch.fail(socket.timeout("timed out"))
+            if ch.done:
+                channels.remove(ch)
+                active[ch.hostKey] -= 1
+                replies[ch.index] = ch.body
+                latency.history().record(ch.client.sitename, ch.connectTime, ch.responseTime)
+
+    return replies
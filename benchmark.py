@@ -0,0 +1,468 @@
+# benchmark.py
+# http://sites.google.com/site/pocketsense/
+# timing tests, using synthetic statements (no network access)
+# Intial version: nt: Oct-2026
+
+# Usage: benchmark.py [quick] [nosave]
+#   Generates synthetic bank, credit card (Discover) and investment statements, and times:
+#       scrubber.scrub()            bank, credit card and investment statements of several sizes
+#       ofx._validate()             the reply checks in OFXDownload.check() (see getOFX)
+#       combineOfx()                10 to 1000 statements
+#       ofxparse.parseFile()        bank and investment statements of several sizes, and the peak
+#                                   memory used to parse a large one (450,000 transactions)
+#       quotes.OfxWriter.writeFile  1000 to 50000 securities
+#       site_cfg parsing            sites.dat with 10 to 1000 site entries, and the snapshot reload
+#   Each result is reported in MB/s and transactions (or entries) per second.  "quick" uses the
+#   smaller sizes only.
+#   Results are added to benchmarkFile, and each one is compared with the previous saved run
+#   ("1.25x last" = 1.25 times as fast as last time).
+#   "nosave" doesn't save the results.
+#   The checks section compares the FITID serial numbers, combineOfx(), the FITID filter's
+#   transaction spans and pyDes.des with the original implementations (results and times).
+#
+#   Synthetic statements include the cases the scrubber fixes: Discover style FITIDs (same date and
+#   amount), midnight and date-only timestamps, INVBUY/INVSELL sign errors and CORRECTACTION tags.
+
+import os, re, sys, time, random, json, shutil, tempfile, platform, cStringIO
+import scrubber, rlib1, quotes, datetime, pyDes, ofx, site_cfg, ofxparse, fitidindex
+from control2 import *
+
+benchmarkFile = 'benchmark.json'   #saved results (the last keepRuns runs)
+keepRuns = 20
+
+def discoverStatement(ntrans, seed=1):
+    #return an OFX credit card statement with ntrans Discover style transactions
+    #FITID = FITID + YYYYMMDD + amount + 5 digit serial.  Many share a date and amount (same base value)
+    rnd = random.Random(seed)
+    ofx = ['OFXHEADER:100\r\nDATA:OFXSGML\r\nVERSION:102\r\n\r\n',
+           '<OFX><CREDITCARDMSGSRSV1><CCSTMTTRNRS><TRNUID>1<STATUS><CODE>0<SEVERITY>INFO</STATUS>',
+           '<CCSTMTRS><CURDEF>USD<CCACCTFROM><ACCTID>6011000000000000</CCACCTFROM>',
+           '<BANKTRANLIST><DTSTART>20100101<DTEND>20101231\r\n']
+    for i in range(ntrans):
+        date = '2010%02d%02d' % (rnd.randint(1, 12), rnd.randint(1, 28))
+        amt = '-%d.%02d' % (rnd.choice([5, 10, 20, 25, 50]), rnd.choice([0, 95, 99]))
+        ofx.append('<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>%s<TRNAMT>%s<FITID>FITID%s%s%05d<NAME>Purchase %d</STMTTRN>\r\n'
+                   % (date, amt, date, amt, rnd.randint(0, 99999), i))
+    ofx.append('</BANKTRANLIST><LEDGERBAL><BALAMT>0.00<DTASOF>20101231</LEDGERBAL></CCSTMTRS></CCSTMTTRNRS></CREDITCARDMSGSRSV1></OFX>')
+    return ''.join(ofx)
+
+bankSite = {'URL': 'https://ofx.bank.example', 'TIMEOFFSET': 0, 'SCRUB': ''}
+ccSite = {'URL': 'https://ofx.discovercard.com', 'TIMEOFFSET': 0, 'SCRUB': ''}
+invSite = {'URL': 'https://ofx.broker.example', 'TIMEOFFSET': 0, 'SCRUB': ''}
+
+_status = '<STATUS><CODE>0<SEVERITY>INFO</STATUS>'
+_signOn = '<SIGNONMSGSRSV1><SONRS>' + _status + '<DTSERVER>20101231120000<LANGUAGE>ENG</SONRS></SIGNONMSGSRSV1>\r\n'
+
+def _dt(rnd):
+    #a 2010 date.  Half are midnight, the rest are date-only or have a time of day
+    date = '2010%02d%02d' % (rnd.randint(1, 12), rnd.randint(1, 28))
+    return date + rnd.choice(['000000', '000000', '', '%02d3000' % rnd.randint(1, 23)])
+
+def bankStatement(ntrans, seed=1):
+    #return an OFX bank statement with ntrans transactions.  1 in 50 has CORRECTACTION/CORRECTFITID tags
+    rnd = random.Random(seed)
+    ofx = ['OFXHEADER:100\r\nDATA:OFXSGML\r\nVERSION:102\r\n\r\n<OFX>', _signOn,
+           '<BANKMSGSRSV1><STMTTRNRS><TRNUID>1', _status, '<STMTRS><CURDEF>USD',
+           '<BANKACCTFROM><BANKID>123456789<ACCTID>0001234567<ACCTTYPE>CHECKING</BANKACCTFROM>',
+           '<BANKTRANLIST><DTSTART>20100101<DTEND>20101231\r\n']
+    for i in range(ntrans):
+        amt = '%s%d.%02d' % (rnd.choice(['-', '-', '']), rnd.randint(1, 500), rnd.randint(0, 99))
+        correct = ''
+        if i % 50 == 49: correct = '<CORRECTFITID>B%07d<CORRECTACTION>REPLACE' % (i - 1)
+        ofx.append('<STMTTRN><TRNTYPE>%s<DTPOSTED>%s<TRNAMT>%s<FITID>B%07d%s<NAME>Payee %d<MEMO>Memo %d</STMTTRN>\r\n'
+                   % (amt[0] == '-' and 'DEBIT' or 'CREDIT', _dt(rnd), amt, i, correct, i % 997, i))
+    ofx.append('</BANKTRANLIST><LEDGERBAL><BALAMT>1234.56<DTASOF>20101231000000</LEDGERBAL>'
+               '</STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\r\n')
+    return ''.join(ofx)
+
+def invStatement(ntrans, seed=1, nsec=50):
+    #return an OFX investment statement with ntrans mutual fund buys and sells, and a position and
+    #security entry for nsec funds.  1 in 10 buys/sells has the wrong sign on UNITS or TOTAL,
+    #and 1 in 50 has a CORRECTACTION tag
+    rnd = random.Random(seed)
+    ofx = ['OFXHEADER:100\r\nDATA:OFXSGML\r\nVERSION:102\r\n\r\n<OFX>', _signOn,
+           '<INVSTMTMSGSRSV1><INVSTMTTRNRS><TRNUID>1', _status, '<INVSTMTRS><DTASOF>20101231000000<CURDEF>USD',
+           '<INVACCTFROM><BROKERID>broker.example<ACCTID>X0001234</INVACCTFROM>',
+           '<INVTRANLIST><DTSTART>20100101<DTEND>20101231\r\n']
+    for i in range(ntrans):
+        units = rnd.randint(1, 10000) / 100.0
+        price = rnd.randint(1000, 20000) / 100.0
+        total = round(units * price, 2)
+        buy = rnd.random() < 0.6
+        if buy: units, total = units, -total
+        else: units, total = -units, total
+        if i % 10 == 9: units, total = -units, -total        #sign error (fixed by the scrubber)
+        correct = ''
+        if i % 50 == 49: correct = '<CORRECTACTION>DELETE'
+        kind = buy and 'BUY' or 'SELL'
+        ofx.append('<%sMF><INV%s><INVTRAN><FITID>I%07d%s<DTTRADE>%s</INVTRAN>'
+                   '<SECID><UNIQUEID>9%08d<UNIQUEIDTYPE>CUSIP</SECID><UNITS>%s<UNITPRICE>%s<TOTAL>%s'
+                   '<SUBACCTSEC>CASH<SUBACCTFUND>CASH</INV%s><%sTYPE>%s</%sMF>\r\n'
+                   % (kind, kind, i, correct, _dt(rnd), i % nsec, units, price, total, kind, kind, kind, kind))
+    ofx.append('</INVTRANLIST><INVPOSLIST>')
+    for n in range(nsec):
+        ofx.append('<POSMF><INVPOS><SECID><UNIQUEID>9%08d<UNIQUEIDTYPE>CUSIP</SECID><HELDINACCT>CASH<POSTYPE>LONG'
+                   '<UNITS>100.000<UNITPRICE>10.00<MKTVAL>1000.00<DTPRICEASOF>20101231000000</INVPOS></POSMF>\r\n' % n)
+    ofx.append('</INVPOSLIST></INVSTMTRS></INVSTMTTRNRS></INVSTMTMSGSRSV1><SECLISTMSGSRSV1><SECLIST>')
+    for n in range(nsec):
+        ofx.append('<MFINFO><SECINFO><SECID><UNIQUEID>9%08d<UNIQUEIDTYPE>CUSIP</SECID>'
+                   '<SECNAME>Fund %d<TICKER>FND%d</SECINFO></MFINFO>\r\n' % (n, n, n))
+    ofx.append('</SECLIST></SECLISTMSGSRSV1></OFX>\r\n')
+    return ''.join(ofx)
+
+#statement kinds: (generator, site entry)
+statementKinds = {'bank': (bankStatement, bankSite), 'cc': (discoverStatement, ccSite), 'inv': (invStatement, invSite)}
+
+def sitesDat(nsites, ntickers):
+    #return a sites.dat with nsites site entries and ntickers stocks and funds
+    lines = ['defaultInterval: 7', 'DownloadWorkers: 4', 'ClientUID: 0123456789abcdef01234567', '']
+    for n in range(nsites):
+        lines += ['<site>', '    SiteName   : SITE%d' % n, '    AcctType   : %s' % ['BASTMT', 'CCSTMT', 'INVSTMT'][n % 3],
+                  '    fiorg      : Org %d   #comment' % n, '    fid        : %d' % (1000 + n),
+                  '    url        : https://ofx%d.example.com/ofx' % n, '    bankid     : %09d' % n,
+                  '    minInterval: 7', '    scrub      : -general', '</site>', '']
+    lines.append('<stocks>')
+    lines += ['    STK%d m:1.0' % n for n in range(ntickers / 2)]
+    lines += ['</stocks>', '<funds>']
+    lines += ['    FND%d' % n for n in range(ntickers - ntickers / 2)]
+    lines.append('</funds>')
+    return '\n'.join(lines) + '\n'
+
+def searchFitids(fitids):
+    #original Discover serial number assignment: search the list of assigned values for each one
+    known = []
+    for fitid in fitids:
+        fitid_b = fitid[:len(fitid) - 5]
+        seq = 0
+        while seq < 9999:
+            fitid = fitid_b + str(seq)
+            if fitid in known: seq = seq + 1
+            else: break
+        known.append(fitid)
+    return known
+
+def combineOriginal(ofxList):
+    #original combineOfx() (returns the combined message, rather than writing it to file)
+    signon =  "\r".join([
+              "<SIGNONMSGSRSV1><SONRS>",
+              "<STATUS><CODE>0<SEVERITY>INFO<MESSAGE>Successful Sign On</STATUS>",
+              "<DTSERVER>" + time.strftime("%Y%m%d%H%M%S",time.localtime()),
+              "<LANGUAGE>ENG<DTPROFUP>20010101010000",
+              "<FI><ORG>PocketSense</FI></SONRS></SIGNONMSGSRSV1>"])
+    bRe = re.compile('(?:<BANKMSGSRSV1>)(.*?)(?:</BANKMSGSRSV1>)', re.IGNORECASE)
+    cRe = re.compile('(?:<CREDITCARDMSGSRSV1>)(.*?)(?:</CREDITCARDMSGSRSV1>)', re.IGNORECASE)
+    iRe = re.compile('(?:<INVSTMTMSGSRSV1>)(.*?)(?:</INVSTMTMSGSRSV1>)', re.IGNORECASE)
+    sRe = re.compile('(?:<SECLIST>)(.*?)(?:</SECLIST>)', re.IGNORECASE)
+    bantrn = crdtrn = invtrn = sectrn = ''
+    for file in ofxList:
+        f=open(file[2])
+        ofx = f.read()
+        f.close()
+        ofx = ofx.replace(chr(13),'').replace(chr(10),'')
+        b = '\r'.join(bRe.findall(ofx))
+        c = '\r'.join(cRe.findall(ofx))
+        i = '\r'.join(iRe.findall(ofx))
+        s = '\r'.join(sRe.findall(ofx))
+        if b: bantrn = bantrn + '\r' + b
+        if c: crdtrn = crdtrn + '\r' + c
+        if i: invtrn = invtrn + '\r' + i
+        if s: sectrn = sectrn + '\r' + s
+    if bantrn: bantrn = rlib1.OfxTag('BANKMSGSRSV1', bantrn)
+    if crdtrn: crdtrn = rlib1.OfxTag('CREDITCARDMSGSRSV1', crdtrn)
+    if invtrn: invtrn = rlib1.OfxTag('INVSTMTMSGSRSV1', invtrn)
+    if sectrn: sectrn = rlib1.OfxTag('SECLISTMSGSRSV1', rlib1.OfxTag('SECLIST', sectrn))
+    combOfx = '\r'.join(['<OFX>', signon, bantrn, crdtrn, invtrn, sectrn, '</OFX>'])
+    combOfx2=''
+    for line in combOfx.splitlines():
+        if line: combOfx2 = combOfx2 + line + '\r'
+    return rlib1.OfxSGMLHeader() + combOfx2
+
+_listRe  = re.compile(r'<(BANKTRANLIST|INVTRANLIST)>', re.IGNORECASE)
+_tagRe   = re.compile(r'<(/?)([^<>\s]+)\s*>([^<]*)')
+_fitidRe = re.compile(r'<FITID>\s*([^<\s]+)', re.IGNORECASE)
+
+def transactionsOriginal(ofx):
+    #original fitidindex.transactions(): its own tag scanner, rather than ofxparse.spans()
+    trans = []
+    for m in _listRe.finditer(ofx):
+        stack = []
+        start = None
+        leaf = None
+        for t in _tagRe.finditer(ofx, m.end()):
+            close, name = t.group(1), t.group(2).upper()
+            if close:
+                if not stack and name <> leaf: break
+                if name in stack:
+                    while stack.pop() <> name: pass
+                    if not stack:
+                        f = _fitidRe.search(ofx, start, t.start())
+                        trans.append((start, t.end(), f and f.group(1)))
+            elif t.group(3).strip():
+                leaf = name
+            else:
+                if not stack: start = t.start()
+                stack.append(name)
+    return trans
+
+def xmlStatement(ofx):
+    #OFX 2.x style copy of an SGML statement: elements get closing tags
+    return re.sub(r'<(\w+)>([^<\r\n]+)', r'<\1>\2</\1>', ofx)
+
+def combineFiles(nfiles, ntrans):
+    #write nfiles statements (ntrans transactions each) to xfrdir, and return an ofxList for combineOfx()
+    if not os.path.exists(xfrdir): os.mkdir(xfrdir)
+    ofxList = []
+    for n in range(nfiles):
+        name = xfrdir + 'bench%04d.ofx' % n
+        f = open(name, 'w')
+        f.write(discoverStatement(ntrans, n))
+        f.close()
+        ofxList.append(['Bench', str(n), name])
+    return ofxList
+
+class Quote:
+    #stand-in for quotes.Security, with the fields OfxWriter uses
+    def __init__(self, n):
+        self.symbol = 'SYM%d' % n
+        self.name = 'Security %d' % n
+        self.price = '%d.%02d' % (n % 1000, n % 100)
+        self.quoteTime = '20100101160000'
+        self.datetime = datetime.datetime(2010, 1, 1, 16)
+
+def accountFields(naccts, key):
+    #encrypted account#, user name and password fields for naccts accounts (see control2.acctEncrypt)
+    rnd = random.Random(naccts)
+    d = pyDes.des(key)
+    fields = []
+    for n in range(naccts):
+        fields.append(d.encrypt(str(rnd.randrange(10**9, 10**12)), ' '))
+        fields.append(d.encrypt('user%d' % n, ' '))
+        fields.append(d.encrypt('pw%x' % rnd.getrandbits(40), ' '))
+    return fields
+
+def decryptFields(desClass, key, fields):
+    d = desClass(key)
+    return [d.decrypt(f, ' ') for f in fields]
+
+def timed(label, func, *args):
+    t = time.time()
+    result = func(*args)
+    print "  %-40s %8.3f sec" % (label, time.time() - t)
+    return result
+
+class Quiet:
+    #discard scrubber messages while a test runs
+    def __enter__(self):
+        self.stdout = sys.stdout
+        sys.stdout = cStringIO.StringIO()
+    def __exit__(self, *args):
+        sys.stdout = self.stdout
+
+class Suite:
+    """Timed results for one run, compared with the last saved run"""
+
+    def __init__(self, filename=benchmarkFile):
+        self.filename = filename
+        self.results = []
+        self.runs = []
+        try:
+            f = open(filename)
+            try:
+                self.runs = json.load(f)
+            finally:
+                f.close()
+        except Exception:
+            pass            #no saved runs
+        self.last = {}
+        if self.runs:
+            self.last = dict((r['name'], r) for r in self.runs[-1]['results'])
+
+    def measure(self, name, func, args=(), nbytes=0, items=0, repeat=3, setup=None):
+        #time func(*args), best of repeat runs.  setup() is called (untimed) before each run.
+        #nbytes, items = bytes and transactions (or entries) handled by one run
+        best = None
+        for n in range(repeat):
+            if setup: setup()
+            with Quiet():
+                t = time.time()
+                func(*args)
+                secs = time.time() - t
+            if best is None or secs < best: best = secs
+        r = {'name': name, 'secs': best, 'bytes': nbytes, 'items': items,
+             'MBps': nbytes / 1e6 / max(best, 1e-9), 'perSec': items / max(best, 1e-9)}
+        self.results.append(r)
+        
+        vs = ''
+        if name in self.last and self.last[name]['secs'] > 0:
+            vs = "%6.2fx last" % (self.last[name]['secs'] / max(best, 1e-9))
+        print "  %-36s %8.4f sec %8.1f MB/s %11.0f /s  %s" % (name, best, r['MBps'], r['perSec'], vs)
+        return r
+
+    def save(self):
+        self.runs.append({'date': time.strftime("%Y-%m-%d %H:%M:%S"), 'python': platform.python_version(),
+                          'platform': platform.platform(), 'results': self.results})
+        f = open(self.filename, 'w')
+        json.dump(self.runs[-keepRuns:], f, indent=1, sort_keys=True)
+        f.close()
+        print "Results saved to", self.filename
+
+def writeFile(name, text):
+    f = open(name, 'w')
+    f.write(text)
+    f.close()
+
+def benchScrub(suite, sizes):
+    print "scrubber.scrub()"
+    name = xfrdir + 'benchscrub.ofx'
+    for kind in ['bank', 'cc', 'inv']:
+        gen, site = statementKinds[kind]
+        for ntrans in sizes:
+            text = gen(ntrans)
+            suite.measure("scrub %s, %d txns" % (kind, ntrans), scrubber.scrub, (name, site),
+                          len(text), ntrans, setup=lambda: writeFile(name, text))
+    os.remove(name)
+
+def benchValidate(suite, sizes):
+    print "Reply validation (ofx._validate)"
+    for kind in ['bank', 'cc', 'inv']:
+        for ntrans in sizes:
+            text = statementKinds[kind][0](ntrans)
+            suite.measure("validate %s, %d txns" % (kind, ntrans), ofx._validate, (text,), len(text), ntrans)
+
+def benchCombine(suite, counts, ntrans=200):
+    print "combineOfx() (%d transactions per statement)" % ntrans
+    kinds = ['bank', 'cc', 'inv']
+    for nfiles in counts:
+        ofxList = []
+        for n in range(nfiles):
+            name = xfrdir + 'bench%04d.ofx' % n
+            writeFile(name, statementKinds[kinds[n % 3]][0](ntrans, n))
+            ofxList.append(['Bench', str(n), name])
+        nbytes = sum(os.path.getsize(f[2]) for f in ofxList)
+        cfiles = []
+        suite.measure("combine, %d statements" % nfiles, lambda: cfiles.append(rlib1.combineOfx(ofxList)),
+                      (), nbytes, nfiles * ntrans)
+        for f in cfiles + [f[2] for f in ofxList]: os.remove(f)
+
+_peakScript = """
+import sys, resource, ofxparse
+if sys.argv[1] != '-': n = sum(1 for rec in ofxparse.parseFile(sys.argv[1]))
+print resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+"""
+
+def peakMemory(name):
+    #peak resident memory (MB) of a new python process that parses file name with ofxparse.parseFile
+    #('-' = only starts up and imports ofxparse).  None if it can't be measured (no resource module on Windows)
+    try:
+        import resource, subprocess
+    except ImportError:
+        return None
+    out = subprocess.Popen([sys.executable, '-c', _peakScript, name], stdout=subprocess.PIPE).communicate()[0]
+    kb = int(out.strip())
+    if sys.platform == 'darwin': kb = kb / 1024      #bytes on OS X
+    return kb / 1024.0
+
+def benchOfxparse(suite, sizes, memSize):
+    print "ofxparse.parseFile()"
+    name = xfrdir + 'benchparse.ofx'
+    for kind in ['bank', 'inv']:
+        for ntrans in sizes:
+            writeFile(name, statementKinds[kind][0](ntrans))
+            suite.measure("ofxparse %s, %d txns" % (kind, ntrans), lambda: list(ofxparse.parseFile(name)), (),
+                          os.path.getsize(name), ntrans)
+    #peak memory while parsing a large statement, over the memory used by an idle process
+    writeFile(name, bankStatement(memSize))
+    base = peakMemory('-')
+    if base is None:
+        print "  peak memory: not measured (no resource module)"
+    else:
+        print "  peak memory, %d txns (%.1f MB file): %.1f MB (%.1f MB after startup)" % (memSize,
+              os.path.getsize(name) / 1e6, peakMemory(name), base)
+    os.remove(name)
+
+def benchQuotes(suite, counts):
+    print "quotes.OfxWriter.writeFile()"
+    name = xfrdir + 'benchquotes.ofx'
+    for nsec in counts:
+        writer = quotes.OfxWriter('USD', 'QUOTES', 0, [Quote(n) for n in range(nsec)], [])
+        writer.writeFile(name)
+        suite.measure("OfxWriter, %d securities" % nsec, writer.writeFile, (name,), os.path.getsize(name), nsec)
+    os.remove(name)
+
+def benchSiteCfg(suite, counts):
+    print "site_cfg (sites.dat parse, and snapshot reload)"
+    home = os.getcwd()
+    tmp = tempfile.mkdtemp()
+    os.chdir(tmp)
+    try:
+        for nsites in counts:
+            text = sitesDat(nsites, nsites)
+            writeFile('sites.dat', text)
+            removeSnap = lambda: os.path.exists('sites.snap') and os.remove('sites.snap')
+            suite.measure("parse, %d sites" % nsites, site_cfg.site_cfg, (), len(text), nsites * 2, setup=removeSnap)
+            suite.measure("snapshot, %d sites" % nsites, site_cfg.site_cfg, (), os.path.getsize('sites.snap'), nsites * 2)
+            os.remove('sites.dat')
+    finally:
+        os.chdir(home)
+        shutil.rmtree(tmp, True)
+
+def checks():
+    #compare the current implementations with the originals they replaced
+    print "Discover FITID serial numbers"
+    small = discoverStatement(5000)
+    fitids = [r.group(2) for r in scrubber._discoverRe.finditer(small)]
+    ids = scrubber._DiscoverFitids()
+    new = timed("per-statement index, 5000 txns", lambda: [ids.next(f) for f in fitids])
+    old = timed("original list search, 5000 txns", searchFitids, fitids)
+    print "  results match:", new == old
+
+    print "Combine statements (200 transactions each)"
+    noTime = lambda s: re.sub(r'<DTSERVER>\d+', '', s)
+    for nfiles in [1, 10, 100]:
+        ofxList = combineFiles(nfiles, 200)
+        cfile = timed("combineOfx, %d statements" % nfiles, rlib1.combineOfx, ofxList)
+        old = timed("original combiner, %d statements" % nfiles, combineOriginal, ofxList)
+        f = open(cfile)
+        print "  results match:", noTime(f.read()) == noTime(old)
+        f.close()
+        os.remove(cfile)
+        for f in ofxList: os.remove(f[2])
+    
+    print "FITID filter transaction spans (10000 txns)"
+    for label, text in [('bank', bankStatement(10000)), ('inv', invStatement(10000)),
+                        ('bank, OFX 2.x', xmlStatement(bankStatement(10000)))]:
+        new = timed("ofxparse.spans, %s" % label, lambda: list(fitidindex.transactions(text)))
+        old = timed("original tag scanner, %s" % label, transactionsOriginal, text)
+        print "  results match:", new == old and len(new) > 0
+
+    print "Account decryption (DES)"
+    fields = accountFields(500, 'abcdefgh')
+    new = timed("des, 500 accounts", decryptFields, pyDes.des, 'abcdefgh', fields)
+    old = timed("original bit-list des, 500 accounts", decryptFields, pyDes.bitlist_des, 'abcdefgh', fields)
+    print "  results match:", new == old
+
+if __name__=="__main__":
+    args = [a.lower() for a in sys.argv[1:]]
+    quick = 'quick' in args
+    if not os.path.exists(xfrdir): os.mkdir(xfrdir)
+    
+    suite = Suite()
+    if suite.runs: print "Comparing with the run saved", suite.runs[-1]['date'], "\n"
+    if quick:
+        benchScrub(suite, [1000, 10000])
+        benchValidate(suite, [1000, 10000])
+        benchCombine(suite, [10, 100])
+        benchOfxparse(suite, [1000, 10000], 100000)
+        benchQuotes(suite, [1000, 10000])
+        benchSiteCfg(suite, [10, 100])
+    else:
+        benchScrub(suite, [1000, 10000, 100000])
+        benchValidate(suite, [1000, 10000, 100000])
+        benchCombine(suite, [10, 100, 1000])
+        benchOfxparse(suite, [1000, 10000, 100000], 450000)
+        benchQuotes(suite, [1000, 10000, 50000])
+        benchSiteCfg(suite, [10, 100, 1000])
+    print ""
+    checks()
+    print ""
+    if 'nosave' not in args: suite.save()
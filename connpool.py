@@ -0,0 +1,102 @@
+# connpool.py
+# http://sites.google.com/site/pocketsense/
+# keep-alive HTTPS connections, shared by every download in the process
+# Intial version: nt: Oct-2026
+
+# Notes
+# -----
+#   - Connections are keyed by (scheme, host, port), so accounts that share a bank server
+#     reuse one TCP/TLS session rather than paying a new handshake per account.
+#   - An idle connection is checked before it is handed out.  If the server has closed it
+#     (or it has data waiting that we didn't ask for), it is dropped and a new one is opened.
+#   - Safe to use from several download threads.  Each connection is only used by one thread at a time.
+#   - connect() opens a new connection in two timed steps (TCP, then the TLS handshake)
+#   - A request on a reused connection is only sent again if closedByServer() says the connection
+#     was already closed (reset, broken pipe, or no reply at all).  A timeout isn't retried.
+
+import httplib, select, threading, time, socket, ssl, errno
+
+class ConnectionPool:
+    """Pool of idle httplib.HTTPSConnection objects, keyed by (scheme, host, port)"""
+
+    def __init__(self, maxIdle=4):
+        self.maxIdle = maxIdle      #idle connections kept per server
+        self.idle = {}              #key: [connection, ...]
+        self.lock = threading.Lock()
+        self.hits = 0               #requests that reused an open connection
+        self.misses = 0             #requests that needed a new connection
+        self.replaced = 0           #idle connections found dead, and replaced
+
+    def get(self, host, port=httplib.HTTPS_PORT, timeout=5):
+        #return (key, connection, reused) for host:port
+        key = ('https', host.lower(), port)
+        self.lock.acquire()
+        try:
+            conns = self.idle.get(key, [])
+            while conns:
+                h = conns.pop()
+                if _isOpen(h):
+                    self.hits += 1
+                    h.sock.settimeout(timeout)
+                    return key, h, True
+                h.close()
+                self.replaced += 1
+            self.misses += 1
+        finally:
+            self.lock.release()
+        return key, httplib.HTTPSConnection(host, port, timeout=timeout), False
+
+    def put(self, key, h):
+        #return a connection to the pool after its response has been read in full
+        self.lock.acquire()
+        try:
+            conns = self.idle.setdefault(key, [])
+            if h.sock is not None and len(conns) < self.maxIdle:
+                conns.append(h)
+                h = None
+        finally:
+            self.lock.release()
+        if h: h.close()
+
+    def closeAll(self):
+        self.lock.acquire()
+        try:
+            for conns in self.idle.values():
+                for h in conns: h.close()
+            self.idle = {}
+        finally:
+            self.lock.release()
+
+    def stats(self):
+        return "Connection pool: {0} hits, {1} misses, {2} dead connections replaced".format(self.hits, self.misses, self.replaced)
+
+def connect(h):
+    #open a new HTTPSConnection, as h.connect() does, timing each part.  returns (tcp, tls) secs
+    t = time.time()
+    httplib.HTTPConnection.connect(h)
+    tcp = time.time() - t
+    h.sock = h._context.wrap_socket(h.sock, server_hostname=h._tunnel_host or h.host)
+    return tcp, time.time() - t - tcp
+
+def closedByServer(inst):
+    #did a request fail because the server had closed the connection before it was sent?
+    #(a timeout doesn't count: the server may still be working on the request)
+    if isinstance(inst, httplib.BadStatusLine): return True
+    if isinstance(inst, socket.timeout): return False
+    if isinstance(inst, (ssl.SSLEOFError, ssl.SSLZeroReturnError)): return True
+    if isinstance(inst, ssl.SSLError) and 'unexpected eof' in str(inst).lower():
+        return True     #OpenSSL 3 reports a close without close_notify this way, with no distinct error code
+    return isinstance(inst, socket.error) and inst.errno in (errno.ECONNRESET, errno.EPIPE, errno.ECONNABORTED)
+
+def _isOpen(h):
+    #an idle keep-alive connection has nothing to read.  If select() says it's readable,
+    #the server has closed it (or sent something unexpected) and it can't be reused
+    if h.sock is None: return False
+    try:
+        r, w, x = select.select([h.sock], [], [], 0)
+    except Exception:
+        return False
+    return not r
+
+#process-wide pool used by OFXClient.doQuery()
+pool = ConnectionPool()
@@ -8,6 +8,16 @@
 #
 # 03-Sep-2014: rlc
 #   - xfrdir is now platform independent
+#
+# 17-Oct-2026: nt
+#   - Added quoteCacheFile
+#   - Added highWaterFile
+#   - Added fitidIndexFile
+#   - Added acctStoreFile.  get_cfg() takes the file name (used to move ofx_config.cfg to the store)
+#   - Added latencyFile
+#   - Added timingJsonFile and timingPromFile
+#   - Added getdataProfFile and setupProfFile
+#   - BankTypes moved here from Setup.py (also used to select accounts in Getdata.py)
 #------------------------------------------------------------------------------------
 
 #---MODULES---
@@ -27,7 +37,18 @@ AboutName     = 'Robert'
 #xfrdir = temp directory for statement downloads.  Platform independent
 xfrdir   = os.path.join(os.path.curdir,"xfr") + os.sep
 if Debug: print "XFRDIR = " + xfrdir
-cfgFile  = 'ofx_config.cfg'    #user account settings (can be encrypted)
+cfgFile  = 'ofx_config.cfg'    #user account settings (can be encrypted).  replaced by acctStoreFile
+acctStoreFile  = 'accounts.db'  #user account settings (see acctstore.py)
+quoteCacheFile = 'quotes.cache' #recent stock/fund quotes (see QuoteCacheTTL in sites.dat)
+highWaterFile  = 'download.hwm' #latest statement date received per account (see IncrementalDownloads in sites.dat)
+fitidIndexFile = 'fitid.db'     #transactions already downloaded per account (see FitidFilter in sites.dat)
+latencyFile    = 'latency.hist' #recent connect/response times per site, used to set timeouts (see latency.py)
+timingJsonFile = 'timing.json'  #time spent in each phase of the last Getdata run (see timing.py)
+timingPromFile = 'timing.prom'  #same, as a Prometheus textfile
+getdataProfFile = 'getdata.prof' #cProfile output for Getdata.py --profile (see profiler.py)
+setupProfFile   = 'setup.prof'   #same, for Setup.py --profile test <acct>
+
+BankTypes = ['CHECKING', 'SAVINGS', 'MONEYMRKT', 'CREDITLINE']   #account types for bank (BASTMT) accounts
 
 DefaultAppID  = 'QWIN'
 DefaultAppVer = '2200'
@@ -94,14 +115,14 @@ def acctDecrypt(AcctArray, pwkey):
        acct[4] = d.decrypt(acct[4],' ')
     return AcctArray
     
-def get_cfg():
+def get_cfg(filename=cfgFile):
     #read in user configuration
     
     c_AcctArray = []        #AcctArray = [['SiteName', 'Account#', 'AcctType', 'UserName', 'PassWord'], ...]
     c_pwkey=''              #default = no encryption
     c_getquotes = False     #default = no quotes
-    if glob.glob(cfgFile) <> []:
-        cfg = open(cfgFile,'rb')
+    if glob.glob(filename) <> []:
+        cfg = open(filename,'rb')
         try:
             c_pwkey = pickle.load(cfg)            #encrypted pw key
             c_getquotes = pickle.load(cfg)        #get stock/fund quotes?
@@ -0,0 +1,151 @@
+# fitidindex.py
+# http://sites.google.com/site/pocketsense/
+# index of transaction FITIDs already downloaded for each account (sqlite)
+# Intial version: nt: Oct-2026
+
+# Notes
+# -----
+#   - Used when FitidFilter: Yes in sites.dat.  After a statement is scrubbed, transactions whose FITID
+#     is already in the index for that account are removed from BANKTRANLIST and INVTRANLIST.
+#     The rest of the statement (balances, positions, securities) is unchanged.
+#   - The new FITIDs are staged with the statement file, and only added to the index once Getdata.py
+#     has sent the file to Money (ofx.imported).  A statement that is declined or never imported
+#     is sent in full the next time.  Setup.py account tests don't use the filter.
+#   - Entries older than FitidKeepDays are pruned when the index is opened.
+#   - The index file is fitidIndexFile (control2.py).  Safe to use from several download threads.
+
+import time, sqlite3, threading
+import ofxparse
+from control2 import *
+
+class FitidIndex:
+    """FITID values already downloaded, by (site, account)"""
+
+    def __init__(self, filename):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(filename, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS fitid ("
+                        "site TEXT, acct TEXT, fitid TEXT, added REAL, PRIMARY KEY (site, acct, fitid))")
+        self.db.commit()
+        self.staged = {}        #ofx file name: (site, acct, fitids), until it's imported
+
+    def seen(self, site, acct, fitids):
+        #return the set of values in fitids that are already in the index for site/acct
+        found = set()
+        fitids = list(set(fitids))
+        self.lock.acquire()
+        try:
+            for i in range(0, len(fitids), 500):
+                batch = fitids[i:i+500]
+                sql = "SELECT fitid FROM fitid WHERE site=? AND acct=? AND fitid IN (" + ','.join('?'*len(batch)) + ")"
+                for row in self.db.execute(sql, [site, acct] + batch):
+                    found.add(row[0])
+        finally:
+            self.lock.release()
+        return found
+
+    def add(self, site, acct, fitids):
+        #add fitids for site/acct (bulk insert, one transaction)
+        now = time.time()
+        self.lock.acquire()
+        try:
+            self.db.executemany("INSERT OR IGNORE INTO fitid VALUES (?,?,?,?)",
+                                [(site, acct, f, now) for f in fitids])
+            self.db.commit()
+        finally:
+            self.lock.release()
+
+    def stage(self, ofxFile, site, acct, fitids):
+        #fitids are new in ofxFile.  they're added to the index if the file is imported
+        self.lock.acquire()
+        try:
+            self.staged[ofxFile] = (site, acct, fitids)
+        finally:
+            self.lock.release()
+
+    def commit(self, ofxFiles):
+        #add the staged fitids for the files that were imported
+        self.lock.acquire()
+        try:
+            staged = [self.staged.pop(f) for f in ofxFiles if f in self.staged]
+        finally:
+            self.lock.release()
+        for site, acct, fitids in staged:
+            if fitids: self.add(site, acct, fitids)
+
+    def prune(self, days):
+        #remove entries added more than days ago.  returns the number removed
+        self.lock.acquire()
+        try:
+            n = self.db.execute("DELETE FROM fitid WHERE added < ?", (time.time() - days*86400,)).rowcount
+            self.db.commit()
+        finally:
+            self.lock.release()
+        return n
+
+    def close(self):
+        self.db.close()
+
+def transactions(ofx):
+    #yield (start, end, fitid) for each transaction aggregate directly inside a BANKTRANLIST or
+    #INVTRANLIST section.  ofx[start:end] is the aggregate, through the white-space after its closing tag.
+    #fitid is None if the transaction doesn't have one
+    stack = None        #open aggregates in the current list (None = not in a list)
+    for tag, value, s, e in ofxparse.spans(ofx):
+        if stack is None:
+            if tag in ('BANKTRANLIST', 'INVTRANLIST'):
+                stack = []
+                leaf = fitid = None
+        elif tag[:1] == '/':
+            name = tag[1:]
+            if not stack and name <> leaf:
+                stack = None        #end of the list (not an XML element's closing tag)
+            elif name in stack:
+                while stack.pop() <> name: pass
+                if not stack: yield start, e, fitid
+        elif value:
+            leaf = tag
+            if tag == 'FITID' and stack and fitid is None: fitid = value
+        else:
+            #aggregate (elements have a value)
+            if not stack:
+                start = s
+                fitid = None
+            stack.append(tag)
+
+def dropSeen(ofx, index, site, acct):
+    #remove transactions already in index for site/acct.  the index isn't changed (see FitidIndex.stage)
+    #returns (new ofx message, number of transactions removed, fitids that weren't in the index)
+    trans = list(transactions(ofx))
+    fitids = [f for s, e, f in trans if f]
+    if not fitids: return ofx, 0, []
+    seen = index.seen(site, acct, fitids)
+
+    pieces = []
+    pos = 0
+    for s, e, f in trans:
+        if f in seen:
+            pieces.append(ofx[pos:s])
+            pos = e
+    pieces.append(ofx[pos:])
+
+    return ''.join(pieces), len([f for s, e, f in trans if f in seen]), [f for f in fitids if f not in seen]
+
+_index = None
+_indexLock = threading.Lock()
+
+def imported(ofxFiles):
+    #the statements in ofxFiles were sent to Money: add their new fitids to the index
+    if _index is not None: _index.commit(ofxFiles)
+
+def shared(keepDays):
+    #return the process-wide FitidIndex, opened (and pruned) on first use
+    global _index
+    _indexLock.acquire()
+    try:
+        if _index is None:
+            _index = FitidIndex(fitidIndexFile)
+            _index.prune(keepDays)
+        return _index
+    finally:
+        _indexLock.release()
@@ -0,0 +1,118 @@
+# highwater.py
+# http://sites.google.com/site/pocketsense/
+# per-account high-water marks: the latest statement date received for each account
+# Intial version: nt: Oct-2026
+
+# Notes
+# -----
+#   - Used when IncrementalDownloads: Yes in sites.dat.  The next request for an account starts at its
+#     mark, less IncrementalOverlap days, instead of (now - interval).
+#   - The mark is the latest <DTEND> in the statement, or the latest transaction date if there's no DTEND.
+#     It's read from the reply before the scrubber runs, so a DTEND added by the scrubber isn't used.
+#   - A mark is only recorded once the statement has been sent to Money: check() stages it, and
+#     Getdata.py calls ofx.imported() for the files it sent.  A statement that is declined, never
+#     imported, or only downloaded by a Setup.py test doesn't move the next request's start date.
+#   - The request never goes back more than max(interval, MaxDays) days, however old the mark is.
+#   - Marks are kept in highWaterFile (control2.py), and saved once per import.
+#     Safe to use from several download threads.
+
+import os, re, time, threading, cPickle
+from control2 import *
+
+_dtEnd  = re.compile(r'<DTEND>\s*(\d{8})', re.IGNORECASE)
+_dtTran = re.compile(r'<(?:DTPOSTED|DTTRADE)>\s*(\d{8})', re.IGNORECASE)
+
+MaxDays = 90        #longest incremental request (days), unless the download interval is longer
+
+class HighWater:
+    """Latest statement date (YYYYMMDD) received for each account"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.marks = {}         #(sitename, account#): YYYYMMDD
+        self.staged = {}        #ofx file name: (sitename, account#, YYYYMMDD), until it's imported
+        try:
+            f = open(filename, 'rb')
+            try:
+                self.marks = cPickle.load(f)
+            finally:
+                f.close()
+        except Exception:
+            pass                #no marks yet (or unreadable): full downloads
+
+    def get(self, sitename, acct_num):
+        self.lock.acquire()
+        try:
+            return self.marks.get((sitename, acct_num))
+        finally:
+            self.lock.release()
+
+    def stage(self, ofxFile, sitename, acct_num, dt):
+        #dt is the statement date in ofxFile.  it becomes the account's mark if the file is imported
+        self.lock.acquire()
+        try:
+            self.staged[ofxFile] = (sitename, acct_num, dt)
+        finally:
+            self.lock.release()
+
+    def commit(self, ofxFiles):
+        #record the staged dates for the files that were imported (if later than the current marks)
+        self.lock.acquire()
+        try:
+            changed = False
+            for ofxFile in ofxFiles:
+                if ofxFile not in self.staged: continue
+                sitename, acct_num, dt = self.staged.pop(ofxFile)
+                key = (sitename, acct_num)
+                if dt > self.marks.get(key, ''):
+                    self.marks[key] = dt
+                    changed = True
+            if changed: self.save()
+        finally:
+            self.lock.release()
+
+    def save(self):
+        tmp = self.filename + '.tmp'
+        try:
+            f = open(tmp, 'wb')
+            cPickle.dump(self.marks, f, 2)
+            f.close()
+            if os.path.exists(self.filename): os.remove(self.filename)
+            os.rename(tmp, self.filename)
+        except Exception as inst:
+            print "** Could not save", self.filename, ":", inst
+
+def statementDate(content):
+    #return the latest statement date (YYYYMMDD) in an ofx message, or None.  Never later than today
+    dates = _dtEnd.findall(content) or _dtTran.findall(content)
+    if not dates: return None
+    return min(max(dates), time.strftime("%Y%m%d"))
+
+def startDate(mark, overlap, minInterval=0, maxDays=0):
+    #return the DTSTART (YYYYMMDD) for a request following mark, going back overlap days.
+    #the window is never shorter than minInterval days, or longer than maxDays (0 = no limit)
+    t = time.mktime(time.strptime(mark, "%Y%m%d")) - overlap*86400
+    now = time.time()
+    if minInterval:
+        t = min(t, now - minInterval*86400)
+    if maxDays:
+        t = max(t, now - maxDays*86400)
+    return time.strftime("%Y%m%d", time.localtime(t))
+
+_marks = None
+_marksLock = threading.Lock()
+
+def imported(ofxFiles):
+    #the statements in ofxFiles were sent to Money: save their marks
+    if _marks is not None: _marks.commit(ofxFiles)
+
+def marks():
+    #return the process-wide HighWater object
+    global _marks
+    _marksLock.acquire()
+    try:
+        if _marks is None: _marks = HighWater(highWaterFile)
+        return _marks
+    finally:
+        _marksLock.release()
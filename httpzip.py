@@ -0,0 +1,103 @@
+# httpzip.py
+# http://sites.google.com/site/pocketsense/
+# compressed (gzip/deflate) HTTP replies for OFX downloads, and a byte counter for the transfers
+# Intial version: nt: Oct-2026
+
+# Notes
+# -----
+#   - Used for sites with "compress: Yes" in sites.dat.  The request asks for gzip or deflate
+#     (Accept-Encoding), and the reply is decompressed as it's read, based on its Content-Encoding.
+#     A server that ignores the request just sends the reply uncompressed.
+#   - The OFX header still says COMPRESSION:NONE.  OFX 1.x doesn't define any other value, so
+#     compression is negotiated by HTTP only.
+#   - "deflate" is supposed to be a zlib stream, but some servers send raw deflate data.  Both work.
+#   - counter keeps the bytes received (wire) and the bytes after decompression (decoded) for
+#     every reply in the process.  Used by OFXClient.doQuery() and the asyncofx transport.
+
+import zlib, threading, cStringIO
+
+def acceptEncoding(site):
+    #Accept-Encoding header value for a site entry
+    if site.get('COMPRESS'): return "gzip, deflate"
+    return "identity"
+
+class Decoder:
+    """Decompress an HTTP body a piece at a time, for the given Content-Encoding"""
+
+    def __init__(self, encoding):
+        self.encoding = (encoding or 'identity').strip().lower()
+        self.z = None
+        self.pending = ''       #deflate: start of the body, until we know whether it's zlib or raw
+        if self.encoding in ('gzip', 'x-gzip'):
+            self.z = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding not in ('identity', 'deflate'):
+            raise Exception("Unsupported Content-Encoding in server reply: " + encoding)
+
+    def decode(self, data):
+        #return the decoded bytes for the next piece of the body
+        if self.z is None:
+            if self.encoding == 'identity': return data
+            self.pending += data
+            if len(self.pending) < 2: return ''
+            data, self.pending = self.pending, ''
+            #zlib header: compression method 8, and (CMF*256 + FLG) a multiple of 31
+            cmf, flg = ord(data[0]), ord(data[1])
+            if cmf & 0x0f == 8 and (cmf*256 + flg) % 31 == 0:
+                self.z = zlib.decompressobj()
+            else:
+                self.z = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self.z.decompress(data)
+
+    def flush(self):
+        #return whatever is left, at the end of the body
+        if self.z is None:
+            data, self.pending = self.pending, ''
+            if data: data = zlib.decompress(data, -zlib.MAX_WBITS)     #1-byte deflate body
+            return data
+        return self.z.flush()
+
+class ByteCounter:
+    """Bytes received vs bytes decoded, for every reply"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.replies = 0
+        self.compressed = 0     #replies that came back compressed
+        self.wire = 0
+        self.decoded = 0
+
+    def add(self, wire, decoded, encoding):
+        self.lock.acquire()
+        try:
+            self.replies += 1
+            if encoding <> 'identity': self.compressed += 1
+            self.wire += wire
+            self.decoded += decoded
+        finally:
+            self.lock.release()
+
+    def stats(self):
+        ratio = ''
+        if self.wire and self.decoded > self.wire:
+            ratio = " ({0:.1f}x)".format(float(self.decoded) / self.wire)
+        return "Transfer: {0} replies ({1} compressed), {2} bytes received, {3} bytes decoded{4}".format(
+               self.replies, self.compressed, self.wire, self.decoded, ratio)
+
+#process-wide counter
+counter = ByteCounter()
+
+def readBody(response, chunkSize=65536):
+    #read and decode the body of an httplib.HTTPResponse, a chunk at a time.  The sizes are added to counter.
+    #returns (body, bytes received)
+    d = Decoder(response.getheader('content-encoding'))
+    buf = cStringIO.StringIO()
+    wire = 0
+    while True:
+        data = response.read(chunkSize)
+        if not data: break
+        wire += len(data)
+        buf.write(d.decode(data))
+    buf.write(d.flush())
+    body = buf.getvalue()
+    counter.add(wire, len(body), d.encoding)
+    return body, wire
@@ -0,0 +1,126 @@
+# latency.py
+# http://sites.google.com/site/pocketsense/
+# connect and response times recorded for each site, and the download timeouts derived from them
+# Intial version: nt: Oct-2026
+
+# Notes
+# -----
+#   - Each request records how long the server took to accept the connection (TCP connect and TLS
+#     handshake), and how long it took to start its reply once the request was sent.  The last
+#     HistorySize samples for each site are kept in latencyFile (control2.py), across runs.
+#   - Once a site has MinSamples samples, its timeout is Factor x the 95th percentile, plus a margin,
+#     kept within the limits below.  Until then, the defaults are used (5 secs to connect, 30 to reply).
+#   - A request that times out is recorded at its timeout, so a site that's slower than its timeout
+#     gets a longer one on the next run (up to the limit).
+#   - connectTimeout and readTimeout in a sites.dat site entry override the recorded history.
+#   - Samples are kept in memory during the run, and save() writes the file once, after the downloads
+#     (ofx.getOFXList, and the Setup.py account test).
+#   - Safe to use from several download threads.
+
+import os, math, errno, socket, ssl, threading, cPickle
+from control2 import *
+
+DefaultTimeouts = (5.0, 30.0)       #(connect, response) secs, until a site has MinSamples
+ConnectLimits   = (2.0, 15.0)       #(min, max) secs
+ResponseLimits  = (10.0, 120.0)
+Margins         = (1.0, 5.0)        #secs added to (connect, response) timeouts
+Factor          = 2.0
+Percentile      = 95
+HistorySize     = 20
+MinSamples      = 3
+
+def percentile(samples, p):
+    #nearest-rank percentile of a list of numbers
+    s = sorted(samples)
+    return s[max(0, int(math.ceil(p / 100.0 * len(s))) - 1)]
+
+#python 2's _ssl module reports a timeout as an SSLError with one of these messages (no errno)
+_sslTimeouts = ['The read operation timed out', 'The write operation timed out', 'The handshake operation timed out']
+
+def timedOut(inst):
+    #did the exception come from a socket timeout?
+    if isinstance(inst, socket.timeout): return True
+    if isinstance(inst, ssl.SSLError) and inst.errno is None:
+        return len(inst.args) == 1 and inst.args[0] in _sslTimeouts
+    return getattr(inst, 'errno', None) == errno.ETIMEDOUT
+
+class LatencyHistory:
+    """Recent connect and response times (secs) for each site"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.samples = {}       #sitename: {'connect': [secs, ...], 'response': [secs, ...]}
+        self.changed = False    #samples added since the file was read or saved
+        try:
+            f = open(filename, 'rb')
+            try:
+                self.samples = cPickle.load(f)
+            finally:
+                f.close()
+        except Exception:
+            pass                #no history yet: default timeouts
+
+    def _timeout(self, samples, default, limits, margin):
+        if len(samples) < MinSamples: return default
+        t = percentile(samples, Percentile) * Factor + margin
+        return min(max(t, limits[0]), limits[1])
+
+    def timeouts(self, sitename, site):
+        #return (connect, response) timeouts for a site
+        self.lock.acquire()
+        try:
+            hist = self.samples.get(sitename, {})
+            connect = self._timeout(hist.get('connect', []), DefaultTimeouts[0], ConnectLimits, Margins[0])
+            response = self._timeout(hist.get('response', []), DefaultTimeouts[1], ResponseLimits, Margins[1])
+        finally:
+            self.lock.release()
+        return (FieldVal(site, 'CONNECTTIMEOUT') or connect, FieldVal(site, 'READTIMEOUT') or response)
+
+    def record(self, sitename, connect=None, response=None):
+        #add the times for one request (None = not measured, e.g. a reused connection)
+        if connect is None and response is None: return
+        self.lock.acquire()
+        try:
+            hist = self.samples.setdefault(sitename, {})
+            for kind, secs in (('connect', connect), ('response', response)):
+                if secs is not None:
+                    hist[kind] = (hist.get(kind, []) + [round(secs, 3)])[-HistorySize:]
+                    self.changed = True
+        finally:
+            self.lock.release()
+
+    def save(self):
+        #write the file, if any samples were added
+        self.lock.acquire()
+        try:
+            if not self.changed: return
+            tmp = self.filename + '.tmp'
+            try:
+                f = open(tmp, 'wb')
+                cPickle.dump(self.samples, f, 2)
+                f.close()
+                if os.path.exists(self.filename): os.remove(self.filename)
+                os.rename(tmp, self.filename)
+                self.changed = False
+            except Exception as inst:
+                print "** Could not save", self.filename, ":", inst
+        finally:
+            self.lock.release()
+
+_history = None
+_historyLock = threading.Lock()
+
+def save():
+    #save the process-wide history, if it was used
+    if _history is not None: _history.save()
+
+def history():
+    #return the process-wide LatencyHistory object
+    global _history
+    _historyLock.acquire()
+    try:
+        if _history is None: _history = LatencyHistory(latencyFile)
+        return _history
+    finally:
+        _historyLock.release()
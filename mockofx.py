@@ -0,0 +1,469 @@
+# mockofx.py
+# http://sites.google.com/site/pocketsense/
+# local stand-in for bank OFX servers, and a load driver for the download path
+# Intial version: nt: Oct-2026
+
+# Usage:
+#   mockofx.py serve [name=value ...]
+#       Runs a mock OFX server on https://localhost:<port>/ofx until Ctrl-C.  To use it from
+#       Getdata.py, add a site entry with that url, and set SSL_CERT_FILE to the certificate file
+#       so the connection is trusted.
+#   mockofx.py load [name=value ...]
+#       Starts <sites> mock servers (one per site entry, on their own ports), downloads <accounts>
+#       accounts from them with ofx.getOFXList() (getOFX for each account, or the asyncofx transport),
+#       and reports throughput and the p50/p95/p99 request latency.
+#   mockofx.py check [name=value ...]
+#       Checks that a profiled download (profiler.py) leaves download.hwm and fitid.db unchanged,
+#       and that a download sent to Money (ofx.imported) does change them.  Runs in a temp directory.
+#
+#   Server options:
+#       port=8443       first port (0 = any free port, the default for load)
+#       latency=0.2     secs the server takes to assemble a statement, plus...
+#       jitter=0.1      ...a random (exponential) delay with this mean, for a long tail
+#       rate=0          max bytes/sec for each reply (0 = no limit)
+#       totalrate=0     max bytes/sec for all replies from a server together
+#       errors=0        fraction of requests answered with HTTP 500
+#       severity=0      fraction answered with an OFX <SEVERITY>ERROR status
+#       resets=0        fraction where the connection is reset instead of answered
+#       hangs=0         fraction where the server waits <hang> secs before answering
+#       hang=60
+#       trans=200       transactions per statement
+#       cert=mockofx.pem  server certificate and key.  Created (self-signed, with openssl) if missing
+#   Load options:
+#       accounts=50 sites=4 workers=8 perhost=2 async=No compress=No interval=30
+#       connecttimeout=0 readtimeout=0  (site entry timeouts.  0 = from the latency history)
+#       verbose=No      show the getOFX output
+#       keep=No         keep the downloaded statements in xfrdir
+#
+# Notes
+# -----
+#   - Requests are read as OFX: the statement type (bank, credit card, investment or account info),
+#     TRNUID, ACCTID and DTSTART are taken from the request and used in the reply.  Statements come
+#     from the benchmark.py generators.
+#   - Keep-alive connections (connpool) and gzip replies (compress: Yes) are supported.
+#   - The load driver uses its own latency history (mockLatencyFile), so the real sites' timeouts
+#     aren't affected.  Account settings and sites.dat aren't changed.
+#   - Example:  mockofx.py load accounts=200 workers=20 latency=0.5 jitter=1 resets=0.02
+
+import os, sys, re, time, random, socket, struct, ssl, zlib, glob, shutil, hashlib, tempfile, threading, subprocess
+import BaseHTTPServer, SocketServer
+import benchmark
+from control2 import *
+
+mockLatencyFile = 'mockofx.hist'
+
+Defaults = {'port': 8443, 'latency': 0.2, 'jitter': 0.1, 'rate': 0.0, 'totalrate': 0.0,
+            'errors': 0.0, 'severity': 0.0, 'resets': 0.0, 'hangs': 0.0, 'hang': 60.0,
+            'trans': 200, 'cert': 'mockofx.pem',
+            'accounts': 50, 'sites': 4, 'workers': 8, 'perhost': 2, 'async': False, 'compress': False,
+            'interval': 30, 'connecttimeout': 0.0, 'readtimeout': 0.0, 'verbose': False, 'keep': False}
+
+_kindRe    = re.compile(r'<(STMTRQ|CCSTMTRQ|INVSTMTRQ|ACCTINFORQ)>', re.IGNORECASE)
+_trnuidRe  = re.compile(r'<TRNUID>\s*([^<\s]+)', re.IGNORECASE)
+_acctidRe  = re.compile(r'<ACCTID>\s*([^<\s]+)', re.IGNORECASE)
+_dtstartRe = re.compile(r'<DTSTART>\s*(\d{8})', re.IGNORECASE)
+
+def options(args, **defaults):
+    #return the options dict for a list of name=value arguments.  defaults = changes to Defaults
+    opts = dict(Defaults)
+    opts.update(defaults)
+    for arg in args:
+        name, sep, value = arg.partition('=')
+        name = name.lower()
+        if not sep or name not in Defaults:
+            raise Exception("Unknown option: " + arg)
+        default = Defaults[name]
+        if isinstance(default, bool): opts[name] = value[:1].upper() == 'Y'
+        elif isinstance(default, int): opts[name] = int(value)
+        elif isinstance(default, float): opts[name] = float(value)
+        else: opts[name] = value
+    return opts
+
+def certFile(filename):
+    #return filename, after creating a self-signed certificate + key for localhost in it, if needed
+    if glob.glob(filename) == []:
+        print "Creating a self-signed certificate for localhost:", filename
+        key, crt = filename + '.key', filename + '.crt'
+        subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '3650',
+                               '-subj', '/CN=localhost', '-keyout', key, '-out', crt])
+        f = open(filename, 'w')
+        for name in [key, crt]:
+            g = open(name)
+            f.write(g.read())
+            g.close()
+            os.remove(name)
+        f.close()
+    return filename
+
+class Throttle:
+    """Limit the bytes/sec written by everything that shares it (rate 0 = no limit)"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.next = time.time()
+        self.lock = threading.Lock()
+
+    def wait(self, nbytes):
+        if self.rate <= 0: return
+        self.lock.acquire()
+        try:
+            now = time.time()
+            self.next = max(now, self.next) + nbytes / float(self.rate)
+            delay = self.next - now
+        finally:
+            self.lock.release()
+        time.sleep(delay)
+
+class Statements:
+    """Generated statements (one per kind), with the values from each request filled in"""
+
+    def __init__(self, ntrans):
+        self.ntrans = ntrans
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def _template(self, kind):
+        self.lock.acquire()
+        try:
+            if kind not in self.cache:
+                gen = {'STMTRQ': benchmark.bankStatement, 'CCSTMTRQ': benchmark.discoverStatement,
+                       'INVSTMTRQ': benchmark.invStatement}[kind]
+                self.cache[kind] = gen(self.ntrans)
+            return self.cache[kind]
+        finally:
+            self.lock.release()
+
+    def reply(self, request):
+        #return the OFX reply for an OFX request (None if it isn't a request we know)
+        m = _kindRe.search(request)
+        if not m: return None
+        kind = m.group(1).upper()
+        trnuid = _trnuidRe.search(request)
+        trnuid = trnuid and trnuid.group(1) or '1'
+        if kind == 'ACCTINFORQ':
+            return acctInfo(trnuid)
+        ofx = self._template(kind)
+        ofx = ofx.replace('<TRNUID>1<', '<TRNUID>' + trnuid + '<', 1)
+        acctid = _acctidRe.search(request)
+        if acctid: ofx = _acctidRe.sub('<ACCTID>' + acctid.group(1), ofx, 1)
+        dtstart = _dtstartRe.search(request)
+        if dtstart: ofx = _dtstartRe.sub('<DTSTART>' + dtstart.group(1), ofx, 1)
+        return ofx
+
+def acctInfo(trnuid, naccts=3):
+    #account information reply (the request Setup.py sends to list a site's accounts)
+    accts = ''.join('<ACCTINFO><DESC>Account %d<BANKACCTINFO><BANKACCTFROM><BANKID>123456789<ACCTID>%010d'
+                    '<ACCTTYPE>CHECKING</BANKACCTFROM><SUPTXDL>Y<XFERSRC>N<XFERDEST>N<SVCSTATUS>ACTIVE'
+                    '</BANKACCTINFO></ACCTINFO>\r\n' % (n, n) for n in range(naccts))
+    return ('OFXHEADER:100\r\nDATA:OFXSGML\r\nVERSION:102\r\n\r\n<OFX><SIGNONMSGSRSV1><SONRS>'
+            '<STATUS><CODE>0<SEVERITY>INFO</STATUS><DTSERVER>20101231120000<LANGUAGE>ENG</SONRS></SIGNONMSGSRSV1>'
+            '<SIGNUPMSGSRSV1><ACCTINFOTRNRS><TRNUID>' + trnuid + '<STATUS><CODE>0<SEVERITY>INFO</STATUS>' +
+            '<ACCTINFORS><DTACCTUP>20100101\r\n' + accts + '</ACCTINFORS></ACCTINFOTRNRS></SIGNUPMSGSRSV1></OFX>\r\n')
+
+def severityError():
+    #an OFX reply with an error status (general error), as some servers send when they're busy
+    return ('OFXHEADER:100\r\nDATA:OFXSGML\r\nVERSION:102\r\n\r\n<OFX><SIGNONMSGSRSV1><SONRS>'
+            '<STATUS><CODE>2000<SEVERITY>ERROR<MESSAGE>General error (mock)</STATUS>'
+            '<DTSERVER>20101231120000<LANGUAGE>ENG</SONRS></SIGNONMSGSRSV1></OFX>\r\n')
+
+class MockHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'       #keep-alive, like a real bank server
+
+    def do_POST(self):
+        srv = self.server
+        opts = srv.opts
+        n = int(self.headers.get('content-length', 0))
+        request = self.rfile.read(n)
+        srv.count('requests')
+
+        #server "assembling the statement"
+        delay = opts['latency']
+        if opts['jitter'] > 0: delay += srv.rnd.expovariate(1.0 / opts['jitter'])
+
+        #faults
+        r = srv.rnd.random()
+        for fault in ['resets', 'errors', 'severity', 'hangs']:
+            if r < opts[fault]: break
+            r -= opts[fault]
+        else:
+            fault = None
+        if fault == 'hangs':
+            srv.count('hangs')
+            delay = opts['hang']
+        time.sleep(delay)
+
+        if fault == 'resets':
+            srv.count('resets')
+            self.reset()
+            return
+        if fault == 'errors':
+            srv.count('errors')
+            self.send('HTTP 500 (mock)', 500, 'text/plain')
+            return
+        if fault == 'severity':
+            srv.count('severity')
+            self.send(severityError())
+            return
+        body = srv.statements.reply(request)
+        if body is None:
+            srv.count('errors')
+            self.send('Not an OFX request', 400, 'text/plain')
+        else:
+            self.send(body)
+
+    def send(self, body, code=200, ctype='application/x-ofx'):
+        encoding = None
+        if 'gzip' in self.headers.get('accept-encoding', ''):
+            z = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            body = z.compress(body) + z.flush()
+            encoding = 'gzip'
+        self.send_response(code)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding: self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+
+        throttle = Throttle(self.server.opts['rate'])
+        for i in range(0, len(body), 16384):
+            chunk = body[i:i+16384]
+            throttle.wait(len(chunk))
+            self.server.throttle.wait(len(chunk))
+            self.wfile.write(chunk)
+        self.server.count('bytes', len(body))
+
+    def reset(self):
+        #drop the connection with a TCP reset (no reply, no TLS close)
+        self.close_connection = 1
+        try:
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            self.connection.close()
+        except Exception:
+            pass
+
+    def finish(self):
+        try:
+            BaseHTTPServer.BaseHTTPRequestHandler.finish(self)
+        except Exception:
+            pass        #connection already reset or closed by the client
+
+    def log_message(self, *args):
+        pass
+
+class MockServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Mock OFX server.  Each connection is handled (and its TLS handshake done) on its own thread"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port, opts):
+        BaseHTTPServer.HTTPServer.__init__(self, ('localhost', port), MockHandler)
+        self.opts = opts
+        self.rnd = random.Random()
+        self.statements = Statements(opts['trans'])
+        self.throttle = Throttle(opts['totalrate'])
+        self.context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        self.context.load_cert_chain(certFile(opts['cert']))
+        self.stats = {'requests': 0, 'errors': 0, 'severity': 0, 'resets': 0, 'hangs': 0, 'bytes': 0}
+        self.lock = threading.Lock()
+
+    def url(self):
+        return 'https://localhost:%d/ofx' % self.server_address[1]
+
+    def count(self, name, n=1):
+        self.lock.acquire()
+        self.stats[name] += n
+        self.lock.release()
+
+    def finish_request(self, request, client_address):
+        request = self.context.wrap_socket(request, server_side=True)
+        BaseHTTPServer.HTTPServer.finish_request(self, request, client_address)
+
+    def handle_error(self, request, client_address):
+        pass        #client went away, failed handshake, etc.
+
+def startServers(opts, n=1):
+    #start n servers (on consecutive ports from opts['port'], or any free ports if port=0)
+    servers = []
+    for i in range(n):
+        s = MockServer(opts['port'] and opts['port'] + i, opts)
+        t = threading.Thread(target=s.serve_forever)
+        t.daemon = True
+        t.start()
+        servers.append(s)
+    return servers
+
+def stopServers(servers, wait=2.0):
+    #stop the servers, and give the handler threads a moment to see their connections close
+    import connpool
+    connpool.pool.closeAll()
+    for s in servers:
+        s.shutdown()
+        s.server_close()
+    deadline = time.time() + wait
+    for t in threading.enumerate():
+        if t.daemon and t is not threading.current_thread():
+            t.join(max(0, deadline - time.time()))
+
+def serve(opts):
+    s = startServers(opts)[0]
+    print "Mock OFX server:", s.url()
+    print "Certificate:", os.path.realpath(opts['cert']), " (set SSL_CERT_FILE to this file in the client)"
+    print "Ctrl-C to stop"
+    try:
+        while True: time.sleep(1)
+    except KeyboardInterrupt:
+        print s.stats
+
+def mockAccounts(userdat, servers, opts):
+    #add a MOCKn site entry for each server to userdat, and return opts['accounts'] accounts spread over them
+    types = [('BASTMT', 'CHECKING'), ('CCSTMT', 'CREDITCARD'), ('INVSTMT', 'INVESTMENT')]
+    for n, s in enumerate(servers):
+        userdat.sites['MOCK%d' % n] = {
+            'FIORG': 'Mock', 'FID': str(1000 + n), 'URL': s.url(), 'BANKID': '123456789',
+            'BROKERID': 'broker.example', 'OFXVER': '102', 'APPID': DefaultAppID, 'APPVER': DefaultAppVer,
+            'MININTERVAL': 0, 'TIMEOFFSET': 0.0, 'SCRUB': '', 'COMPRESS': opts['compress'],
+            'CONNECTTIMEOUT': opts['connecttimeout'], 'READTIMEOUT': opts['readtimeout'],
+            'CAPS': ['SIGNON', types[n % 3][0]]}
+    return [['MOCK%d' % (i % len(servers)), '%010d' % i, types[(i % len(servers)) % 3][1], 'user', 'pass']
+            for i in range(opts['accounts'])]
+
+class _Null:
+    def write(self, text): pass
+
+def load(opts):
+    #download opts['accounts'] accounts from opts['sites'] mock servers, and report the results
+    import ofx, site_cfg, latency, timing, connpool
+
+    os.environ['SSL_CERT_FILE'] = os.path.realpath(certFile(opts['cert']))   #trust the mock servers
+    latency._history = latency.LatencyHistory(mockLatencyFile)
+    servers = startServers(opts, opts['sites'])
+
+    userdat = site_cfg.shared_cfg()
+    userdat.downloadWorkers = opts['workers']
+    userdat.maxPerHost = opts['perhost']
+    userdat.asyncDownloads = opts['async']
+    userdat.incrementalDownloads = False
+    userdat.fitidFilter = False
+    userdat.quietScrub = True
+    AcctArray = mockAccounts(userdat, servers, opts)
+
+    print "Downloading", len(AcctArray), "accounts from", len(servers), "mock servers,", opts['workers'], "at a time",
+    print opts['async'] and "(asyncofx)" or "(getOFX)"
+    stdout = sys.stdout
+    if not opts['verbose']: sys.stdout = _Null()
+    t = time.time()
+    try:
+        results = ofx.getOFXList(AcctArray, opts['interval'])
+    finally:
+        sys.stdout = stdout
+    elapsed = time.time() - t
+
+    #request latency = connect + tls + send + wait + read, for each account that got a reply
+    latencies = []
+    received = 0
+    for unit in timing.run.units:
+        phases = dict((p, (secs, nbytes)) for p, secs, nbytes in unit.phases)
+        if 'read' in phases:
+            latencies.append(sum(phases.get(p, (0, 0))[0] for p in ['connect', 'tls', 'send', 'wait', 'read']))
+            received += phases['read'][1]
+    ok = len([r for r in results if r[0]])
+
+    print "  Accounts: %d ok, %d failed, in %.2f secs (%.1f accounts/sec)" % (ok, len(results) - ok, elapsed, len(results) / elapsed)
+    print "  Received: %.2f MB (%.2f MB/sec)" % (received / 1e6, received / 1e6 / elapsed)
+    if latencies:
+        print "  Request latency: p50 %.3f  p95 %.3f  p99 %.3f  max %.3f secs" % (latency.percentile(latencies, 50),
+              latency.percentile(latencies, 95), latency.percentile(latencies, 99), max(latencies))
+    totals = {}
+    for s in servers:
+        for k, v in s.stats.items(): totals[k] = totals.get(k, 0) + v
+    print "  Servers: %(requests)d requests, %(errors)d HTTP errors, %(severity)d SEVERITY errors, %(resets)d resets, %(hangs)d hangs" % totals
+    if not opts['async']: print "  " + connpool.pool.stats()
+
+    if not opts['keep']:
+        for ofxFile in glob.glob(xfrdir + 'MOCK*.ofx'): os.remove(ofxFile)
+    stopServers(servers)
+    return results
+
+def _digest(filename):
+    #md5 of a file's contents ('' if it doesn't exist)
+    if not os.path.exists(filename): return ''
+    f = open(filename, 'rb')
+    try:
+        return hashlib.md5(f.read()).hexdigest()
+    finally:
+        f.close()
+
+def check(opts):
+    #a profiled download mustn't change download.hwm or fitid.db (its statements aren't imported).
+    #a download that's sent to Money must.  returns True if both hold
+    import ofx, site_cfg, profiler, highwater, fitidindex
+
+    opts = dict(opts, cert=os.path.realpath(certFile(opts['cert'])))     #before the chdir
+    os.environ['SSL_CERT_FILE'] = opts['cert']
+    home = os.getcwd()
+    tmp = tempfile.mkdtemp()
+    os.chdir(tmp)
+    servers = startServers(opts, opts['sites'])
+    stdout = sys.stdout
+    try:
+        os.mkdir(xfrdir)
+        userdat = site_cfg.shared_cfg()
+        userdat.downloadWorkers = opts['workers']
+        userdat.asyncDownloads = opts['async']
+        userdat.incrementalDownloads = True
+        userdat.fitidFilter = True
+        userdat.quietScrub = True
+        AcctArray = mockAccounts(userdat, servers, opts)
+
+        #files from an earlier run: an old mark, and a FITID that isn't in the mock statements
+        marks = highwater.HighWater(highWaterFile)
+        marks.marks[(AcctArray[0][0], AcctArray[0][1])] = '20000101'
+        marks.save()
+        index = fitidindex.FitidIndex(fitidIndexFile)
+        index.add(AcctArray[0][0], AcctArray[0][1], ['OLD-FITID'])
+        index.close()
+        before = (_digest(highWaterFile), _digest(fitidIndexFile))
+
+        def download(profile):
+            if not opts['verbose']: sys.stdout = _Null()
+            try:
+                prof = None
+                if profile:
+                    prof = profiler.RunProfile(os.path.join(tmp, getdataProfFile), '')
+                    prof.start()
+                results = ofx.getOFXList(AcctArray, opts['interval'])
+                if prof: prof.stop()
+                ofx.imported([f for ok, f in results if ok])    #as if they'd been sent (profiled: nothing staged)
+            finally:
+                sys.stdout = stdout
+            return len([r for r in results if r[0]])
+
+        ok = download(True)
+        profiled = (_digest(highWaterFile), _digest(fitidIndexFile))
+        print "Profiled run:  %d of %d accounts ok, download.hwm %s, fitid.db %s" % (ok, len(AcctArray),
+              profiled[0] == before[0] and "unchanged" or "CHANGED", profiled[1] == before[1] and "unchanged" or "CHANGED")
+        ok2 = download(False)
+        imported = (_digest(highWaterFile), _digest(fitidIndexFile))
+        print "Imported run:  %d of %d accounts ok, download.hwm %s, fitid.db %s" % (ok2, len(AcctArray),
+              imported[0] <> before[0] and "updated" or "NOT UPDATED", imported[1] <> before[1] and "updated" or "NOT UPDATED")
+        passed = ok == ok2 == len(AcctArray) and profiled == before and \
+                 imported[0] <> before[0] and imported[1] <> before[1]
+        print passed and "PASSED" or "FAILED"
+        return passed
+    finally:
+        sys.stdout = stdout
+        stopServers(servers)
+        fitidindex._index = None
+        highwater._marks = None
+        os.chdir(home)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__=="__main__":
+    if len(sys.argv) < 2 or sys.argv[1].lower() not in ['serve', 'load', 'check']:
+        print "Usage: mockofx.py serve|load|check [name=value ...]   (see mockofx.py for the options)"
+        sys.exit(1)
+    if sys.argv[1].lower() == 'serve':
+        serve(options(sys.argv[2:]))
+    elif sys.argv[1].lower() == 'check':
+        sys.exit(not check(options(sys.argv[2:], port=0, accounts=6)) and 1 or 0)
+    else:
+        load(options(sys.argv[2:], port=0))
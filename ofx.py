@@ -48,8 +48,35 @@
 #     The appended "version" is stripped from the account# before passing 
 #     to the bank, but is used when sending the results to Money.  
 
-import time, os, sys, httplib, urllib2, glob, random
-import getpass, scrubber, site_cfg
+# 17Oct2026*nt
+#   - Added getOFXList() to download several accounts at once (DownloadWorkers and MaxPerHost in sites.dat)
+#     Results are returned in account order, so files are still sent to Money in the same sequence.
+#   - OFXClient works on a copy of the site entry, since accounts for the same site may now run in parallel
+#   - Split getOFX() into the OFXDownload steps (setup, query, check) so the same steps can feed the 
+#     asyncofx transport.  AsyncDownloads: Yes in sites.dat sends all requests from one thread.
+#   - doQuery() reuses keep-alive connections from connpool, so accounts on the same server share
+#     one TCP/TLS session
+#   - Use the shared site_cfg object (site_cfg.shared_cfg()), rather than parsing sites.dat at import
+#   - Added incremental downloads (IncrementalDownloads in sites.dat): each account's request starts
+#     at the latest statement date sent to Money last time (see highwater.py)
+#   - Added FitidFilter option: transactions already downloaded by an earlier run are removed from
+#     the statement after it's scrubbed (see fitidindex.py).  The index is updated once the file is
+#     sent to Money (imported()).  Setup.py tests (getOFX() defaults) don't use the filter.
+#   - The reply is kept in memory from doQuery() through the ACCTID substitution, validation and
+#     scrubber, and written to xfrdir once.  The statement is no longer converted to upper case
+#     when an account uses a ":xx" version.  If a reply fails validation, it's saved as received.
+#   - OFXClient writes requests with rlib1.OfxEmitter, rather than nesting OfxTag() strings
+#   - Added compress option for site entries: ask the server for a gzip/deflate reply, and decompress
+#     it as it's read (see httpzip.py).  Bytes received vs decoded are shown after the downloads.
+#   - Connect and response timeouts are set for each site from the times recorded on earlier runs,
+#     instead of a fixed 5 and 30 secs (see latency.py).  connectTimeout and readTimeout in a site
+#     entry override them.
+#   - Each download records the time spent (and bytes handled) in each phase, from the connection
+#     to the file write.  Getdata.py saves them at the end of the run (see timing.py)
+#   - Each account download can be profiled on its own (Getdata.py --profile=<acct>, see profiler.py)
+
+import time, os, sys, httplib, urllib2, glob, random, threading, socket, re, cStringIO
+import getpass, scrubber, site_cfg, asyncofx, connpool, highwater, fitidindex, httpzip, latency, timing, profiler
 from rlib1 import *
 from control2 import *
 
@@ -60,97 +87,125 @@ if Debug:
 join = str.join
 argv = sys.argv
 
-#define some globals
-userdat = site_cfg.site_cfg()
-                                               
+#validation checks (white-space is allowed between the parts of a tag)
+_headerRe   = re.compile(r'OFXHEADER\s*:|<\s*/?\s*OFX\s*>', re.IGNORECASE)
+_errorRe    = re.compile(r'<\s*SEVERITY\s*>\s*ERROR', re.IGNORECASE)
+_invposRe   = re.compile(r'<\s*INVPOS\s*>', re.IGNORECASE)
+_seclistRe  = re.compile(r'<\s*SECLIST\s*>', re.IGNORECASE)
+
 class OFXClient:
     """Encapsulate an ofx client, site is a dict containg siteuration"""
-    def __init__(self, site, user, password):
+    def __init__(self, site, user, password, sitename=''):
         self.password = password
         self.status = True
         self.user = user
-        self.site = site
+        self.sitename = sitename or FieldVal(site,"url")     #key for the site's latency history
+        self.phases = timing.Phases(self.sitename)              #doQuery() timings (see timing.py)
+        self.site = dict(site)      #private copy.  the shared site entry may be in use by another download
         self.ofxver = FieldVal(site,"ofxver")
         self.cookie = 3
-        site["USER"] = user
-        site["PASSWORD"] = password
+        self.site["USER"] = user
+        self.site["PASSWORD"] = password
 
     def _cookie(self):
         self.cookie += 1
         return str(self.cookie)
 
+    def _query(self, request, *args):
+        #return the OFX header and message for request(emitter, *args)
+        buf = cStringIO.StringIO()
+        buf.write(self._header() + "\r\n")
+        e = OfxEmitter(buf)
+        e.open("OFX")
+        self._signOn(e)
+        request(e, *args)
+        e.close("OFX")
+        e.done()
+        return buf.getvalue()
+
     """Generate signon message"""
-    def _signOn(self):
+    def _signOn(self, e):
         site = self.site
-
-        clientuid=""
+        e.open("SIGNONMSGSRQV1")
+        e.open("SONRQ")
+        e.field("DTCLIENT",OfxDate())
+        e.field("USERID",FieldVal(site,"USER"))
+        e.field("USERPASS",FieldVal(site,"PASSWORD"))
+        e.field("LANGUAGE","ENG")
+        e.open("FI")
+        e.field("ORG",FieldVal(site,"fiorg"))
+        e.field("FID",FieldVal(site,"fid"))
+        e.close("FI")
+        e.field("APPID",FieldVal(site,"APPID"))
+        e.field("APPVER",FieldVal(site,"APPVER"))
         if "103" in self.ofxver: 
             #include clientuid field only if version=103, otherwise the server may reject the request
-            clientuid = OfxField("CLIENTUID",userdat.clientuid)
-        
-        fidata = [OfxField("ORG",FieldVal(site,"fiorg"))]
-        fidata += [OfxField("FID",FieldVal(site,"fid"))]
-        return OfxTag("SIGNONMSGSRQV1",
-                    OfxTag("SONRQ",
-                    OfxField("DTCLIENT",OfxDate()),
-                    OfxField("USERID",FieldVal(site,"USER")),
-                    OfxField("USERPASS",FieldVal(site,"PASSWORD")),
-                    OfxField("LANGUAGE","ENG"),
-                    OfxTag("FI", *fidata),
-                    OfxField("APPID",FieldVal(site,"APPID")),
-                    OfxField("APPVER",FieldVal(site,"APPVER")),
-                    clientuid
-                    ))
-
-    def _acctreq(self, dtstart):
-        req = OfxTag("ACCTINFORQ",OfxField("DTACCTUP",dtstart))
-        return self._message("SIGNUP","ACCTINFO",req)
-
-    def _bareq(self, bankid, acctid, dtstart, acct_type):
-        site=self.site
-        req = OfxTag("STMTRQ",
-                OfxTag("BANKACCTFROM",
-                OfxField("BANKID",bankid),
-                OfxField("ACCTID",acctid),
-                OfxField("ACCTTYPE",acct_type)),
-                OfxTag("INCTRAN",
-                OfxField("DTSTART",dtstart),
-                OfxField("INCLUDE","Y"))
-                )
-        return self._message("BANK","STMT",req)
+            e.field("CLIENTUID",site_cfg.shared_cfg().clientuid)
+        e.close("SONRQ")
+        e.close("SIGNONMSGSRQV1")
+
+    def _acctreq(self, e, dtstart):
+        self._openMessage(e,"SIGNUP","ACCTINFO")
+        e.open("ACCTINFORQ")
+        e.field("DTACCTUP",dtstart)
+        e.close("ACCTINFORQ")
+        self._closeMessage(e,"SIGNUP","ACCTINFO")
+
+    def _bareq(self, e, bankid, acctid, dtstart, acct_type):
+        self._openMessage(e,"BANK","STMT")
+        e.open("STMTRQ")
+        e.open("BANKACCTFROM")
+        e.field("BANKID",bankid)
+        e.field("ACCTID",acctid)
+        e.field("ACCTTYPE",acct_type)
+        e.close("BANKACCTFROM")
+        self._inctran(e, dtstart)
+        e.close("STMTRQ")
+        self._closeMessage(e,"BANK","STMT")
     
-    def _ccreq(self, acctid, dtstart):
-        site=self.site
-        req = OfxTag("CCSTMTRQ",
-              OfxTag("CCACCTFROM",OfxField("ACCTID",acctid)),
-              OfxTag("INCTRAN",
-              OfxField("DTSTART",dtstart),
-              OfxField("INCLUDE","Y")))
-        return self._message("CREDITCARD","CCSTMT",req)
-
-    def _invstreq(self, brokerid, acctid, dtstart):
+    def _ccreq(self, e, acctid, dtstart):
+        self._openMessage(e,"CREDITCARD","CCSTMT")
+        e.open("CCSTMTRQ")
+        e.open("CCACCTFROM")
+        e.field("ACCTID",acctid)
+        e.close("CCACCTFROM")
+        self._inctran(e, dtstart)
+        e.close("CCSTMTRQ")
+        self._closeMessage(e,"CREDITCARD","CCSTMT")
+
+    def _invstreq(self, e, brokerid, acctid, dtstart):
         dtnow = time.strftime("%Y%m%d%H%M%S",time.localtime())
-        req = OfxTag("INVSTMTRQ",
-              OfxTag("INVACCTFROM",
-              OfxField("BROKERID", brokerid),
-              OfxField("ACCTID",acctid)),
-              OfxTag("INCTRAN",
-              OfxField("DTSTART",dtstart),
-              OfxField("INCLUDE","Y")),
-              OfxField("INCOO","Y"),
-              OfxTag("INCPOS",
-              OfxField("DTASOF", dtnow),
-              OfxField("INCLUDE","Y")),
-              OfxField("INCBAL","Y"))
-        return self._message("INVSTMT","INVSTMT",req)
-
-    def _message(self,msgType,trnType,request):
-        site = self.site
-        return OfxTag(msgType+"MSGSRQV1",
-               OfxTag(trnType+"TRNRQ",
-               OfxField("TRNUID",ofxUUID()),
-               OfxField("CLTCOOKIE",self._cookie()),
-               request))
+        self._openMessage(e,"INVSTMT","INVSTMT")
+        e.open("INVSTMTRQ")
+        e.open("INVACCTFROM")
+        e.field("BROKERID", brokerid)
+        e.field("ACCTID",acctid)
+        e.close("INVACCTFROM")
+        self._inctran(e, dtstart)
+        e.field("INCOO","Y")
+        e.open("INCPOS")
+        e.field("DTASOF", dtnow)
+        e.field("INCLUDE","Y")
+        e.close("INCPOS")
+        e.field("INCBAL","Y")
+        e.close("INVSTMTRQ")
+        self._closeMessage(e,"INVSTMT","INVSTMT")
+
+    def _inctran(self, e, dtstart):
+        e.open("INCTRAN")
+        e.field("DTSTART",dtstart)
+        e.field("INCLUDE","Y")
+        e.close("INCTRAN")
+
+    def _openMessage(self,e,msgType,trnType):
+        e.open(msgType+"MSGSRQV1")
+        e.open(trnType+"TRNRQ")
+        e.field("TRNUID",ofxUUID())
+        e.field("CLTCOOKIE",self._cookie())
+
+    def _closeMessage(self,e,msgType,trnType):
+        e.close(trnType+"TRNRQ")
+        e.close(msgType+"MSGSRQV1")
     
     def _header(self):
         site = self.site
@@ -167,58 +222,84 @@ class OFXClient:
 
     def baQuery(self, bankid, acctid, dtstart, acct_type):
         """Bank account statement request"""
-        return join("\r\n",
-                    [self._header(),
-                     OfxTag("OFX",
-                          self._signOn(),
-                          self._bareq(bankid, acctid, dtstart, acct_type)
-                          )
-                    ]
-                )
+        return self._query(self._bareq, bankid, acctid, dtstart, acct_type)
                         
     def ccQuery(self, acctid, dtstart):
         """CC Statement request"""
-        return join("\r\n",[self._header(),
-                    OfxTag("OFX",
-                    self._signOn(),
-                    self._ccreq(acctid, dtstart))])
+        return self._query(self._ccreq, acctid, dtstart)
 
     def acctQuery(self,dtstart):
-        return join("\r\n",[self._header(),
-                    OfxTag("OFX",
-                    self._signOn(),
-                    self._acctreq(dtstart))])
+        return self._query(self._acctreq, dtstart)
 
     def invstQuery(self, brokerid, acctid, dtstart):
-        return join("\r\n",[self._header(),
-                    OfxTag("OFX",
-                    self._signOn(),
-                    self._invstreq(brokerid, acctid, dtstart))])
+        return self._query(self._invstreq, brokerid, acctid, dtstart)
 
-    def doQuery(self,query,name):
+    def doQuery(self,query):
+        #send the query, and return the body of the reply (None if the request fails)
         # urllib doesn't honor user Content-type, use urllib2
         garbage, path = urllib2.splittype(FieldVal(self.site,"url"))
         host, selector = urllib2.splithost(path)
-        response=False
+        hostname, port = urllib2.splitport(host)
+        port = int(port or httplib.HTTPS_PORT)
+        h = None
+        response = None
+        content = None
+        connectTimeout, responseTimeout = latency.history().timeouts(self.sitename, self.site)
+        connectTime = responseTime = None
+        phase = 'connect'           #step in progress, for a timeout: connect, send or response
         try:
-            errmsg= "** An ERROR occurred attempting HTTPS connection to"
-            h = httplib.HTTPSConnection(host, timeout=5)
-
-            errmsg= "** An ERROR occurred sending POST request to"
-            p = h.request('POST', selector, query, 
-                     {"Content-type": "application/x-ofx",
-                      "Accept": "*/*, application/x-ofx"}
-                     )
-
-            errmsg= "** An ERROR occurred retrieving POST response from"
-            #allow up to 30 secs for the server response (it has to assemble the statement)
-            h.sock.settimeout(30)      
-            response = h.getresponse().read()
-            f = file(name,"w")
-            f.write(response)
-            f.close()
+            retry = True
+            while True:
+                errmsg= "** An ERROR occurred attempting HTTPS connection to"
+                phase = 'connect'
+                key, h, reused = connpool.pool.get(hostname, port, timeout=connectTimeout)
+                try:
+                    if not reused:
+                        tcp, tls = connpool.connect(h)
+                        connectTime = tcp + tls
+                        self.phases.addSecs('connect', tcp)
+                        self.phases.addSecs('tls', tls)
+                    
+                    errmsg= "** An ERROR occurred sending POST request to"
+                    phase = 'send'
+                    t = time.time()
+                    h.request('POST', selector, query, 
+                             {"Content-type": "application/x-ofx",
+                              "Accept": "*/*, application/x-ofx",
+                              "Accept-Encoding": httpzip.acceptEncoding(self.site)}
+                             )
+                    t = self.phases.add('send', t, len(query))
+
+                    errmsg= "** An ERROR occurred retrieving POST response from"
+                    phase = 'response'
+                    #allow time for the server to assemble the statement (see latency.py)
+                    h.sock.settimeout(responseTimeout)
+                    response = h.getresponse()
+                    responseTime = time.time() - t
+                    t = self.phases.add('wait', t)
+                    break
+                except (httplib.BadStatusLine, socket.error) as inst:
+                    #a reused connection may have been closed by the server since its last check.
+                    #try once more on a new connection before giving up (but not after a timeout)
+                    h.close()
+                    if not (reused and retry and connpool.closedByServer(inst)): raise
+                    retry = False
+
+            content, wire = httpzip.readBody(response)
+            self.phases.add('read', t, wire)
+            if response.will_close:
+                h.close()
+            else:
+                connpool.pool.put(key, h)
+            h = None
         except Exception as inst:
             self.status = False
+            content = None
+            if latency.timedOut(inst):
+                #record the timeout, so a slow server gets more time on the next run.
+                #the request is sent under the connect timeout, and the reply is read under the response timeout
+                if phase in ('connect', 'send'): connectTime = connectTimeout
+                else: responseTime = responseTimeout
             print errmsg, host
             print "   Exception type:", type(inst)
             print "   Exception Val :", inst
@@ -227,51 +308,72 @@ class OFXClient:
                 print "   HTTPS ResponseReason:", response.reason
 
         if h: h.close()
+        latency.history().record(self.sitename, connectTime, responseTime)
+        return content
             
 #------------------------------------------------------------------------------
 
-def getOFX(account, interval):
-
-    sitename   = account[0]
-    _acct_num  = account[1]             #account value defined in sites.dat
-    acct_type  = account[2]
-    user       = account[3]
-    password   = account[4]
-    acct_num = _acct_num.split(':')[0]  #bank account# (stripped of :xxx version)
-    
-    #get site and other user-defined data
-    site = userdat.sites[sitename]
-    
-    #set the interval (days)
-    minInterval = FieldVal(site,'mininterval')    #minimum interval (days) defined for this site (optional)
-    if minInterval:
-         interval = max(minInterval, interval)    #use the longer of the two
-    
-    #set the start date/time
-    dtstart = time.strftime("%Y%m%d",time.localtime(time.time()-interval*86400))
-    dtnow = time.strftime("%Y%m%d%H%M%S",time.localtime())
-  
-    client = OFXClient(site, user, password)
-    print sitename,':',acct_num,": Getting records since: ",dtstart
-    
-    status = True
-    #we'll place ofx data transfers in xfrdir (defined in control2.py).  
-    #check to see if we have this directory.  if not, create it
-    if not os.path.exists(xfrdir):
-        try:
-            os.mkdir(xfrdir)
-        except:
-            print '** Error.  Could not create', xfrdir
-            system.exit()
-    
-    #remove illegal WinFile characters from the file name (in case someone included them in the sitename)
-    #Also, the os.system() call doesn't allow the '&' char, so we'll replace it too
-    sitename = ''.join(a for a in sitename if a not in ' &\/:*?"<>|()')  #first char is a space
-    
-    ofxFileSuffix = str(random.randrange(1e5,1e6)) + ".ofx"
-    ofxFileName = xfrdir + sitename + dtnow + ofxFileSuffix
-    
-    try:
+class OFXDownload:
+    """Statement download for one account: request setup, the OFX query, and checks on the reply"""
+    def __init__(self, account, interval, incremental=False, fitidFilter=False):
+        self.sitename   = account[0]
+        self._acct_num  = account[1]             #account value defined in sites.dat
+        self.acct_type  = account[2]
+        user            = account[3]
+        password        = account[4]
+        self.acct_num = self._acct_num.split(':')[0]  #bank account# (stripped of :xxx version)
+        
+        #get site and other user-defined data
+        userdat = site_cfg.shared_cfg()
+        self.site = site = userdat.sites[self.sitename]
+        
+        #set the interval (days)
+        minInterval = FieldVal(site,'mininterval')    #minimum interval (days) defined for this site (optional)
+        if minInterval:
+             interval = max(minInterval, interval)    #use the longer of the two
+        
+        #set the start date/time
+        self.dtstart = time.strftime("%Y%m%d",time.localtime(time.time()-interval*86400))
+        dtnow = time.strftime("%Y%m%d%H%M%S",time.localtime())
+        
+        #incremental download: start at the last statement date received for this account
+        self.incremental = incremental and self.acct_num <> ''
+        self.fitidFilter = fitidFilter and self.acct_num <> ''
+        since = ''
+        if self.incremental:
+            mark = highwater.marks().get(self.sitename, self.acct_num)
+            if mark:
+                self.dtstart = highwater.startDate(mark, userdat.incrementalOverlap, minInterval,
+                                                   max(interval, highwater.MaxDays))
+                since = "  (last statement: " + mark + ")"
+      
+        self.client = OFXClient(site, user, password, self.sitename)
+        self.phases = self.client.phases = timing.Phases(self.sitename, self._acct_num)
+        print self.sitename,':',self.acct_num,": Getting records since: ",self.dtstart + since
+        
+        #we'll place ofx data transfers in xfrdir (defined in control2.py).  
+        #check to see if we have this directory.  if not, create it
+        if not os.path.exists(xfrdir):
+            try:
+                os.mkdir(xfrdir)
+            except:
+                print '** Error.  Could not create', xfrdir
+                sys.exit()
+        
+        #remove illegal WinFile characters from the file name (in case someone included them in the sitename)
+        #Also, the os.system() call doesn't allow the '&' char, so we'll replace it too
+        sitename = ''.join(a for a in self.sitename if a not in ' &\/:*?"<>|()')  #first char is a space
+        
+        ofxFileSuffix = str(random.randrange(1e5,1e6)) + ".ofx"
+        self.ofxFileName = xfrdir + sitename + dtnow + ofxFileSuffix
+        
+    def query(self):
+        #build the OFX request for this account
+        site = self.site
+        client = self.client
+        acct_num = self.acct_num
+        dtstart = self.dtstart
+        sitename = self.sitename
         if acct_num == '':
             query = client.acctQuery("19700101000000")       #19700101000000 is just a default DTSTART date/time string
         else:
@@ -292,9 +394,94 @@ def getOFX(account, interval):
                 if bankid == '':
                     msg='** Error: Site', sitename, 'does not have a (REQUIRED) BANKID value defined.'
                     raise Exception(msg)
-                query = client.baQuery(bankid, acct_num, dtstart, acct_type)
+                query = client.baQuery(bankid, acct_num, dtstart, self.acct_type)
+        return query
+
+    def check(self, content=None):
+        #check the ofx reply and make sure it looks valid (contains header and <ofx>...</ofx> blocks),
+        #then scrub it and write it to ofxFileName.  content = reply body (default = read ofxFileName)
+        #returns False if there is no reply, and throws an exception if the reply isn't valid
+        ofxFileName = self.ofxFileName
+        phases = self.phases
+        if content is None:
+            if glob.glob(ofxFileName) == []:
+                return False  #no ofx file?
+            f = open(ofxFileName,'r')
+            content = f.read()
+            f.close()
+
+        t = time.time()
+        if self.acct_num <> self._acct_num:
+            #replace bank account number w/ value defined in sites.dat
+            acctRe = re.compile(r'(<ACCTID>\s*)' + re.escape(self.acct_num), re.IGNORECASE)
+            content = acctRe.sub(lambda m: m.group(1) + self._acct_num, content)
+            t = phases.add('acctid', t, len(content))
+            
+        try:
+            _validate(content)
+            t = phases.add('validate', t, len(content))
+        except:
+            #save the reply as received, for review
+            f = open(ofxFileName,'w')
+            f.write(content)
+            f.close()
+            raise
+        dtend = self.incremental and highwater.statementDate(content)   #before the scrubber can add a DTEND
+        
+        #cleanup the statement if needed, and write it to file.
+        #transactions that an earlier run already downloaded are removed (FitidFilter)
+        userdat = site_cfg.shared_cfg()
+        f = open(ofxFileName,'w')
+        try:
+            if self.fitidFilter:
+                buf = cStringIO.StringIO()
+                scrubber.scrubTo(content, self.site, buf)
+                content = buf.getvalue()
+                buf.close()
+                t = phases.add('scrub', t, len(content))
+                index = fitidindex.shared(userdat.fitidKeepDays)
+                content, n, fitids = fitidindex.dropSeen(content, index, self.sitename, self._acct_num)
+                index.stage(ofxFileName, self.sitename, self._acct_num, fitids)
+                t = phases.add('fitid', t, len(content))
+                f.write(content)
+                if n: scrubber.scrubPrint("  +FITID index: " + str(n) + " transaction(s) already downloaded were removed.")
+            else:
+                #the scrubber writes to the file as it goes.  'write' is the time to flush and close it
+                scrubber.scrubTo(content, self.site, f)
+                t = phases.add('scrub', t, len(content))
+        except:
+            f.seek(0)
+            f.truncate()
+            f.write(content)
+            f.close()
+            raise
+        size = f.tell()
+        f.close()
+        phases.add('write', t, size)
+        
+        if dtend: highwater.marks().stage(ofxFileName, self.sitename, self.acct_num, dtend)
+        return True
+
+    def failed(self, inst):
+        #report an exception raised while processing this download
+        print inst
+        if glob.glob(self.ofxFileName) <> []:
+           print '**  Review', self.ofxFileName, 'for possible clues...'
+        if Debug:
+            traceback.print_exc()
+
+def getOFX(account, interval, incremental=False, fitidFilter=False):
+    #download one account.  returns (status, ofxFileName)
+    return profiler.runAccount(account, _getOFX, account, interval, incremental, fitidFilter)
+
+def _getOFX(account, interval, incremental, fitidFilter):
 
-        SendRequest = True
+    started = time.time()
+    dl = OFXDownload(account, interval, incremental, fitidFilter)
+    status = True
+    try:
+        query = dl.query()
+        dl.phases.add('setup', started, len(query))
         if Debug: 
             print query
             print
@@ -302,53 +489,160 @@ def getOFX(account, interval):
             if ask=='N': return False, ''
         
         #do the deed
-        client.doQuery(query, ofxFileName)
-        if not client.status: return False, ''
+        content = dl.client.doQuery(query)
+        if not dl.client.status: return False, ''
         
-        #check the ofx file and make sure it looks valid (contains header and <ofx>...</ofx> blocks)
-        if glob.glob(ofxFileName) == []:
-            status = False  #no ofx file?
-        else: 
-            f = open(ofxFileName,'r')
-            content = f.read().upper()
-            f.close
-
-            if acct_num <> _acct_num:
-                #replace bank account number w/ value defined in sites.dat
-                content = content.replace('<ACCTID>'+acct_num, '<ACCTID>'+ _acct_num)
-                f = open(ofxFileName,'w')
-                f.write(content)
-                f.close()
-                
-            content = ''.join(a for a in content if a not in '\r\n ')  #strip newlines & spaces
-           
-            if content.find('OFXHEADER:') < 0 and content.find('<OFX>') < 0 and content.find('</OFX>') < 0:
-                #throw exception and exit
-                raise Exception("Invalid OFX statement.")
-                
-            #look for <SEVERITY>ERROR code... rlc*2013
-            if content.find('<SEVERITY>ERROR') > 0:
-                #throw exception and exit
-                raise Exception("OFX message contains ERROR condition")
-
-            #attempted debug of a Vanguard issue... rlc*2010
-            #if content.find('<INVPOSLIST>') > -1 and content.find('<SECLIST>') < 0:    #DEBUG: rlc*5/2011
-            if content.find('<INVPOS>') > -1 and content.find('<SECLIST>') < 0:
-                #An investment statement must contain a <SECLIST> section when a <INVPOSLIST> section exists
-                #Some Vanguard statements have been missing this when there are no transactions, causing Money to crash
-                #It may be necessary to match every investment position with a security entry, but we'll try to just
-                #verify the existence of these section pairs. rlc*9/2010
-                raise Exception("OFX statement is missing required <SECLIST> section.")
-                
-            #cleanup the file if needed
-            scrubber.scrub(ofxFileName, site)
+        status = dl.check(content)
         
     except Exception as inst:
         status = False
-        print inst
-        if glob.glob(ofxFileName) <> []:
-           print '**  Review', ofxFileName, 'for possible clues...'
-        if Debug:
-            traceback.print_exc()
-        
-    return status, ofxFileName
+        dl.failed(inst)
+    
+    dl.phases.add('total', started)
+    timing.run.add(dl.phases)
+    return status, dl.ofxFileName
+
+def imported(ofxFiles):
+    #the statements in ofxFiles were sent to Money.  only now are their dates and FITIDs saved for
+    #the next incremental download and FitidFilter, so a statement that isn't imported is sent again
+    highwater.imported(ofxFiles)
+    fitidindex.imported(ofxFiles)
+
+def _siteHost(sitename):
+    #return the server host name for a site entry (used to limit connections per bank server)
+    site = site_cfg.shared_cfg().sites.get(sitename, {})
+    garbage, path = urllib2.splittype(FieldVal(site,"url"))
+    host, selector = urllib2.splithost(path or '')
+    return (host or '').lower()
+
+def getOFXList(AcctArray, interval):
+    #download statements for every account in AcctArray
+    #returns a list of [status, ofxFileName] pairs, in the same order as AcctArray
+    #up to userdat.downloadWorkers accounts are downloaded at once, but never more than
+    #userdat.maxPerHost at a time from the same bank server
+    try:
+        return _getOFXList(AcctArray, interval)
+    finally:
+        latency.save()      #once, for every request in the run
+
+def _getOFXList(AcctArray, interval):
+    
+    userdat = site_cfg.shared_cfg()
+    incremental, fitidFilter = userdat.incrementalDownloads, userdat.fitidFilter
+    results = [[False, '']] * len(AcctArray)
+    workers = min(userdat.downloadWorkers, len(AcctArray))
+    if Debug: workers = 1       #debug mode asks before each request is sent
+    
+    if userdat.asyncDownloads and workers > 1:
+        _getOFXAsync(AcctArray, interval, results)
+        return results
+
+    if workers <= 1:
+        for i, acct in enumerate(AcctArray):
+            results[i] = list(getOFX(acct, interval, incremental, fitidFilter))
+            print ""
+        print connpool.pool.stats()
+        print httpzip.counter.stats() + "\n"
+        return results
+    
+    print "Downloading", len(AcctArray), "accounts,", workers, "at a time...\n"
+    pending = range(len(AcctArray))             #account indexes not yet started, in order
+    hosts = [_siteHost(acct[0]) for acct in AcctArray]
+    active = {}                                 #host: number of downloads in progress
+    cv = threading.Condition()
+    
+    def nextJob():
+        #return the first pending account whose server isn't busy (None when the list is empty)
+        cv.acquire()
+        try:
+            while pending:
+                for n, i in enumerate(pending):
+                    if active.get(hosts[i], 0) < userdat.maxPerHost:
+                        del pending[n]
+                        active[hosts[i]] = active.get(hosts[i], 0) + 1
+                        return i
+                cv.wait()
+            return None
+        finally:
+            cv.release()
+    
+    def worker():
+        i = nextJob()
+        while i is not None:
+            try:
+                results[i] = list(getOFX(AcctArray[i], interval, incremental, fitidFilter))
+            except Exception as inst:
+                print "** An ERROR occurred downloading", AcctArray[i][0], ":", inst
+            cv.acquire()
+            active[hosts[i]] -= 1
+            cv.notifyAll()
+            cv.release()
+            i = nextJob()
+    
+    threads = [threading.Thread(target=worker) for n in range(workers)]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    for t in threads:
+        t.join()
+    print ""
+    print connpool.pool.stats()
+    print httpzip.counter.stats() + "\n"
+    
+    return results
+
+def _getOFXAsync(AcctArray, interval, results):
+    #send every request through the asyncofx transport (one thread, many connections), 
+    #then check and scrub the replies in account order
+    userdat = site_cfg.shared_cfg()
+    downloads = [None] * len(AcctArray)
+    requests = []
+    sent = []                                   #account index for each request
+    started = [0] * len(AcctArray)
+    for i, acct in enumerate(AcctArray):
+        started[i] = time.time()
+        try:
+            dl = OFXDownload(acct, interval, userdat.incrementalDownloads, userdat.fitidFilter)
+        except Exception as inst:
+            print "** An ERROR occurred downloading", acct[0], ":", inst
+            continue
+        try:
+            query = profiler.runAccount(acct, dl.query)
+            dl.phases.add('setup', started[i], len(query))
+            requests.append([dl.client, query])
+            downloads[i] = dl
+            sent.append(i)
+        except Exception as inst:
+            dl.failed(inst)
+    
+    print "\nSending", len(requests), "requests,", userdat.downloadWorkers, "at a time...\n"
+    replies = asyncofx.runQueries(requests, userdat.downloadWorkers, userdat.maxPerHost)
+    
+    for n, i in enumerate(sent):
+        dl = downloads[i]
+        content, replies[n] = replies[n], None      #release each reply once it's been written
+        if dl.client.status:
+            try:
+                results[i] = [profiler.runAccount(AcctArray[i], dl.check, content), dl.ofxFileName]
+            except Exception as inst:
+                dl.failed(inst)
+        dl.phases.add('total', started[i])
+        timing.run.add(dl.phases)
+    print ""
+    print httpzip.counter.stats() + "\n"
+
+def _validate(content):
+    #throw an exception if the ofx message isn't valid
+    if not _headerRe.search(content):
+        raise Exception("Invalid OFX statement.")
+            
+    #look for <SEVERITY>ERROR code... rlc*2013
+    if _errorRe.search(content):
+        raise Exception("OFX message contains ERROR condition")
+
+    #An investment statement must contain a <SECLIST> section when a <INVPOSLIST> section exists
+    #Some Vanguard statements have been missing this when there are no transactions, causing Money to crash
+    #It may be necessary to match every investment position with a security entry, but we'll try to just
+    #verify the existence of these section pairs. rlc*9/2010
+    if _invposRe.search(content) and not _seclistRe.search(content):
+        raise Exception("OFX statement is missing required <SECLIST> section.")
@@ -0,0 +1,142 @@
+# ofxparse.py
+# http://sites.google.com/site/pocketsense/
+# streaming parser for OFX 1.x (SGML) statements, like the ones saved by OFXDownload.check()
+# Intial version: nt: Oct-2026
+
+# Notes
+# -----
+#   - The file is read in chunks, and records are returned one at a time, so memory use doesn't
+#     grow with the size of the statement.
+#   - Records are returned for transactions (STMTTRN), investment buys and sells (INVBUY, INVSELL),
+#     positions (INVPOS) and securities (SECINFO).  Other aggregates are read and skipped.
+#   - SGML elements (tag + value) don't have closing tags.  Aggregates do, so a closing tag also
+#     closes any aggregate opened inside it that wasn't closed.  OFX 2.x (XML) files parse the same way.
+#   - Values are returned as text, as found in the file (leading/trailing white-space removed).
+#   - spans() returns the same tokens for a statement that's already in memory, with their position
+#     in the text (used by fitidindex.dropSeen to cut out transactions).
+#
+# Example:
+#   for rec in ofxparse.parseFile('xfr/01.ofx', ['STMTTRN']):
+#       print rec.fitid, rec.dtposted, rec.trnamt
+
+import re
+
+ChunkSize = 65536
+
+#<tag>value, where value runs to the next tag
+_tokenRe = re.compile(r'<([^<>]*)>([^<]*)')
+
+class _Record(object):
+    """Base class for parsed records.  Fields that aren't in the statement are None"""
+    __slots__ = ('kind',        #record tag (e.g., STMTTRN)
+                 'parent',      #aggregate holding the record (e.g., BUYSTOCK, POSMF, STOCKINFO)
+                 'acctid')      #ACCTID of the statement the record belongs to
+
+    def __init__(self):
+        for c in self.__class__.__mro__:
+            for slot in getattr(c, '__slots__', ()):
+                setattr(self, slot, None)
+
+    def __repr__(self):
+        fields = []
+        for c in reversed(self.__class__.__mro__):
+            for slot in getattr(c, '__slots__', ()):
+                if getattr(self, slot) is not None:
+                    fields.append(slot + '=' + repr(getattr(self, slot)))
+        return self.__class__.__name__ + '(' + ', '.join(fields) + ')'
+
+class StmtTrn(_Record):
+    """Bank or credit card transaction (STMTTRN)"""
+    __slots__ = ('trntype', 'dtposted', 'dtuser', 'trnamt', 'fitid', 'checknum', 'refnum', 'name', 'memo')
+
+class InvTrade(_Record):
+    """Investment buy or sell (INVBUY, INVSELL)"""
+    __slots__ = ('fitid', 'dttrade', 'dtsettle', 'memo', 'uniqueid', 'uniqueidtype', 'units', 'unitprice',
+                 'commission', 'fees', 'total', 'subacctsec', 'subacctfund')
+
+class InvPos(_Record):
+    """Investment position (INVPOS)"""
+    __slots__ = ('uniqueid', 'uniqueidtype', 'heldinacct', 'postype', 'units', 'unitprice', 'mktval',
+                 'dtpriceasof', 'memo')
+
+class SecInfo(_Record):
+    """Security description (SECINFO)"""
+    __slots__ = ('uniqueid', 'uniqueidtype', 'secname', 'ticker', 'fiid', 'unitprice', 'dtasof', 'memo')
+
+recordTypes = {'STMTTRN': StmtTrn, 'INVBUY': InvTrade, 'INVSELL': InvTrade, 'INVPOS': InvPos, 'SECINFO': SecInfo}
+
+def tokens(f, chunkSize=ChunkSize):
+    #yield (TAG, value) for each tag in file object f.  TAG is upper case (/TAG for a closing tag),
+    #and value is the text that follows it, up to the next tag.  Text before the first tag (the
+    #OFX header) is skipped, as are <?xml ...?> style instructions.
+    buf = ''
+    eof = False
+    while not eof:
+        chunk = f.read(chunkSize)
+        eof = not chunk
+        buf += chunk
+        pos = 0
+        for m in _tokenRe.finditer(buf):
+            if m.end() == len(buf) and not eof:
+                break           #value may continue in the next chunk
+            pos = m.end()
+            tag = m.group(1).strip().upper()
+            if tag[:1] not in ('?', '!'):
+                yield tag, m.group(2).strip()
+        if pos: buf = buf[pos:]
+
+def spans(text, pos=0):
+    #yield (TAG, value, start, end) for each tag in string text, from pos.  TAG and value are as
+    #returned by tokens(), and text[start:end] is the tag and the text after it, up to the next tag
+    for m in _tokenRe.finditer(text, pos):
+        tag = m.group(1).strip().upper()
+        if tag[:1] not in ('?', '!'):
+            yield tag, m.group(2).strip(), m.start(), m.end()
+
+def records(f, kinds=None):
+    #yield a record for each STMTTRN, INVBUY, INVSELL, INVPOS and SECINFO aggregate in file object f
+    #kinds = list of record tags to return (default = all)
+    stack = []          #open aggregates
+    rec = None          #record being read
+    recDepth = 0        #len(stack) while inside the record's aggregate
+    acctid = None
+
+    for tag, value in tokens(f):
+        if tag[:1] == '/':
+            #closing tag.  close any open aggregates inside it, too
+            tag = tag[1:]
+            if tag in stack:
+                while True:
+                    t = stack.pop()
+                    if rec is not None and len(stack) < recDepth:
+                        yield rec
+                        rec = None
+                    if t == tag: break
+
+        elif value:
+            #element (tag + value)
+            if rec is not None:
+                slot = tag.lower()
+                if slot in rec.__slots__ and getattr(rec, slot) is None:
+                    setattr(rec, slot, value)
+            elif tag == 'ACCTID':
+                acctid = value
+
+        else:
+            #start of an aggregate
+            if rec is None and tag in recordTypes and (kinds is None or tag in kinds):
+                rec = recordTypes[tag]()
+                rec.kind = tag
+                rec.acctid = acctid
+                if stack: rec.parent = stack[-1]
+                recDepth = len(stack) + 1
+            stack.append(tag)
+
+def parseFile(filename, kinds=None):
+    #yield the records in an OFX file.  see records()
+    f = open(filename, 'r')
+    try:
+        for rec in records(f, kinds):
+            yield rec
+    finally:
+        f.close()
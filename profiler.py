@@ -0,0 +1,150 @@
+# profiler.py
+# http://sites.google.com/site/pocketsense/
+# cProfile runs of Getdata.py and the Setup.py account test, without turning on Debug mode
+# Intial version: nt: Oct-2026
+
+# Usage:
+#   Getdata.py --profile [accounts...]            profile the whole run
+#   Getdata.py --profile=<acct> [accounts...]     profile only the download(s) for <acct>
+#   Setup.py [--profile[=<acct>]] test <acct> ...   test accounts from the command line (no menu)
+#
+#   <acct> is a site name (e.g., VANGUARD), an account# or its last digits.
+#   Setting PS_PROFILE=Yes (or PS_PROFILE=<acct>) in the environment does the same as --profile.
+#
+# Notes
+# -----
+#   - The profile is saved to <name>.prof (getdataProfFile, setupProfFile in control2.py), for
+#     pstats, snakeviz, etc., and the functions that took the most time are listed in <name>.prof.txt
+#     and on the console: sorted by cumulative time, then by internal time.
+#   - A profiled run doesn't stop for input.  The "interval" prompt and the pauses at the end are
+#     skipped, and Getdata.py leaves the statements in xfrdir instead of sending them to Money.
+#     The account password is still asked for if the account settings are encrypted.
+#   - Since the statements aren't imported, IncrementalDownloads and FitidFilter are off while
+#     profiling: download.hwm and fitid.db aren't read or changed, and every account gets a full
+#     download.  ("mockofx.py check" verifies this against a mock server.)
+#   - cProfile only sees the thread that enabled it, so each account download on a worker thread
+#     (DownloadWorkers > 1) gets its own profile, added to the run's profile when it's done.
+#     With AsyncDownloads, the requests for every account share one thread, so a scoped profile
+#     covers the setup, check and scrub steps for that account, but not the transfer.
+
+import os, sys, time, cProfile, pstats, threading, cStringIO
+import site_cfg
+from control2 import *
+
+ProfileEnv   = 'PS_PROFILE'
+TopFunctions = 40       #functions listed in each summary table
+
+def parseArgs(args):
+    #return (scope, args without the --profile option).  scope is None when profiling is off,
+    #'' to profile the whole run, or the account selector
+    scope = None
+    env = os.environ.get(ProfileEnv, '').strip()
+    if env.upper() in ['Y', 'YES', '1', 'ALL']: scope = ''
+    elif env.upper() not in ['', 'N', 'NO', '0']: scope = env.upper()
+    rest = []
+    for arg in args:
+        if arg.lower() == '--profile':
+            scope = ''
+        elif arg.lower().startswith('--profile='):
+            scope = arg.split('=', 1)[1].strip().upper()
+        else:
+            rest.append(arg)
+    return scope, rest
+
+def matches(acct, selector):
+    #does an account ([sitename, acct#, ...]) match a site name, account# or the last digits of one?
+    selector = selector.upper()
+    return selector in [acct[0].upper(), acct[1].upper()] or acct[1].upper().split(':')[0].endswith(selector)
+
+class RunProfile:
+    """A cProfile run, for all of the main thread or only for the accounts in scope"""
+
+    def __init__(self, filename, scope=''):
+        self.filename = filename
+        self.scope = scope
+        self.thread = threading.current_thread()
+        self.profile = cProfile.Profile()
+        self.stats = None           #pstats.Stats, for the account profiles
+        self.accounts = []          #accounts with their own profile (scoped runs, and worker threads)
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.saved = None           #sites.dat options turned off while profiling
+
+    def start(self):
+        global current
+        current = self
+        userdat = site_cfg.shared_cfg()
+        self.saved = (userdat.incrementalDownloads, userdat.fitidFilter)
+        userdat.incrementalDownloads = userdat.fitidFilter = False     #the statements won't be imported
+        if not self.scope: self.profile.enable()
+
+    def runAccount(self, acct, func, *args):
+        #return func(*args), profiled if acct is in scope, and not already seen by the main profile
+        if (self.scope and not matches(acct, self.scope)) or \
+           (not self.scope and threading.current_thread() is self.thread):
+            return func(*args)
+        p = cProfile.Profile()
+        try:
+            return p.runcall(func, *args)
+        finally:
+            self.lock.acquire()
+            try:
+                if self.stats is None: self.stats = pstats.Stats(p)
+                else: self.stats.add(p)
+                label = acct[0] + ':..' + acct[1][-4:]      #last 4 characters, as in timing.py
+                if label not in self.accounts: self.accounts.append(label)
+            finally:
+                self.lock.release()
+
+    def stop(self):
+        #stop profiling, and save the .prof file and the summary.  returns the Stats, or None if nothing was profiled
+        global current
+        current = None
+        self.profile.disable()
+        elapsed = time.time() - self.started
+        if self.saved:
+            userdat = site_cfg.shared_cfg()
+            userdat.incrementalDownloads, userdat.fitidFilter = self.saved
+            self.saved = None
+        stats = self.stats
+        if not self.scope:
+            stats = pstats.Stats(self.profile)
+            if self.stats: stats.add(self.stats)
+        if stats is None:
+            print "Profile: no accounts matched", self.scope
+            return None
+
+        stats.dump_stats(self.filename)
+        head = "Profile of %s, %s: %.2f secs" % (os.path.basename(sys.argv[0]), time.strftime("%d-%b-%Y %H:%M:%S",
+               time.localtime(self.started)), elapsed)
+        if self.scope: head += "\nScope: " + self.scope
+        if self.accounts: head += "\nAccounts: " + ', '.join(sorted(self.accounts))
+        text = head + "\n" + summary(stats)
+        try:
+            f = open(self.filename + '.txt', 'w')
+            f.write(text)
+            f.close()
+        except Exception as inst:
+            print "** Could not save", self.filename + '.txt', ":", inst
+        print text
+        print "Profile saved to", self.filename, "and", self.filename + '.txt'
+        return stats
+
+def summary(stats, top=TopFunctions):
+    #return the top functions by cumulative and by internal time, as text
+    buf = cStringIO.StringIO()
+    stats.stream = buf
+    stats.strip_dirs()
+    for key, title in [('cumulative', 'cumulative time'), ('time', 'internal time')]:
+        buf.write("\n---- Top %d functions by %s ----\n" % (top, title))
+        stats.sort_stats(key).print_stats(top)
+    stats.stream = sys.stdout
+    return buf.getvalue()
+
+#the active RunProfile (None = not profiling)
+current = None
+
+def runAccount(acct, func, *args):
+    #return func(*args) for one account, profiled if a RunProfile is active and acct is in scope
+    if current is None: return func(*args)
+    return current.runAccount(acct, func, *args)
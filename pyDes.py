@@ -26,6 +26,10 @@
 #   - add password reader _getDESpw() 
 #     asks for a user password and conforms it to an 8-byte field
 #   - removed triple-DES, since I don't need it.
+# Oct-2026: nt
+#   - des works on 64-bit integers, with combined S-box/P-box tables and byte tables for the
+#     IP and FP permutations.  Key schedules are cached per key.  Results are the same as the
+#     original bit-list implementation (kept as bitlist_des).
 
 """A pure python implementation of the DES and TRIPLE DES encryption algorithms.
 
@@ -87,7 +91,7 @@ Note: This code was not written for high-end systems needing a fast
 
 """
 
-import sys, getpass
+import sys, getpass, struct
 
 # _pythonMajorVersion is used to handle Python2 and Python3 differences.
 _pythonMajorVersion = sys.version_info[0]
@@ -247,8 +251,136 @@ class _baseDes(object):
 #############################################################################
 # 				    DES					    #
 #############################################################################
-class des(_baseDes):
-	"""DES encryption/decrytpion class
+# Permutation and translation tables for DES
+_pc1 = [56, 48, 40, 32, 24, 16,  8,
+	  0, 57, 49, 41, 33, 25, 17,
+	  9,  1, 58, 50, 42, 34, 26,
+	 18, 10,  2, 59, 51, 43, 35,
+	 62, 54, 46, 38, 30, 22, 14,
+	  6, 61, 53, 45, 37, 29, 21,
+	 13,  5, 60, 52, 44, 36, 28,
+	 20, 12,  4, 27, 19, 11,  3
+]
+
+# number left rotations of pc1
+_left_rotations = [
+	1, 1, 2, 2, 2, 2, 2, 2, 1, 2, 2, 2, 2, 2, 2, 1
+]
+
+# permuted choice key (table 2)
+_pc2 = [
+	13, 16, 10, 23,  0,  4,
+	 2, 27, 14,  5, 20,  9,
+	22, 18, 11,  3, 25,  7,
+	15,  6, 26, 19, 12,  1,
+	40, 51, 30, 36, 46, 54,
+	29, 39, 50, 44, 32, 47,
+	43, 48, 38, 55, 33, 52,
+	45, 41, 49, 35, 28, 31
+]
+
+# initial permutation IP
+_ip = [57, 49, 41, 33, 25, 17, 9,  1,
+	59, 51, 43, 35, 27, 19, 11, 3,
+	61, 53, 45, 37, 29, 21, 13, 5,
+	63, 55, 47, 39, 31, 23, 15, 7,
+	56, 48, 40, 32, 24, 16, 8,  0,
+	58, 50, 42, 34, 26, 18, 10, 2,
+	60, 52, 44, 36, 28, 20, 12, 4,
+	62, 54, 46, 38, 30, 22, 14, 6
+]
+
+# Expansion table for turning 32 bit blocks into 48 bits
+_expansion_table = [
+	31,  0,  1,  2,  3,  4,
+	 3,  4,  5,  6,  7,  8,
+	 7,  8,  9, 10, 11, 12,
+	11, 12, 13, 14, 15, 16,
+	15, 16, 17, 18, 19, 20,
+	19, 20, 21, 22, 23, 24,
+	23, 24, 25, 26, 27, 28,
+	27, 28, 29, 30, 31,  0
+]
+
+# The (in)famous S-boxes
+_sbox = [
+	# S1
+	[14, 4, 13, 1, 2, 15, 11, 8, 3, 10, 6, 12, 5, 9, 0, 7,
+	 0, 15, 7, 4, 14, 2, 13, 1, 10, 6, 12, 11, 9, 5, 3, 8,
+	 4, 1, 14, 8, 13, 6, 2, 11, 15, 12, 9, 7, 3, 10, 5, 0,
+	 15, 12, 8, 2, 4, 9, 1, 7, 5, 11, 3, 14, 10, 0, 6, 13],
+
+	# S2
+	[15, 1, 8, 14, 6, 11, 3, 4, 9, 7, 2, 13, 12, 0, 5, 10,
+	 3, 13, 4, 7, 15, 2, 8, 14, 12, 0, 1, 10, 6, 9, 11, 5,
+	 0, 14, 7, 11, 10, 4, 13, 1, 5, 8, 12, 6, 9, 3, 2, 15,
+	 13, 8, 10, 1, 3, 15, 4, 2, 11, 6, 7, 12, 0, 5, 14, 9],
+
+	# S3
+	[10, 0, 9, 14, 6, 3, 15, 5, 1, 13, 12, 7, 11, 4, 2, 8,
+	 13, 7, 0, 9, 3, 4, 6, 10, 2, 8, 5, 14, 12, 11, 15, 1,
+	 13, 6, 4, 9, 8, 15, 3, 0, 11, 1, 2, 12, 5, 10, 14, 7,
+	 1, 10, 13, 0, 6, 9, 8, 7, 4, 15, 14, 3, 11, 5, 2, 12],
+
+	# S4
+	[7, 13, 14, 3, 0, 6, 9, 10, 1, 2, 8, 5, 11, 12, 4, 15,
+	 13, 8, 11, 5, 6, 15, 0, 3, 4, 7, 2, 12, 1, 10, 14, 9,
+	 10, 6, 9, 0, 12, 11, 7, 13, 15, 1, 3, 14, 5, 2, 8, 4,
+	 3, 15, 0, 6, 10, 1, 13, 8, 9, 4, 5, 11, 12, 7, 2, 14],
+
+	# S5
+	[2, 12, 4, 1, 7, 10, 11, 6, 8, 5, 3, 15, 13, 0, 14, 9,
+	 14, 11, 2, 12, 4, 7, 13, 1, 5, 0, 15, 10, 3, 9, 8, 6,
+	 4, 2, 1, 11, 10, 13, 7, 8, 15, 9, 12, 5, 6, 3, 0, 14,
+	 11, 8, 12, 7, 1, 14, 2, 13, 6, 15, 0, 9, 10, 4, 5, 3],
+
+	# S6
+	[12, 1, 10, 15, 9, 2, 6, 8, 0, 13, 3, 4, 14, 7, 5, 11,
+	 10, 15, 4, 2, 7, 12, 9, 5, 6, 1, 13, 14, 0, 11, 3, 8,
+	 9, 14, 15, 5, 2, 8, 12, 3, 7, 0, 4, 10, 1, 13, 11, 6,
+	 4, 3, 2, 12, 9, 5, 15, 10, 11, 14, 1, 7, 6, 0, 8, 13],
+
+	# S7
+	[4, 11, 2, 14, 15, 0, 8, 13, 3, 12, 9, 7, 5, 10, 6, 1,
+	 13, 0, 11, 7, 4, 9, 1, 10, 14, 3, 5, 12, 2, 15, 8, 6,
+	 1, 4, 11, 13, 12, 3, 7, 14, 10, 15, 6, 8, 0, 5, 9, 2,
+	 6, 11, 13, 8, 1, 4, 10, 7, 9, 5, 0, 15, 14, 2, 3, 12],
+
+	# S8
+	[13, 2, 8, 4, 6, 15, 11, 1, 10, 9, 3, 14, 5, 0, 12, 7,
+	 1, 15, 13, 8, 10, 3, 7, 4, 12, 5, 6, 11, 0, 14, 9, 2,
+	 7, 11, 4, 1, 9, 12, 14, 2, 0, 6, 10, 13, 15, 3, 5, 8,
+	 2, 1, 14, 7, 4, 10, 8, 13, 15, 12, 9, 0, 3, 5, 6, 11],
+]
+
+
+# 32-bit permutation function P used on the output of the S-boxes
+_p = [
+	15, 6, 19, 20, 28, 11,
+	27, 16, 0, 14, 22, 25,
+	4, 17, 30, 9, 1, 7,
+	23,13, 31, 26, 2, 8,
+	18, 12, 29, 5, 21, 10,
+	3, 24
+]
+
+# final permutation IP^-1
+_fp = [
+	39,  7, 47, 15, 55, 23, 63, 31,
+	38,  6, 46, 14, 54, 22, 62, 30,
+	37,  5, 45, 13, 53, 21, 61, 29,
+	36,  4, 44, 12, 52, 20, 60, 28,
+	35,  3, 43, 11, 51, 19, 59, 27,
+	34,  2, 42, 10, 50, 18, 58, 26,
+	33,  1, 41,  9, 49, 17, 57, 25,
+	32,  0, 40,  8, 48, 16, 56, 24
+]
+
+class bitlist_des(_baseDes):
+	"""DES encryption/decrytpion class (original bit-list implementation)
+
+	Kept as the reference for the des class below, which produces the
+	same results.  See benchmark.py.
 
 	Supports ECB (Electronic Code Book) and CBC (Cypher Block Chaining) modes.
 
@@ -267,131 +399,6 @@ class des(_baseDes):
 	"""
 
 
-	# Permutation and translation tables for DES
-	__pc1 = [56, 48, 40, 32, 24, 16,  8,
-		  0, 57, 49, 41, 33, 25, 17,
-		  9,  1, 58, 50, 42, 34, 26,
-		 18, 10,  2, 59, 51, 43, 35,
-		 62, 54, 46, 38, 30, 22, 14,
-		  6, 61, 53, 45, 37, 29, 21,
-		 13,  5, 60, 52, 44, 36, 28,
-		 20, 12,  4, 27, 19, 11,  3
-	]
-
-	# number left rotations of pc1
-	__left_rotations = [
-		1, 1, 2, 2, 2, 2, 2, 2, 1, 2, 2, 2, 2, 2, 2, 1
-	]
-
-	# permuted choice key (table 2)
-	__pc2 = [
-		13, 16, 10, 23,  0,  4,
-		 2, 27, 14,  5, 20,  9,
-		22, 18, 11,  3, 25,  7,
-		15,  6, 26, 19, 12,  1,
-		40, 51, 30, 36, 46, 54,
-		29, 39, 50, 44, 32, 47,
-		43, 48, 38, 55, 33, 52,
-		45, 41, 49, 35, 28, 31
-	]
-
-	# initial permutation IP
-	__ip = [57, 49, 41, 33, 25, 17, 9,  1,
-		59, 51, 43, 35, 27, 19, 11, 3,
-		61, 53, 45, 37, 29, 21, 13, 5,
-		63, 55, 47, 39, 31, 23, 15, 7,
-		56, 48, 40, 32, 24, 16, 8,  0,
-		58, 50, 42, 34, 26, 18, 10, 2,
-		60, 52, 44, 36, 28, 20, 12, 4,
-		62, 54, 46, 38, 30, 22, 14, 6
-	]
-
-	# Expansion table for turning 32 bit blocks into 48 bits
-	__expansion_table = [
-		31,  0,  1,  2,  3,  4,
-		 3,  4,  5,  6,  7,  8,
-		 7,  8,  9, 10, 11, 12,
-		11, 12, 13, 14, 15, 16,
-		15, 16, 17, 18, 19, 20,
-		19, 20, 21, 22, 23, 24,
-		23, 24, 25, 26, 27, 28,
-		27, 28, 29, 30, 31,  0
-	]
-
-	# The (in)famous S-boxes
-	__sbox = [
-		# S1
-		[14, 4, 13, 1, 2, 15, 11, 8, 3, 10, 6, 12, 5, 9, 0, 7,
-		 0, 15, 7, 4, 14, 2, 13, 1, 10, 6, 12, 11, 9, 5, 3, 8,
-		 4, 1, 14, 8, 13, 6, 2, 11, 15, 12, 9, 7, 3, 10, 5, 0,
-		 15, 12, 8, 2, 4, 9, 1, 7, 5, 11, 3, 14, 10, 0, 6, 13],
-
-		# S2
-		[15, 1, 8, 14, 6, 11, 3, 4, 9, 7, 2, 13, 12, 0, 5, 10,
-		 3, 13, 4, 7, 15, 2, 8, 14, 12, 0, 1, 10, 6, 9, 11, 5,
-		 0, 14, 7, 11, 10, 4, 13, 1, 5, 8, 12, 6, 9, 3, 2, 15,
-		 13, 8, 10, 1, 3, 15, 4, 2, 11, 6, 7, 12, 0, 5, 14, 9],
-
-		# S3
-		[10, 0, 9, 14, 6, 3, 15, 5, 1, 13, 12, 7, 11, 4, 2, 8,
-		 13, 7, 0, 9, 3, 4, 6, 10, 2, 8, 5, 14, 12, 11, 15, 1,
-		 13, 6, 4, 9, 8, 15, 3, 0, 11, 1, 2, 12, 5, 10, 14, 7,
-		 1, 10, 13, 0, 6, 9, 8, 7, 4, 15, 14, 3, 11, 5, 2, 12],
-
-		# S4
-		[7, 13, 14, 3, 0, 6, 9, 10, 1, 2, 8, 5, 11, 12, 4, 15,
-		 13, 8, 11, 5, 6, 15, 0, 3, 4, 7, 2, 12, 1, 10, 14, 9,
-		 10, 6, 9, 0, 12, 11, 7, 13, 15, 1, 3, 14, 5, 2, 8, 4,
-		 3, 15, 0, 6, 10, 1, 13, 8, 9, 4, 5, 11, 12, 7, 2, 14],
-
-		# S5
-		[2, 12, 4, 1, 7, 10, 11, 6, 8, 5, 3, 15, 13, 0, 14, 9,
-		 14, 11, 2, 12, 4, 7, 13, 1, 5, 0, 15, 10, 3, 9, 8, 6,
-		 4, 2, 1, 11, 10, 13, 7, 8, 15, 9, 12, 5, 6, 3, 0, 14,
-		 11, 8, 12, 7, 1, 14, 2, 13, 6, 15, 0, 9, 10, 4, 5, 3],
-
-		# S6
-		[12, 1, 10, 15, 9, 2, 6, 8, 0, 13, 3, 4, 14, 7, 5, 11,
-		 10, 15, 4, 2, 7, 12, 9, 5, 6, 1, 13, 14, 0, 11, 3, 8,
-		 9, 14, 15, 5, 2, 8, 12, 3, 7, 0, 4, 10, 1, 13, 11, 6,
-		 4, 3, 2, 12, 9, 5, 15, 10, 11, 14, 1, 7, 6, 0, 8, 13],
-
-		# S7
-		[4, 11, 2, 14, 15, 0, 8, 13, 3, 12, 9, 7, 5, 10, 6, 1,
-		 13, 0, 11, 7, 4, 9, 1, 10, 14, 3, 5, 12, 2, 15, 8, 6,
-		 1, 4, 11, 13, 12, 3, 7, 14, 10, 15, 6, 8, 0, 5, 9, 2,
-		 6, 11, 13, 8, 1, 4, 10, 7, 9, 5, 0, 15, 14, 2, 3, 12],
-
-		# S8
-		[13, 2, 8, 4, 6, 15, 11, 1, 10, 9, 3, 14, 5, 0, 12, 7,
-		 1, 15, 13, 8, 10, 3, 7, 4, 12, 5, 6, 11, 0, 14, 9, 2,
-		 7, 11, 4, 1, 9, 12, 14, 2, 0, 6, 10, 13, 15, 3, 5, 8,
-		 2, 1, 14, 7, 4, 10, 8, 13, 15, 12, 9, 0, 3, 5, 6, 11],
-	]
-
-
-	# 32-bit permutation function P used on the output of the S-boxes
-	__p = [
-		15, 6, 19, 20, 28, 11,
-		27, 16, 0, 14, 22, 25,
-		4, 17, 30, 9, 1, 7,
-		23,13, 31, 26, 2, 8,
-		18, 12, 29, 5, 21, 10,
-		3, 24
-	]
-
-	# final permutation IP^-1
-	__fp = [
-		39,  7, 47, 15, 55, 23, 63, 31,
-		38,  6, 46, 14, 54, 22, 62, 30,
-		37,  5, 45, 13, 53, 21, 61, 29,
-		36,  4, 44, 12, 52, 20, 60, 28,
-		35,  3, 43, 11, 51, 19, 59, 27,
-		34,  2, 42, 10, 50, 18, 58, 26,
-		33,  1, 41,  9, 49, 17, 57, 25,
-		32,  0, 40,  8, 48, 16, 56, 24
-	]
-
 	# Type of crypting being done
 	ENCRYPT =	0x00
 	DECRYPT =	0x01
@@ -462,7 +469,7 @@ class des(_baseDes):
 	# Create the 16 subkeys, K[1] - K[16]
 	def __create_sub_keys(self):
 		"""Create the 16 subkeys K[1] to K[16] from the given key"""
-		key = self.__permutate(des.__pc1, self.__String_to_BitList(self.getKey()))
+		key = self.__permutate(_pc1, self.__String_to_BitList(self.getKey()))
 		i = 0
 		# Split into Left and Right sections
 		self.L = key[:28]
@@ -470,7 +477,7 @@ class des(_baseDes):
 		while i < 16:
 			j = 0
 			# Perform circular left shifts
-			while j < des.__left_rotations[i]:
+			while j < _left_rotations[i]:
 				self.L.append(self.L[0])
 				del self.L[0]
 
@@ -480,19 +487,19 @@ class des(_baseDes):
 				j += 1
 
 			# Create one of the 16 subkeys through pc2 permutation
-			self.Kn[i] = self.__permutate(des.__pc2, self.L + self.R)
+			self.Kn[i] = self.__permutate(_pc2, self.L + self.R)
 
 			i += 1
 
 	# Main part of the encryption algorithm, the number cruncher :)
 	def __des_crypt(self, block, crypt_type):
 		"""Crypt the block of data through DES bit-manipulation"""
-		block = self.__permutate(des.__ip, block)
+		block = self.__permutate(_ip, block)
 		self.L = block[:32]
 		self.R = block[32:]
 
 		# Encryption starts from Kn[1] through to Kn[16]
-		if crypt_type == des.ENCRYPT:
+		if crypt_type == bitlist_des.ENCRYPT:
 			iteration = 0
 			iteration_adjustment = 1
 		# Decryption starts from Kn[16] down to Kn[1]
@@ -506,7 +513,7 @@ class des(_baseDes):
 			tempR = self.R[:]
 
 			# Permutate R[i - 1] to start creating R[i]
-			self.R = self.__permutate(des.__expansion_table, self.R)
+			self.R = self.__permutate(_expansion_table, self.R)
 
 			# Exclusive or R[i - 1] with K[i], create B[1] to B[8] whilst here
 			self.R = list(map(lambda x, y: x ^ y, self.R, self.Kn[iteration]))
@@ -530,7 +537,7 @@ class des(_baseDes):
 				n = (B[j][1] << 3) + (B[j][2] << 2) + (B[j][3] << 1) + B[j][4]
 
 				# Find the permutation value
-				v = des.__sbox[j][(m << 4) + n]
+				v = _sbox[j][(m << 4) + n]
 
 				# Turn value into bits, add it to result: Bn
 				Bn[pos] = (v & 8) >> 3
@@ -542,7 +549,7 @@ class des(_baseDes):
 				j += 1
 
 			# Permutate the concatination of B[1] to B[8] (Bn)
-			self.R = self.__permutate(des.__p, Bn)
+			self.R = self.__permutate(_p, Bn)
 
 			# Xor with L[i - 1]
 			self.R = list(map(lambda x, y: x ^ y, self.R, self.L))
@@ -559,7 +566,7 @@ class des(_baseDes):
 			iteration += iteration_adjustment
 		
 		# Final permutation of R[16]L[16]
-		self.final = self.__permutate(des.__fp, self.R + self.L)
+		self.final = self.__permutate(_fp, self.R + self.L)
 		return self.final
 
 
@@ -571,7 +578,7 @@ class des(_baseDes):
 		if not data:
 			return ''
 		if len(data) % self.block_size != 0:
-			if crypt_type == des.DECRYPT: # Decryption must work on 8 byte blocks
+			if crypt_type == bitlist_des.DECRYPT: # Decryption must work on 8 byte blocks
 				raise ValueError("Invalid data length, data must be a multiple of " + str(self.block_size) + " bytes\n.")
 			if not self.getPadding():
 				raise ValueError("Invalid data length, data must be a multiple of " + str(self.block_size) + " bytes\n. Try setting the optional padding character")
@@ -605,7 +612,7 @@ class des(_baseDes):
 
 			# Xor with IV if using CBC mode
 			if self.getMode() == CBC:
-				if crypt_type == des.ENCRYPT:
+				if crypt_type == bitlist_des.ENCRYPT:
 					block = list(map(lambda x, y: x ^ y, block, iv))
 					#j = 0
 					#while j < len(block):
@@ -614,7 +621,7 @@ class des(_baseDes):
 
 				processed_block = self.__des_crypt(block, crypt_type)
 
-				if crypt_type == des.DECRYPT:
+				if crypt_type == bitlist_des.DECRYPT:
 					processed_block = list(map(lambda x, y: x ^ y, processed_block, iv))
 					#j = 0
 					#while j < len(processed_block):
@@ -659,7 +666,7 @@ class des(_baseDes):
 		if pad is not None:
 			pad = self._guardAgainstUnicode(pad)
 		data = self._padData(data, pad, padmode)
-		return self.crypt(data, des.ENCRYPT)
+		return self.crypt(data, bitlist_des.ENCRYPT)
 
 	def decrypt(self, data, pad=None, padmode=None):
 		"""decrypt(data, [pad], [padmode]) -> bytes
@@ -679,9 +686,143 @@ class des(_baseDes):
 		data = self._guardAgainstUnicode(data)
 		if pad is not None:
 			pad = self._guardAgainstUnicode(pad)
-		data = self.crypt(data, des.DECRYPT)
+		data = self.crypt(data, bitlist_des.DECRYPT)
 		return self._unpadData(data, pad, padmode)
 
+#############################################################################
+# 			    DES (integer tables)			    #
+#############################################################################
+def _permByteTables(table, inBits):
+	"""Byte tables for a bit permutation: output bit i = input bit table[i] (bit 0 = MSB).
+	The result for an input is the OR of tabs[n][byte n of the input]"""
+	outBits = len(table)
+	tabs = []
+	for n in range(inBits // 8):
+		masks = [0] * 8		# output bits set by bit b (0 = MSB) of byte n
+		for i, src in enumerate(table):
+			if src // 8 == n:
+				masks[src % 8] |= 1 << (outBits - 1 - i)
+		row = [0] * 256
+		for v in range(1, 256):
+			low = v & -v
+			row[v] = row[v ^ low] | masks[8 - low.bit_length()]
+		tabs.append(row)
+	return tabs
+
+def _spTables():
+	"""_sp[j][b] = S-box j applied to 6-bit value b, then permuted by P (32-bit result)"""
+	sp = []
+	for j in range(8):
+		row = []
+		for b in range(64):
+			v = _sbox[j][(((b >> 5) << 1) | (b & 1)) * 16 + ((b >> 1) & 15)]
+			x = 0
+			for i, src in enumerate(_p):
+				if src // 4 == j and (v >> (3 - src % 4)) & 1:
+					x |= 1 << (31 - i)
+			row.append(x)
+		sp.append(row)
+	return sp
+
+_ipTabs = _permByteTables(_ip, 64)
+_fpTabs = _permByteTables(_fp, 64)
+_sp = _spTables()
+_lastSchedule = (None, None)	# (key, (encryption subkeys, decryption subkeys)), for the most recent key only
+
+def _keySchedule(key):
+	"""Return the 16 subkeys for key, each as eight 6-bit values, in encryption and decryption
+	order.  Only the last key's schedule is kept, so a run of des objects with the same key
+	(acctEncrypt/acctDecrypt) computes it once, without holding on to older keys."""
+	global _lastSchedule
+	if _lastSchedule[0] != key:
+		if _pythonMajorVersion < 3:
+			data = [ord(c) for c in key]
+		else:
+			data = list(key)
+		bits = [(data[i // 8] >> (7 - i % 8)) & 1 for i in range(64)]
+		cd = [bits[i] for i in _pc1]
+		C, D = cd[:28], cd[28:]
+		Kn = []
+		for shift in _left_rotations:
+			C = C[shift:] + C[:shift]
+			D = D[shift:] + D[:shift]
+			k = [(C + D)[i] for i in _pc2]
+			Kn.append(tuple(sum(k[6*j + i] << (5 - i) for i in range(6)) for j in range(8)))
+		_lastSchedule = (key, (Kn, Kn[::-1]))
+	return _lastSchedule[1]
+
+def _desBlock(x, Kn):
+	"""Run the 64-bit integer block x through the DES rounds, with subkeys Kn"""
+	ip0, ip1, ip2, ip3, ip4, ip5, ip6, ip7 = _ipTabs
+	x = (ip0[x >> 56] | ip1[(x >> 48) & 255] | ip2[(x >> 40) & 255] | ip3[(x >> 32) & 255] |
+	     ip4[(x >> 24) & 255] | ip5[(x >> 16) & 255] | ip6[(x >> 8) & 255] | ip7[x & 255])
+	L = x >> 32
+	R = x & 0xffffffff
+	S0, S1, S2, S3, S4, S5, S6, S7 = _sp
+	for k0, k1, k2, k3, k4, k5, k6, k7 in Kn:
+		# expansion: 34 bits = last bit of R, R, first bit of R.  Each 6-bit group starts 4 bits on
+		e = ((R & 1) << 33) | (R << 1) | (R >> 31)
+		L, R = R, L ^ (S0[((e >> 28) & 63) ^ k0] | S1[((e >> 24) & 63) ^ k1] |
+			       S2[((e >> 20) & 63) ^ k2] | S3[((e >> 16) & 63) ^ k3] |
+			       S4[((e >> 12) & 63) ^ k4] | S5[((e >> 8) & 63) ^ k5] |
+			       S6[((e >> 4) & 63) ^ k6] | S7[(e & 63) ^ k7])
+	x = (R << 32) | L
+	fp0, fp1, fp2, fp3, fp4, fp5, fp6, fp7 = _fpTabs
+	return (fp0[x >> 56] | fp1[(x >> 48) & 255] | fp2[(x >> 40) & 255] | fp3[(x >> 32) & 255] |
+		fp4[(x >> 24) & 255] | fp5[(x >> 16) & 255] | fp6[(x >> 8) & 255] | fp7[x & 255])
+
+class des(bitlist_des):
+	"""DES encryption/decrytpion class.  Same interface and results as bitlist_des, but
+	each 8-byte block is a 64-bit integer, and the permutations and S-boxes are table lookups.
+
+	pyDes.des(key,[mode], [IV], [pad], [padmode])   (see bitlist_des)
+	"""
+
+	def setKey(self, key):
+		"""Will set the crypting key for this object. Must be 8 bytes."""
+		_baseDes.setKey(self, key)
+		self.Kn = _keySchedule(self.getKey())
+
+	def crypt(self, data, crypt_type):
+		"""Crypt the data in 8-byte blocks"""
+
+		# Error check the data
+		if not data:
+			return ''
+		if len(data) % self.block_size != 0:
+			if crypt_type == des.DECRYPT: # Decryption must work on 8 byte blocks
+				raise ValueError("Invalid data length, data must be a multiple of " + str(self.block_size) + " bytes\n.")
+			if not self.getPadding():
+				raise ValueError("Invalid data length, data must be a multiple of " + str(self.block_size) + " bytes\n. Try setting the optional padding character")
+			else:
+				data += (self.block_size - (len(data) % self.block_size)) * self.getPadding()
+
+		cbc = self.getMode() == CBC
+		if cbc:
+			if self.getIV():
+				iv = struct.unpack('>Q', self.getIV())[0]
+			else:
+				raise ValueError("For CBC mode, you must supply the Initial Value (IV) for ciphering")
+
+		if crypt_type == des.ENCRYPT:
+			Kn = self.Kn[0]
+		else:
+			Kn = self.Kn[1]
+
+		fmt = '>%dQ' % (len(data) // 8)
+		result = []
+		for block in struct.unpack(fmt, data):
+			if not cbc:
+				result.append(_desBlock(block, Kn))
+			elif crypt_type == des.ENCRYPT:
+				iv = _desBlock(block ^ iv, Kn)
+				result.append(iv)
+			else:
+				result.append(_desBlock(block, Kn) ^ iv)
+				iv = block
+		return struct.pack(fmt, *result)
+
+
 def getDESpw(prompt = 'Password'):
     #ask for password and force to an 8-byte size, consistent with DES key requirements
     pw=' '
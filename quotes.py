@@ -67,15 +67,165 @@
 #   -Changed try/catch for URLopen to catch *any* exception
 # 14Sep2015*rlc
 #   -Changed yahoo time parse to read hours in 24hr format
-
-import os, sys, time, urllib2, socket, shlex, re, csv, uuid
-import site_cfg
+# 17Oct2026*nt
+#   -Quotes are retrieved in parallel (QuoteWorkers in sites.dat), with a per-provider request rate limit
+#   -Replaced the module-level quote settings and socket.setdefaulttimeout() with a QuoteSources object,
+#    so concurrent lookups don't share global state
+#   -Yahoo CSV quotes are requested in batches of symbols (YahooBatchSize in sites.dat).  Only symbols
+#    missing from the batch reply go on to the Yahoo scrape and Google Finance fallbacks
+#   -Added QuoteCache (QuoteCacheTTL in sites.dat).  Recent quotes, and quotes from the last session
+#    while the market is closed, are reused without going to the network
+#   -Use the shared site_cfg object (site_cfg.shared_cfg())
+#   -OfxWriter writes the quote statement straight to file with rlib1.OfxEmitter, rather than
+#    building the position and security lists as nested strings
+#   -getQuotes() records its timings: rate limit waits, fetches, the statement(s) and quotes.htm
+#    (see timing.py)
+
+import os, sys, time, glob, urllib2, socket, shlex, re, csv, uuid, threading, pickle, cStringIO
+import site_cfg, timing
 from rlib1 import *
-from datetime import datetime
+from datetime import datetime, timedelta
 from control2 import *
 
 join = str.join
 
+class RateLimiter:
+    """Spread requests to one quote provider at no more than [rate] per second (shared by all threads)"""
+    def __init__(self, rate):
+        self.interval = 0.0
+        if rate > 0: self.interval = 1.0/rate
+        self.next = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        self.lock.acquire()
+        now = time.time()
+        t = max(now, self.next)
+        self.next = t + self.interval
+        self.lock.release()
+        if t > now: time.sleep(t - now)
+
+class QuoteCache:
+    """
+    On-disk cache of quote results (the csv row for each quote), keyed by (ticker, provider).
+    An entry is fresh if it is younger than ttl minutes, or if the market has closed since it was
+    retrieved and the quote is for that last session.  Fresh quotes stay good until the next open.
+    """
+    maxAge = 7          #days.  older entries are dropped when the cache is saved
+    maxEntries = 5000
+    usZones = ['EST', 'EDT', 'CST', 'CDT', 'MST', 'MDT', 'PST', 'PDT', 'ET', 'CT', 'MT', 'PT']
+    
+    def __init__(self, filename, ttl, timezone):
+        #ttl = minutes, timezone = YahooTimeZone (e.g., -5:EST), used for market hours
+        self.filename = filename
+        self.ttl = ttl * 60
+        self.tzHours = float2(timezone.split(':')[0])
+        self.usDst = timezone.split(':')[-1].strip().upper() in self.usZones
+        self.entries = {}       #(ticker, provider): [fetched (epoch secs), csvtxt, quoteURL]
+        self.lock = threading.Lock()
+        self.hits = 0
+        if glob.glob(filename) <> []:
+            try:
+                f = open(filename, 'rb')
+                self.entries = pickle.load(f)
+                f.close()
+            except:
+                self.entries = {}    #start over if the file is unreadable
+    
+    def _marketTime(self, t):
+        #epoch secs -> exchange local datetime.  for a US zone, daylight saving time runs from 2am on the
+        #second Sunday in March to 2am (daylight time) on the first Sunday in November
+        local = datetime.utcfromtimestamp(t) + timedelta(hours=self.tzHours)
+        if self.usDst:
+            mar = datetime(local.year, 3, 8, 2)
+            nov = datetime(local.year, 11, 1, 1)
+            start = mar + timedelta(days=(6 - mar.weekday()) % 7)
+            end = nov + timedelta(days=(6 - nov.weekday()) % 7)
+            if start <= local < end: local += timedelta(hours=1)
+        return local
+    
+    def _lastClose(self, now):
+        #most recent weekday 16:00 at or before exchange time now, and whether the market is closed at now
+        close = now.replace(hour=16, minute=0, second=0, microsecond=0)
+        isOpen = now.weekday() < 5 and now.replace(hour=9, minute=30, second=0, microsecond=0) <= now < close
+        if now < close: close -= timedelta(days=1)
+        while close.weekday() >= 5: close -= timedelta(days=1)
+        return close, not isOpen
+    
+    def _fresh(self, entry, now):
+        fetched, csvtxt, quoteURL = entry
+        if now - fetched < self.ttl: return True
+        close, closed = self._lastClose(self._marketTime(now))
+        if not closed or self._marketTime(fetched) < close: return False
+        try:
+            qdate = datetime.strptime(list(csv.reader([csvtxt]))[0][2].strip(), "%m/%d/%Y")
+        except:
+            return False
+        return qdate.date() == close.date()
+    
+    def get(self, ticker, providers):
+        #return (provider, csvtxt, quoteURL) for the first provider with a fresh entry, or None
+        now = time.time()
+        self.lock.acquire()
+        try:
+            for p in providers:
+                entry = self.entries.get((ticker, p))
+                if entry and self._fresh(entry, now):
+                    self.hits += 1
+                    return p, entry[1], entry[2]
+        finally:
+            self.lock.release()
+        return None
+    
+    def put(self, ticker, provider, csvtxt, quoteURL):
+        self.lock.acquire()
+        self.entries[(ticker, provider)] = [time.time(), csvtxt, quoteURL]
+        self.lock.release()
+    
+    def save(self):
+        #drop old entries (oldest first, if we're over maxEntries) and write the cache file
+        self.lock.acquire()
+        try:
+            oldest = time.time() - self.maxAge*86400
+            keep = sorted([(e[0], k) for k, e in self.entries.items() if e[0] > oldest], reverse=True)
+            self.entries = dict([(k, self.entries[k]) for t, k in keep[:self.maxEntries]])
+            f = open(self.filename, 'wb')
+            pickle.dump(self.entries, f, 2)
+            f.close()
+        except Exception as inst:
+            print "** Could not save", self.filename, ":", inst
+        finally:
+            self.lock.release()
+
+class QuoteSources:
+    """
+    Quote provider settings from sites.dat, shared by every Security in a getQuotes() run.
+    Each provider (Yahoo, Google) has its own rate limiter.
+    """
+    def __init__(self, userdat):
+        self.eYahoo = userdat.enableYahooFinance
+        self.YahooURL = userdat.YahooURL
+        self.GoogleURL = userdat.GoogleURL
+        self.eYScrape = userdat.enableYahooScrape
+        self.eGoogle = userdat.enableGoogleFinance
+        self.YahooTimeZone = userdat.YahooTimeZone
+        self.timeout = 10    #socket timeout for server read, secs
+        self.limits = {'Y': RateLimiter(userdat.quoteRate), 'G': RateLimiter(userdat.quoteRate)}
+        self.providers = [p for p, enabled in [('Y', self.eYahoo), ('G', self.eGoogle)] if enabled]
+        self.phases = timing.Phases('QUOTES')
+        self.cache = None
+        if userdat.quoteCacheTTL > 0:
+            self.cache = QuoteCache(quoteCacheFile, userdat.quoteCacheTTL, self.YahooTimeZone)
+
+    def fetch(self, provider, url):
+        #read url from provider 'Y' or 'G', waiting for the provider's rate limit
+        t = time.time()
+        self.limits[provider].wait()
+        t = self.phases.add('ratelimit', t)
+        data = urllib2.urlopen(url, timeout=self.timeout).read()
+        self.phases.add('fetch', t, len(data))
+        return data
+
 class Security:
     """
     Encapsulate a stock or mutual fund. A Security has a ticker, a name, a price quote, and 
@@ -86,47 +236,51 @@ class Security:
         status, source, ticker, name, price, quoteTime, pclose, pchange
     """
 
-    def __init__(self, item):
+    def __init__(self, item, sources):
         #item = {"ticker":TickerSym, 'm':multiplier, 's':symbol}
         # TickerSym = symbol to grab from Yahoo
         # m         = multiplier for quote
         # s         = symbol to pass to Money
+        #sources = QuoteSources (provider urls, enable flags, timeouts)
         self.ticker = item['ticker']
         self.multiplier = item['m']
         self.symbol = item['s']
         self.status = True
-        socket.setdefaulttimeout(10)    #default socket timeout for server read, secs
+        self.src = sources
         
     def _removeIllegalChars(self, inputString):
         pattern = re.compile("[^a-zA-Z0-9 ,.-]+")
         return pattern.sub("", inputString)
         
-    def getQuote(self):
+    def getQuote(self, csvtxt=None):
         
         #Yahoo! Finance:  
         #    name (n), lastprice (l1), date (d1), time(t1), previous close (p), %change (p2)
+        #csvtxt = this security's row from a batched Yahoo CSV request (see getYahooBatch()), if we have one.
+        #         The Yahoo CSV service is only called here when csvtxt is None.
         
         if Debug: print "Getting quote for:", self.ticker
-        url = YahooURL+"/d/quotes.csv?s=%s&f=nl1d1t1pp2" % self.ticker
+        src = self.src
+        url = src.YahooURL+"/d/quotes.csv?s=%s&f=nl1d1t1pp2" % self.ticker
         
         self.status=False
         self.source='Y'
         #note: each try for a quote sets self.status=true if successful
-        if eYahoo:
+        if src.eYahoo:
             try:
-                csvtxt = urllib2.urlopen(url).read()
+                if csvtxt is None: csvtxt = src.fetch('Y', url)
                 quote = self.csvparse(csvtxt)
-                self.quoteURL = YahooURL + '/q?s=%s&ql=1url' % self.ticker
+                self.quoteURL = src.YahooURL + '/q?s=%s&ql=1url' % self.ticker
             except:
                 print "** An error occurred when connecting to the Yahoo CSV service"
                 self.status = False
         
-            if not self.status and eYScrape:
+            if not self.status and src.eYScrape:
                 # try screen scrape
                 csvtxt = self.YahooScrape()
                 quote = self.csvparse(csvtxt)        
         
-        if not self.status and eGoogle:
+        if not self.status and src.eGoogle:
             # try screen scrape
             csvtxt = self.GoogleScrape()
             quote = self.csvparse(csvtxt)
@@ -136,36 +290,56 @@ class Security:
             print "** ", self.ticker, ': invalid quote response. Skipping...'
             self.name = '*InvalidSymbol*'
         else:
-            #show/save what we got   rlc*2010
-            # example: "Amazon.com, Inc.",78.46,"9/3/2009","4:00pm", 80.00, "-1.96%"
-            # Security names may have embedded commas, so use CSV utility to parse (rlc*2010)
-
-            if Debug: print "Quote result string:", csvtxt
-
-            self.name    = quote[0]
-            self.price   = quote[1]
-            self.date    = quote[2]
-            self.time    = quote[3]
-            self.pclose  = quote[4]
-            self.pchange = quote[5]
-            
-            #clean things up, format datetime str, and apply multiplier
-            #ampersand character (&) is not valid in OFX
-            self.name = self._removeIllegalChars(self.name)
-            # if security name is null, replace with name with symbol
-            if len(self.name.replace(" ", ""))==0: self.name = self.ticker
-            self.price = str(float2(self.price)*self.multiplier)  #adjust price by multiplier
-            self.date = self.date.lstrip('0 ')
-            self.datetime  = datetime.strptime(self.date + " " + self.time, "%m/%d/%Y %H:%M%p")
-            self.quoteTime = self.datetime.strftime("%Y%m%d%H%M%S") + '[' + YahooTimeZone + ']'
-            if '?' not in self.pclose and 'N/A' not in self.pclose:
-                #adjust last close price by multiplier
-                self.pclose = str(float2(self.pclose)*self.multiplier)    #previous close
-
-            name = self.ticker
-            if self.symbol <> self.ticker:
-                name = self.ticker + '(' + self.symbol + ')'
-            print self.source+':' , name, self.price, self.date, self.time
+            if src.cache: src.cache.put(self.ticker, self.source, csvtxt, self.quoteURL)
+            self._setQuote(quote, csvtxt)
+
+    def useCache(self):
+        #fill in the quote from the quote cache, without going to the network
+        #returns False if there's no fresh cache entry for this ticker
+        if not self.src.cache: return False
+        hit = self.src.cache.get(self.ticker, self.src.providers)
+        if not hit: return False
+        source, csvtxt, quoteURL = hit
+        quote = self.csvparse(csvtxt)
+        if not self.status: return False
+        if Debug: print "Cached quote for:", self.ticker
+        self.source = source
+        self.quoteURL = quoteURL
+        self._setQuote(quote, csvtxt)
+        return True
+
+    def _setQuote(self, quote, csvtxt):
+        #show/save what we got   rlc*2010
+        # example: "Amazon.com, Inc.",78.46,"9/3/2009","4:00pm", 80.00, "-1.96%"
+        # Security names may have embedded commas, so use CSV utility to parse (rlc*2010)
+
+        src = self.src
+        if Debug: print "Quote result string:", csvtxt
+
+        self.name    = quote[0]
+        self.price   = quote[1]
+        self.date    = quote[2]
+        self.time    = quote[3]
+        self.pclose  = quote[4]
+        self.pchange = quote[5]
+        
+        #clean things up, format datetime str, and apply multiplier
+        #ampersand character (&) is not valid in OFX
+        self.name = self._removeIllegalChars(self.name)
+        # if security name is null, replace with name with symbol
+        if len(self.name.replace(" ", ""))==0: self.name = self.ticker
+        self.price = str(float2(self.price)*self.multiplier)  #adjust price by multiplier
+        self.date = self.date.lstrip('0 ')
+        self.datetime  = datetime.strptime(self.date + " " + self.time, "%m/%d/%Y %H:%M%p")
+        self.quoteTime = self.datetime.strftime("%Y%m%d%H%M%S") + '[' + src.YahooTimeZone + ']'
+        if '?' not in self.pclose and 'N/A' not in self.pclose:
+            #adjust last close price by multiplier
+            self.pclose = str(float2(self.pclose)*self.multiplier)    #previous close
+
+        name = self.ticker
+        if self.symbol <> self.ticker:
+            name = self.ticker + '(' + self.symbol + ')'
+        print self.source+':' , name, self.price, self.date, self.time
 
                 
     def csvparse(self, csvtxt):
@@ -193,9 +367,9 @@ class Security:
         if Debug: print "Trying Yahoo scrape for: ", self.ticker
 
         #http://finance.yahoo.com/q?s=F0CAN05MQI.TO&ql=1
-        url = YahooURL+"/q?s=" + self.ticker+"&ql=1"
+        url = self.src.YahooURL+"/q?s=" + self.ticker+"&ql=1"
         try:
-            ht=urllib2.urlopen(url).read().upper()
+            ht=self.src.fetch('Y', url).upper()
             self.quoteURL = url
         except:
             print "** error reading " + url + "\n"
@@ -265,9 +439,9 @@ class Security:
         if Debug: print "Trying Google Finance for: ", self.ticker
 
         #Example url:  https://www.google.com/finance?q=msft
-        url = GoogleURL + "?q=" + self.ticker
+        url = self.src.GoogleURL + "?q=" + self.ticker
         try:
-            ht=urllib2.urlopen(url).read().upper()
+            ht=self.src.fetch('G', url).upper()
             self.quoteURL = url
         except:
             print "** error reading " + url + "\n"
@@ -339,169 +513,225 @@ class OfxWriter:
                 
         return dtasof
         
-    def _signOn(self):
+    def _signOn(self, e):
         """Generate server signon response message"""
-    
-        return OfxTag("SIGNONMSGSRSV1",
-                    OfxTag("SONRS",
-                         OfxTag("STATUS",
-                             OfxField("CODE", "0"),
-                             OfxField("SEVERITY", "INFO"),
-                             OfxField("MESSAGE","Successful Sign On")
-                         ),
-                         OfxField("DTSERVER", OfxDate()),
-                         OfxField("LANGUAGE", "ENG"),
-                         OfxField("DTPROFUP", "20010918083000"),
-                         OfxTag("FI", OfxField("ORG", "PocketSense"))
-                     )
-               )
-
-    def invPosList(self):
+        e.open("SIGNONMSGSRSV1")
+        e.open("SONRS")
+        e.open("STATUS")
+        e.field("CODE", "0")
+        e.field("SEVERITY", "INFO")
+        e.field("MESSAGE","Successful Sign On")
+        e.close("STATUS")
+        e.field("DTSERVER", OfxDate())
+        e.field("LANGUAGE", "ENG")
+        e.field("DTPROFUP", "20010918083000")
+        e.open("FI")
+        e.field("ORG", "PocketSense")
+        e.close("FI")
+        e.close("SONRS")
+        e.close("SIGNONMSGSRSV1")
+
+    def invPosList(self, e):
         # create INVPOSLIST section, including all stock and MF symbols
-        posstock = []
+        e.open("INVPOSLIST")
         for stock in self.stockList:
-            posstock.append(self._pos("stock", stock.symbol, stock.price, stock.quoteTime))
-
-        posmf = []
+            self._pos(e, "stock", stock.symbol, stock.price, stock.quoteTime)
         for mf in self.mfList:
-            posmf.append(self._pos("mf", mf.symbol, mf.price, mf.quoteTime))
-            
-        return OfxTag("INVPOSLIST",          
-                    join("", posstock),     #str.join("",StrList) = "str(0)+str(1)+str(2)..."
-                    join("", posmf))
-
-
-    def _pos(self, type, symbol, price, quoteTime):
-        return OfxTag("POS" + type.upper(),
-                   OfxTag("INVPOS",
-                       OfxTag("SECID",
-                           OfxField("UNIQUEID", symbol),
-                           OfxField("UNIQUEIDTYPE", "TICKER")
-                       ),
-                       OfxField("HELDINACCT", "CASH"),
-                       OfxField("POSTYPE", "LONG"),
-                       OfxField("UNITS", str(self.shares)),
-                       OfxField("UNITPRICE", price),
-                       OfxField("MKTVAL", str(float2(price)*self.shares)),
-                       #OfxField("MKTVAL", "0"),     #rlc:08-2013
-                       OfxField("DTPRICEASOF", quoteTime)
-                   )
-               )
-
-    def invStmt(self, acctid):
+            self._pos(e, "mf", mf.symbol, mf.price, mf.quoteTime)
+        e.close("INVPOSLIST")
+
+    def _pos(self, e, type, symbol, price, quoteTime):
+        e.open("POS" + type.upper())
+        e.open("INVPOS")
+        self._secID(e, symbol)
+        e.field("HELDINACCT", "CASH")
+        e.field("POSTYPE", "LONG")
+        e.field("UNITS", str(self.shares))
+        e.field("UNITPRICE", price)
+        e.field("MKTVAL", str(float2(price)*self.shares))
+        #e.field("MKTVAL", "0")     #rlc:08-2013
+        e.field("DTPRICEASOF", quoteTime)
+        e.close("INVPOS")
+        e.close("POS" + type.upper())
+
+    def _secID(self, e, symbol):
+        e.open("SECID")
+        e.field("UNIQUEID", symbol)
+        e.field("UNIQUEIDTYPE", "TICKER")
+        e.close("SECID")
+
+    def invStmt(self, e, acctid):
         #write the INVSTMTRS section
-        stmt = OfxTag("INVSTMTRS",
-                OfxField("DTASOF", self.dtasof),
-                OfxField("CURDEF", self.currency),
-                OfxTag("INVACCTFROM",
-                    OfxField("BROKERID", "PocketSense"),
-                    OfxField("ACCTID",acctid)
-                ),
-                OfxTag("INVTRANLIST",
-                    OfxField("DTSTART", self.dtasof),
-                    OfxField("DTEND", self.dtasof),
-                ),
-                self.invPosList()
-               )
-
-        return stmt
-
-    def invServerMsg(self,stmt):
-        #wrap stmt in INVSTMTMSGSRSV1 tag set
-        s = OfxTag("INVSTMTTRNRS",
-                    OfxField("TRNUID",ofxUUID()),
-                    OfxTag("STATUS",
-                        OfxField("CODE", "0"),
-                        OfxField("SEVERITY", "INFO")),
-                    OfxField("CLTCOOKIE","4"), 
-                    stmt)
-        return OfxTag("INVSTMTMSGSRSV1", s)
+        e.open("INVSTMTRS")
+        e.field("DTASOF", self.dtasof)
+        e.field("CURDEF", self.currency)
+        e.open("INVACCTFROM")
+        e.field("BROKERID", "PocketSense")
+        e.field("ACCTID",acctid)
+        e.close("INVACCTFROM")
+        e.open("INVTRANLIST")
+        e.field("DTSTART", self.dtasof)
+        e.field("DTEND", self.dtasof)
+        e.close("INVTRANLIST")
+        self.invPosList(e)
+        e.close("INVSTMTRS")
+
+    def invServerMsg(self, e, acctid):
+        #write the statement for acctid, in the INVSTMTMSGSRSV1 tag set
+        e.open("INVSTMTMSGSRSV1")
+        e.open("INVSTMTTRNRS")
+        e.field("TRNUID",ofxUUID())
+        e.open("STATUS")
+        e.field("CODE", "0")
+        e.field("SEVERITY", "INFO")
+        e.close("STATUS")
+        e.field("CLTCOOKIE","4")
+        self.invStmt(e, acctid)
+        e.close("INVSTMTTRNRS")
+        e.close("INVSTMTMSGSRSV1")
         
-    def _secList(self):
-        stockinfo = []
+    def _secList(self, e):
+        e.open("SECLISTMSGSRSV1")
+        e.open("SECLIST")
         for stock in self.stockList:
-            stockinfo.append(self._info("stock", stock.symbol, stock.name, stock.price))
-
-        mfinfo = []
+            self._info(e, "stock", stock.symbol, stock.name, stock.price)
         for mf in self.mfList:
-            mfinfo.append(self._info("mf", mf.symbol, mf.name, mf.price))
-
-        return OfxTag("SECLISTMSGSRSV1",
-                   OfxTag("SECLIST",
-                        join("", stockinfo),
-                        join("", mfinfo)
-                   )
-               )
-
-    def _info(self, type, symbol, name, price):
-        secInfo = OfxTag("SECINFO",
-                       OfxTag("SECID",
-                           OfxField("UNIQUEID", symbol),
-                           OfxField("UNIQUEIDTYPE", "TICKER")
-                       ),
-                       OfxField("SECNAME", name),
-                       OfxField("TICKER", symbol),
-                       OfxField("UNITPRICE", price),
-                       OfxField("DTASOF", self.dtasof)
-                   )
+            self._info(e, "mf", mf.symbol, mf.name, mf.price)
+        e.close("SECLIST")
+        e.close("SECLISTMSGSRSV1")
+
+    def _info(self, e, type, symbol, name, price):
+        e.open(type.upper() + "INFO")
+        e.open("SECINFO")
+        self._secID(e, symbol)
+        e.field("SECNAME", name)
+        e.field("TICKER", symbol)
+        e.field("UNITPRICE", price)
+        e.field("DTASOF", self.dtasof)
+        e.close("SECINFO")
         if type.upper() == "MF":
-            info = OfxTag(type.upper() + "INFO",
-                       secInfo,
-                       OfxField("MFTYPE", "OPENEND")
-                   )
-        else:
-            info = OfxTag(type.upper() + "INFO", secInfo)
-
-        return info
+            e.field("MFTYPE", "OPENEND")
+        e.close(type.upper() + "INFO")
         
+    def writeOfxMsg(self, f):
+        #write the main OFX message block to file object f
+        e = OfxEmitter(f)
+        e.open('OFX')
+        e.text('<!--Created by PocketSense scripts for Money-->')
+        e.text('<!--https://sites.google.com/site/pocketsense/home-->')
+        self._signOn(e)
+        self.invServerMsg(e, self.account)
+        self._secList(e)
+        e.close('OFX')
+        e.done()
+
     def getOfxMsg(self):
         #create main OFX message block
-        return join('', [OfxTag('OFX',
-                        '<!--Created by PocketSense scripts for Money-->',
-                        '<!--https://sites.google.com/site/pocketsense/home-->',
-                        self._signOn(),
-                        self.invServerMsg(self.invStmt(self.account)),
-                        self._secList()
-                    )])
+        buf = cStringIO.StringIO()
+        self.writeOfxMsg(buf)
+        return buf.getvalue()
 
     def writeFile(self, name):
         f = open(name,"w")
         f.write(OfxSGMLHeader())
-        f.write(self.getOfxMsg())
+        self.writeOfxMsg(f)
         f.close()
 
 #----------------------------------------------------------------------------
+def getYahooBatch(secList, sources, size):
+    #request Yahoo CSV quotes for [size] symbols at a time
+    #returns {Security: csv row} for each security in secList.  The row is '' when the batch request failed
+    #(go straight to the fallbacks) and there is no entry when the reply couldn't be matched to the symbols
+    rows = {}
+    for i in range(0, len(secList), size):
+        chunk = secList[i:i+size]
+        url = sources.YahooURL + "/d/quotes.csv?s=%s&f=nl1d1t1pp2" % ','.join([sec.ticker for sec in chunk])
+        try:
+            csvtxt = sources.fetch('Y', url)
+        except:
+            print "** An error occurred when connecting to the Yahoo CSV service"
+            for sec in chunk: rows[sec] = ''
+            continue
+        
+        #one row per symbol, in request order
+        lines = [line for line in csvtxt.splitlines() if line.strip()]
+        if len(lines) == len(chunk):
+            for sec, line in zip(chunk, lines): rows[sec] = line
+        elif Debug:
+            print "Yahoo batch reply has", len(lines), "rows for", len(chunk), "symbols.  Requesting individually."
+    return rows
+
+def _getQuote(sec, rows):
+    #getQuote() for one Security.  an error is reported, and the quote skipped
+    try:
+        sec.getQuote(rows.get(sec))
+    except Exception as inst:
+        sec.status = False
+        print "** An error occurred getting a quote for", sec.ticker, ":", inst
+
+def _getQuoteList(secList, workers, rows=None):
+    #call getQuote() for every Security in secList, using up to [workers] threads
+    #rows = batched Yahoo CSV results from getYahooBatch()
+    rows = rows or {}
+    if workers <= 1 or Debug:
+        for sec in secList: _getQuote(sec, rows)
+        return
+    
+    pending = list(secList)
+    lock = threading.Lock()
+    
+    def worker():
+        while True:
+            lock.acquire()
+            if not pending:
+                lock.release()
+                return
+            sec = pending.pop(0)
+            lock.release()
+            _getQuote(sec, rows)
+    
+    threads = [threading.Thread(target=worker) for n in range(min(workers, len(secList)))]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    for t in threads:
+        t.join()
+
 def getQuotes():
 
-    global YahooURL, eYahoo, eYScrape, GoogleURL, eGoogle, YahooTimeZone
     status = True    #overall status flag across all operations (true == no errors getting data)
+    started = time.time()
     
     #get site and other user-defined data
-    userdat = site_cfg.site_cfg()
-    stocks = userdat.stocks
-    funds = userdat.funds
-    eYahoo = userdat.enableYahooFinance
-    YahooURL = userdat.YahooURL
-    GoogleURL = userdat.GoogleURL
-    eYScrape = userdat.enableYahooScrape
-    eGoogle = userdat.enableGoogleFinance
-    YahooTimeZone = userdat.YahooTimeZone
+    userdat = site_cfg.shared_cfg()
+    sources = QuoteSources(userdat)
+    phases = sources.phases
     currency = userdat.quotecurrency
     account = userdat.quoteAccount
     ofxFile1, ofxFile2, htmFileName = '','',''
     
-    stockList = []
     print "Getting security and fund quotes..."
-    for item in stocks:
-        sec = Security(item)
-        sec.getQuote()
+    stocks = [Security(item, sources) for item in userdat.stocks]
+    funds = [Security(item, sources) for item in userdat.funds]
+    
+    #use cached quotes where we can.  only the rest go to the network
+    secList = [sec for sec in stocks + funds if not sec.useCache()]
+    rows = {}
+    if sources.eYahoo and userdat.yahooBatchSize > 1 and secList:
+        rows = getYahooBatch(secList, sources, userdat.yahooBatchSize)
+    _getQuoteList(secList, userdat.quoteWorkers, rows)
+    if sources.cache:
+        if sources.cache.hits: print sources.cache.hits, "quote(s) taken from", quoteCacheFile
+        sources.cache.save()
+    
+    #keep the sites.dat order
+    stockList = []
+    for sec in stocks:
         status = status and sec.status
         if sec.status: stockList.append(sec)
         
     mfList = []
-    for item in funds:
-        sec = Security(item)
-        sec.getQuote()
+    for sec in funds:
         status = status and sec.status
         if sec.status: mfList.append(sec)
         
@@ -512,9 +742,11 @@ def getQuotes():
         if not os.path.exists(xfrdir):
             os.mkdir(xfrdir)
         
+        t = time.time()
         ofxFile1 = xfrdir + "quotes" + OfxDate() + str(random.randrange(1e5,1e6)) + ".ofx"
         writer = OfxWriter(currency, account, 0, stockList, mfList)
         writer.writeFile(ofxFile1)
+        t = phases.add('statement', t, os.path.getsize(ofxFile1))
 
         if userdat.forceQuotes:
            #generate a second file with non-zero shares.  Getdata and Setup use this file
@@ -522,12 +754,14 @@ def getQuotes():
            ofxFile2 = xfrdir + "quotes" + OfxDate() + str(random.randrange(1e5,1e6)) + ".ofx"
            writer = OfxWriter(currency, account, 0.001, stockList, mfList)
            writer.writeFile(ofxFile2)
+           t = phases.add('statement', t, os.path.getsize(ofxFile2))
         
         if glob.glob(ofxFile1) == []:
             status = False
 
         # write quotes.htm file
         htmFileName = QuoteHTMwriter(qList)
+        phases.add('htm', t, os.path.getsize(xfrdir + "quotes.htm"))
         
         #append results to QuoteHistory.csv if enabled
         if status and userdat.savequotehistory:
@@ -545,5 +779,7 @@ def getQuotes():
                         .format(s.symbol, s.name, s.price, t2, s.pclose, s.pchange)
                 f.write(line)
             f.close()
-        
+    
+    phases.add('total', started)
+    timing.run.add(phases)
     return status, ofxFile1, ofxFile2, htmFileName
\ No newline at end of file
@@ -15,8 +15,16 @@
 # 02Feb2016*nt
 #   -Add support for opening ofx on Mac
 
+# 17Oct2026*nt
+#   -QuoteHTMwriter uses the shared site_cfg object
+#   -combineOfx() reads each statement once, in chunks, and writes the combined file as it goes.
+#    (building the file a line at a time took time proportional to the square of its size)
+#   -Added OfxEmitter, which writes an OFX message to a file as it's built.  OfxTag() copies
+#    everything inside a tag once for each level it's nested in.
+#   -combineOfx() records its timings (see timing.py)
 
-import os, glob, site_cfg, time, uuid, re, random, platform
+
+import os, glob, site_cfg, time, uuid, re, random, platform, tempfile, shutil, timing
 from control2 import *
 from datetime import datetime
 
@@ -26,7 +34,7 @@ def QuoteHTMwriter(qList):
     # See quotes.py for qList structure
     global userdat
     
-    userdat = site_cfg.site_cfg()
+    userdat = site_cfg.shared_cfg()
     
     # CREATE FILE
     filename = xfrdir + "quotes.htm"
@@ -197,6 +205,52 @@ def OfxTag(tag,*contents):
     tag2 = '</' + tag + '>'
     return '\n'.join([tag1]+list(contents)+[tag2])
 
+class OfxEmitter:
+    """Write an OFX (SGML) message to file object f as it's built.  Aggregates are opened and closed
+       explicitly, and each tag is written on its own line.  Lines are written to f in batches, so
+       memory use doesn't grow with the size of the message.  Call done() at the end."""
+    
+    batch = 1000                #lines per write to f
+    
+    def __init__(self, f):
+        self.f = f
+        self.stack = []         #open aggregates
+        self.lines = []         #lines not yet written to f
+        self.sep = ''           #line break before the next batch (none before the first)
+        
+    def open(self, tag):
+        self.lines.append('<' + tag + '>')
+        self.stack.append(tag)
+        
+    def close(self, tag):
+        #close the innermost open aggregate, which must be tag
+        if not self.stack or self.stack.pop() <> tag:
+            raise Exception('OfxEmitter: </' + tag + '> does not match the open tags')
+        lines = self.lines
+        lines.append('</' + tag + '>')
+        if len(lines) >= self.batch: self.flush()
+        
+    def field(self, tag, value):
+        #skip empty values (same as OfxField)
+        if value <> '' and tag <> '':
+            self.lines.append('<' + tag + '>' + value)
+    
+    def text(self, text):
+        #write text (e.g., a comment) on its own line
+        self.lines.append(text)
+        
+    def flush(self):
+        if self.lines:
+            self.f.write(self.sep + '\n'.join(self.lines))
+            self.sep = '\n'
+            self.lines = []
+    
+    def done(self):
+        #write the remaining lines.  all aggregates must be closed
+        if self.stack:
+            raise Exception('OfxEmitter: tags not closed: ' + str(self.stack))
+        self.flush()
+
 def OfxDate():
     return time.strftime("%Y%m%d%H%M%S",time.localtime())
 
@@ -237,67 +291,114 @@ def copy_txt_file(infile, outfile):
     return
     
 
-def combineOfx(ofxList):
+#combineOfx() sections, in output order: (tag in statements, wrapper tags in the combined file)
+_combineSections = [('BANKMSGSRSV1',       ['BANKMSGSRSV1']),
+                    ('CREDITCARDMSGSRSV1', ['CREDITCARDMSGSRSV1']),
+                    ('INVSTMTMSGSRSV1',    ['INVSTMTMSGSRSV1']),
+                    ('SECLIST',            ['SECLISTMSGSRSV1', 'SECLIST'])]
+_combineRe = re.compile('<(/?)(' + '|'.join(t for t, w in _combineSections) + ')>', re.IGNORECASE)
+_combineTagLen = max(len(t) for t, w in _combineSections) + 3     #longest tag, incl. </ and >
+
+def combineOfx(ofxList, chunkSize=65536):
     #combine ofx statements into a single file in a manner that Money seems to accept
+    #each file is read once, in chunks.  The sections found are written to a temp file per section,
+    #and copied to the combined file at the end, so memory use doesn't grow with the statements.
+    #CR/LF are removed from the statements, and each section found becomes one line
     
     dtnow = time.strftime("%Y%m%d%H%M%S",time.localtime())
-    signon =  "\r".join([
+    signon =  [
               "<SIGNONMSGSRSV1><SONRS>",
               "<STATUS><CODE>0<SEVERITY>INFO<MESSAGE>Successful Sign On</STATUS>",
               "<DTSERVER>" + dtnow,
               "<LANGUAGE>ENG<DTPROFUP>20010101010000",
-              "<FI><ORG>PocketSense</FI></SONRS></SIGNONMSGSRSV1>"])
+              "<FI><ORG>PocketSense</FI></SONRS></SIGNONMSGSRSV1>"]
     
-    #these regexes capture everything between the tags, but not the tags
-    bRe = re.compile('(?:<BANKMSGSRSV1>)(.*?)(?:</BANKMSGSRSV1>)', re.IGNORECASE)
-    cRe = re.compile('(?:<CREDITCARDMSGSRSV1>)(.*?)(?:</CREDITCARDMSGSRSV1>)', re.IGNORECASE)
-    iRe = re.compile('(?:<INVSTMTMSGSRSV1>)(.*?)(?:</INVSTMTMSGSRSV1>)', re.IGNORECASE)
-    sRe = re.compile('(?:<SECLIST>)(.*?)(?:</SECLIST>)', re.IGNORECASE)
+    phases = timing.Phases('COMBINE')
+    kinds = dict((t, n) for n, (t, w) in enumerate(_combineSections))
+    t = time.time()
+    spools = [tempfile.SpooledTemporaryFile(1048576) for n in _combineSections]
+    used = [False] * len(_combineSections)     #section goes in the combined file?
     
-    bantrn=''
-    crdtrn=''
-    invtrn=''
-    sectrn=''
-
-    for file in ofxList:
-        f=open(file[2])
-        ofx = f.read()
-        f.close()
+    try:
+        size = 0
+        for file in ofxList:
+            f = open(file[2])
+            try:
+                _splitSections(f, kinds, spools, used, chunkSize)
+                size += f.tell()
+            finally:
+                f.close()
+        t = phases.add('split', t, size)
         
-        ofx = ofx.replace(chr(13),'')   #remove CRs
-        ofx = ofx.replace(chr(10),'')   #remove LFs
+        #there should never be two combined*.ofx files here, but we'll use a unique name just in case
+        cfile = xfrdir + 'combined' + str(random.randrange(1e5,1e6)) + '.ofx'
+        f = open(cfile,'w')
+        f.write(OfxSGMLHeader())
+        f.write('\r'.join(['<OFX>'] + signon) + '\r')
+        for n, (tag, wrapper) in enumerate(_combineSections):
+            if not used[n]: continue
+            f.write(''.join('<' + w + '>\r' for w in wrapper))
+            spools[n].seek(0)
+            shutil.copyfileobj(spools[n], f)
+            f.write(''.join('</' + w + '>\r' for w in reversed(wrapper)))
+        f.write('</OFX>\r')
+        size = f.tell()
+        f.close()
+        phases.add('write', t, size)
+    finally:
+        for spool in spools: spool.close()
+    timing.run.add(phases)
+    
+    print "Combined OFX created: " + cfile
+    return cfile
+
+def _splitSections(f, kinds, spools, used, chunkSize):
+    #copy the contents of each section in file f (w/out CR/LF) to its spool file, one line per section.
+    #sections of the same kind don't nest (the first closing tag ends it), but different kinds are
+    #independent, so a SECLIST inside another section is copied to both.  A section that isn't closed
+    #is dropped.
+    start = [None] * len(spools)    #spool position where the open section started (None = not in one)
+    found = [0] * len(spools)       #sections found in this file
+    full = [False] * len(spools)    #any with content?
+    buf = ''
+    eof = False
+    while not eof:
+        chunk = f.read(chunkSize)
+        eof = not chunk
+        buf += chunk.translate(None, '\r\n')
         
-        #create a string for each section found in the file
-        #re.findall() returns a list of all matching sections
-        b = '\r'.join(bRe.findall(ofx))
-        c = '\r'.join(cRe.findall(ofx))
-        i = '\r'.join(iRe.findall(ofx))
-        s = '\r'.join(sRe.findall(ofx))
+        #a tag that may continue in the next chunk is left in buf
+        cut = len(buf)
+        if not eof: cut = max(0, len(buf) - _combineTagLen + 1)
+        pos = 0
+        for m in _combineRe.finditer(buf):
+            if m.start() >= cut: break
+            n = kinds[m.group(2).upper()]
+            close = m.group(1)
+            for i in range(len(spools)):
+                #copy the text, and the tag, to the open sections (but not a section's own closing tag)
+                if start[i] is None: continue
+                if i == n and close: spools[i].write(buf[pos:m.start()])
+                else: spools[i].write(buf[pos:m.end()])
+            
+            if not close and start[n] is None:
+                start[n] = spools[n].tell()
+            elif close and start[n] is not None:
+                found[n] += 1
+                if spools[n].tell() > start[n]:
+                    spools[n].write('\r')
+                    full[n] = True
+                start[n] = None
+            pos = m.end()
         
-        #add statements to each section
-        if b: bantrn = bantrn + '\r' + b
-        if c: crdtrn = crdtrn + '\r' + c
-        if i: invtrn = invtrn + '\r' + i
-        if s: sectrn = sectrn + '\r' + s
-
-    if bantrn: bantrn = OfxTag('BANKMSGSRSV1', bantrn)
-    if crdtrn: crdtrn = OfxTag('CREDITCARDMSGSRSV1', crdtrn)
-    if invtrn: invtrn = OfxTag('INVSTMTMSGSRSV1', invtrn)
-    if sectrn: sectrn = OfxTag('SECLISTMSGSRSV1', OfxTag('SECLIST', sectrn))
-    
-    combOfx = '\r'.join(['<OFX>', signon, bantrn, crdtrn, invtrn, sectrn, '</OFX>'])
-    
-    #remove blank lines (not required... just to clean it up)
-    combOfx2=''
-    for line in combOfx.splitlines():
-        if line: combOfx2 = combOfx2 + line + '\r'
+        cut = max(cut, pos)
+        for n in range(len(spools)):
+            if start[n] is not None: spools[n].write(buf[pos:cut])
+        buf = buf[cut:]
     
-    combOfx = OfxSGMLHeader() + combOfx2
-    
-    #there should never be two combined*.ofx files here, but we'll use a unique name just in case
-    cfile = xfrdir + 'combined' + str(random.randrange(1e5,1e6)) + '.ofx'
-    f=open(cfile,'w')
-    f.write(combOfx)
-    f.close()
-    print "Combined OFX created: " + cfile
-    return cfile
\ No newline at end of file
+    for n in range(len(spools)):
+        if start[n] is not None:
+            #not closed
+            spools[n].seek(start[n])
+            spools[n].truncate()
+        if full[n] or found[n] > 1: used[n] = True
\ No newline at end of file
@@ -27,49 +27,199 @@
 # 20-Feb-2014*rlc
 #   - Bug fix in _scrubINVsign() for SELL transactions
 
-import os, sys, re, datetime
+# 17-Oct-2026*nt
+#   - Use the shared site_cfg object, rather than parsing sites.dat at import
+#   - Scrub in a single pass over the OFX tags, writing the result as it goes.
+#     The original regex passes are kept, and used for messages the single pass can't handle.
+#   - Bug fix in _scrubShiftTime() when a statement has no <DTASOF> field
+#   - Scrub fixes are registered as rules (compiled once), selected per site with the sites.dat
+#     "scrub:" field, and skipped when they can't match the statement
+#   - Discover FITID serial numbers are assigned per statement, in constant time per transaction.
+#     (the list of assigned values was never reset, and grew with every statement scrubbed)
+#   - Added scrubTo(), which scrubs a message already in memory and writes it to a file object
+
+import os, sys, re, datetime, cStringIO
 import site_cfg
 from control2 import *
 
-userdat = site_cfg.site_cfg()
 nullTimeUpdated = False
 stat=False
 
 def scrubPrint(line):
-    if not userdat.quietScrub:
+    if not site_cfg.shared_cfg().quietScrub:
         print line
     
 def scrub(filename, site):
     #filename = string
     #site = DICT structure containing full site info from sites.dat
  
-    siteURL = FieldVal(site, 'url').upper()
-    dtHrs = FieldVal(site, 'timeOffset')
     f = open(filename,'r')
     ofx = f.read()  #as-found ofx message
-    #print ofx
+    f.close()
     
-    if 'DISCOVERCARD' in siteURL: ofx= _scrubDiscover(ofx)
-        
-    ofx= _scrubTime(ofx)     #fix 000000 and NULL datetime stamps 
-
-    if dtHrs <> 0: ofx = _scrubShiftTime(ofx, dtHrs)   #note: always call *after* _scrubTime()
+    #write the new version to a temp file, then replace the original
+    tmpname = filename + '.tmp'
+    out = open(tmpname, 'w')
+    try:
+        scrubTo(ofx, site, out)
+        out.close()
+    except:
+        out.close()
+        os.remove(tmpname)
+        raise
+    if os.path.exists(filename): os.remove(filename)
+    os.rename(tmpname, filename)
+
+def scrubTo(ofx, site, out):
+    #scrub the ofx message (string), and write the result to the file object out
+    #the site's built-in rules are applied in a single pass over the tags.  If the message contains 
+    #a tag that the single pass can't handle the same way as the rule passes, the passes are used 
+    #instead.  Rules added with addRule() always run as passes, after the built-in rules.
+    dtHrs = FieldVal(site, 'timeOffset')
+    fire = [r for r in siteRules(site) if r.canFire(ofx, dtHrs)]    #skip rules that can't match
+    builtin = [r for r in fire if r.name in _tokenRules]
+    added = [r for r in fire if r.name not in _tokenRules]
     
-    ofx= _scrubDTSTART(ofx)  #fix missing <DTEND> fields
-      
-    #fix malformed investment buy/sell signs (neg vs pos), if they exist
-    if "<INVSTMTTRNRS>" in ofx.upper(): ofx= _scrubINVsign(ofx)  
-        
-    #perform general ofx cleanup
-    ofx = _scrubGeneral(ofx)
+    buf = out
+    if added: buf = cStringIO.StringIO()
+    try:
+        _TagScrubber(ofx, [r.name for r in builtin], dtHrs).run(buf)
+    except _Fallback:
+        buf.seek(0)
+        buf.truncate()
+        buf.write(_scrubPasses(ofx, builtin, dtHrs))
     
-    #close the input file
-    f.close()
+    if added:
+        out.write(_scrubPasses(buf.getvalue(), added, dtHrs))
+
+def _scrubPasses(ofx, rules, dtHrs):
+    #apply each rule as a regex pass over the full message
+    for rule in rules:
+        ofx = rule.scrubPass(ofx, dtHrs)
+    return ofx
+
+#-----------------------------------------------------------------------------
+# Single pass scrubber
+#   Each scrub fix only ever changes text inside one tag's token (a "<" through the character 
+#   before the next "<"), so the regex passes can be applied token by token, in order, with a
+#   single pattern that finds every token one of them would change.
+#   The exception is _scrubINVsign(), which matches across the tags of a buy/sell transaction.
+#   Its pattern can't cross a newline, so each line that holds an <INVBUY> or <INVSELL> is 
+#   scrubbed on its own and run through the original pattern.
+#   If a date tag isn't followed directly by its value, the original regex may match across
+#   tags.  _Fallback is raised, and the original passes are used for the whole message.
+
+class _Fallback(Exception):
+    pass
+
+def _ci(text):
+    #case-insensitive pattern for text.  (faster to scan for than re.IGNORECASE)
+    return ''.join(['[' + c.upper() + c.lower() + ']' if c.isalpha() else c for c in text])
+
+#token patterns, each matched after the leading '<'
+#group 1 = DT* tag, 2 = date value, 3 = DT tag not followed by its value (fallback), 
+#4 = FITID tag, 5 = FITID value, 6 = CORRECTACTION or CORRECTFITID, 7 = buy/sell line
+_dtTag     = '(' + _ci('DT') + r'[^<\n][^<>\n]*>)([^<\s]+)|(' + _ci('DT') + ')'
+_fitidTag  = '(' + _ci('FITID>') + r')([^<\s]+)'
+_generalTag= '(' + _ci('CORRECTACTION') + '|' + _ci('CORRECTFITID') + ')>[^<]+'
+_invLine   = '(' + _ci('INVBUY>') + '|' + _ci('INVSELL>') + r')[^\n]*\n?[^<]*'
+
+def _tagPattern(dt=True, fitid=False, general=True, inv=False):
+    #a fix that isn't used keeps its groups, but never matches: (?!)
+    p = []
+    p.append(_dtTag if dt else '(?!)()()()')
+    p.append(_fitidTag if fitid else '(?!)()()')
+    p.append(_generalTag if general else '(?!)()')
+    p.append(_invLine if inv else '(?!)()')
+    return re.compile('<(?:' + '|'.join(p) + ')')
+
+_tagPatterns = {}   #(dt, fitid, general, inv): compiled pattern
+
+def _getPattern(dt, fitid, general, inv):
+    key = (dt, fitid, general, inv)
+    if key not in _tagPatterns:
+        _tagPatterns[key] = _tagPattern(dt, fitid, general, inv)
+    return _tagPatterns[key]
+
+
+class _TagScrubber:
+    def __init__(self, ofx, fixes, dtHrs):
+        #fixes = names of the built-in rules to apply
+        self.ofx = ofx
+        self.discover = 'discover' in fixes
+        self.time = 'time' in fixes
+        self.shift = 'shifttime' in fixes
+        self.fixDTEND = 'dtend' in fixes
+        self.invsign = 'invsign' in fixes
+        self.general = 'general' in fixes
+        self.dtHrs = dtHrs
+        self.shifted = False
+        self.dtstarts = []
+        self.removed = {'CORRECTACTION': False, 'CORRECTFITID': False}
+        self.nowstr = datetime.datetime.now().strftime("%Y%m%d%H%M00")
+        self.fitids = _DiscoverFitids()
+        dt = self.time or self.shift or self.fixDTEND
+        self.pattern = _getPattern(dt, self.discover, self.general, self.invsign)
+        self.invEarly = _getPattern(dt, self.discover, False, False)
+        self.invGeneral = _getPattern(False, False, self.general, False)
+        
+    def run(self, out):
+        ofx = self.ofx
+        pieces = []
+        pos = 0
+        for m in self.pattern.finditer(ofx):
+            pieces.append(ofx[pos:m.start()])
+            pieces.append(self.fix(m))
+            pos = m.end()
+            if len(pieces) > 2000:
+                out.write(''.join(pieces))
+                pieces = []
+        pieces.append(ofx[pos:])
+        out.write(''.join(pieces))
+        
+        #same messages as the rule passes
+        if self.discover: scrubPrint("  +Scrubber: Processing Discover statement.")
+        if self.shifted: scrubPrint("  +Scrubber: Shifting DTASOF time values " + str(self.dtHrs) + " hours.")
+        if self.fixDTEND:
+            scrubPrint("  +Scrubber: Fixing missing <DTEND> field")
+            if Debug: print "DTSTART: findall()=", self.dtstarts
+        for tag in ['CORRECTACTION', 'CORRECTFITID']:
+            if self.removed[tag]: print("  +Scrubber: <"+tag+"> tags removed.  Not supported by Money.")
     
-    #write the new version to the same file name
-    f = open(filename, 'w')
-    f.write(ofx)
-    f.close    
+    def fix(self, m):
+        #return the scrubbed text for token pattern match m
+        tag, DT, nodate, fitidTag, fitid, utag, inv = m.groups()
+        
+        if tag:
+            #_scrubTime(), _scrubShiftTime() and _scrubDTSTART()
+            tag = '<' + tag
+            TAG = tag.upper()
+            if self.time: DT = _noonTime(DT)
+            if self.shift and TAG == '<DTASOF>':
+                DT = _shiftTime(DT, self.dtHrs)
+                self.shifted = True
+            if self.fixDTEND and TAG == '<DTSTART>':
+                self.dtstarts.append(tag + DT)
+                DT += '<DTEND>' + self.nowstr
+            return tag + DT
+        
+        if fitidTag:
+            #_scrubDiscover()
+            return '<' + fitidTag + self.fitids.next(fitid)
+        
+        if utag:
+            #_scrubGeneral()
+            self.removed[utag.upper()] = True
+            return ''
+        
+        if inv:
+            #buy/sell line: the other fixes, then _scrubINVsign(), then _scrubGeneral()
+            line = self.invEarly.sub(self.fix, m.group(0))
+            line = _invRe.sub(lambda r: _scrubINVsign_r1(r), line)
+            if self.general: line = self.invGeneral.sub(self.fix, line)
+            return line
+        
+        raise _Fallback     #nodate: date tag that the original pattern may match across tags
 
 #-----------------------------------------------------------------------------
 # OFX.DISCOVERCARD.COM
@@ -92,79 +242,86 @@ def scrub(filename, site):
 #       and we'll increment by one for each subsequent transaction that that matches
 #       a previous transaction in the file.
 
-_sD_knownvals = []  #global to keep track of Discover FITID values between regex.sub() calls
+#   4.  Serial numbers are assigned per statement.  For each FITID base value (everything but the
+#       serial number) we keep the lowest serial that might still be free, so each transaction
+#       takes constant time rather than a search of every FITID assigned so far.
+
+#regex captures everything from <FITID> up to the next <tag>, but excludes the next "<".
+#produces 2 results:  r.group(1) = <FITID> field, r.group(2)=value
+_discoverRe = re.compile(r'(<FITID>)([^<\s]+)',re.IGNORECASE)
 
 def _scrubDiscover(ofx):
 
     scrubPrint("  +Scrubber: Processing Discover statement.")
 
-    ofx_final = ''      #new ofx message
-    _sD_knownvals = []  #reset our global set of known vals (just in case)
+    fitids = _DiscoverFitids()      #FITID values assigned in this statement
     
-    #regex p captures everything from <FITID> up to the next <tag>, but excludes the next "<".
-    #p produces 2 results:  r.group(1) = <FITID> field, r.group(2)=value
-    p = re.compile(r'(<FITID>)([^<\s]+)',re.IGNORECASE)
-
     #call substitution (inline lamda, takes regex result = r as tuple)
-    ofx_final = p.sub(lambda r: _scrubDiscover_r1(r), ofx)
+    ofx_final = _discoverRe.sub(lambda r: r.group(1) + fitids.next(r.group(2).strip(' ')), ofx)
 
     return ofx_final
 
-def _scrubDiscover_r1(r):
-    #regex subsitution function for _scrubDiscover()
-    global _sD_knownvals
-
-    fieldtag = r.group(1)
-    fitid = r.group(2).strip(' ')
+class _DiscoverFitids:
+    """Unique Discover FITID values for one statement"""
+    def __init__(self):
+        self.known = set()      #FITID values assigned so far
+        self.seq = {}           #base value: lowest serial# that may still be free
     
-    #pointer to end of "base" FITID value
-    bx = len(fitid) - 5
-    fitid_b = fitid[:bx]
-    
-    #find a unique serial#, from 0 to 9999
-    seq = 0   #default
-    while seq < 9999:
-        fitid = fitid_b + str(seq)
-        exists = (fitid in _sD_knownvals)
-        if exists:  #already used it... try another
-            seq=seq+1
-        else:
-            break   #unique value... write it out
+    def next(self, fitid):
+        #return a unique FITID value for the Discover FITID value fitid
+        
+        #pointer to end of "base" FITID value
+        bx = len(fitid) - 5
+        fitid_b = fitid[:bx]
         
-    _sD_knownvals.append(fitid)         #remember the assigned value between calls
-    return fieldtag + fitid             #return the new string for regex.sub()
+        #find a unique serial#, from 0 to 9998.  Serials below seq[fitid_b] are already used
+        #(by this base, or by another base + serial that gives the same string)
+        seq = self.seq.get(fitid_b, 0)
+        while seq < 9999 and fitid_b + str(seq) in self.known:
+            seq = seq + 1
+        self.seq[fitid_b] = seq
+        
+        #all used?  reuse the last one (same as the original search)
+        fitid = fitid_b + str(min(seq, 9998))
+        self.known.add(fitid)
+        return fitid
 
 #--------------------------------    
+#regex captures everything from <DT*> up to the next <tag>, but excludes the next "<".
+#produces 2 results:  group(1) = <DT*> field, group(2)=dateval
+_timeRe = re.compile(r'(<DT.+?>)([^<\s]+)',re.IGNORECASE)
+
 def _scrubTime(ofx):
     #Replace NULL time stamps with noontime (12:00)
 
-    #regex p captures everything from <DT*> up to the next <tag>, but excludes the next "<".
-    #p produces 2 results:  group(1) = <DT*> field, group(2)=dateval
-    p = re.compile(r'(<DT.+?>)([^<\s]+)',re.IGNORECASE)
     #call date correct function (inline lamda, takes regex result = r tuple)
-    
     nullTimeUpdated = False
-    ofx_final = p.sub(lambda r: _scrubTime_r1(r), ofx)
+    ofx_final = _timeRe.sub(lambda r: _scrubTime_r1(r), ofx)
     if nullTimeUpdated: scrubPrint("  +Scrubber: Null time values updated.")
     
     return ofx_final
 
 def _scrubTime_r1(r):
+    fieldtag = r.group(1)
+    DT = r.group(2).strip(' ')      #date+time
+    return fieldtag + _noonTime(DT)
+
+def _noonTime(DT):
     # Replace zero and NULL time fields with a "NOON" timestamp (120000)
     # Force "date" to be the same as the date listed, regardless of time zone by setting time to NOON.
     # Applies when no time is given, and when time == MIDNIGHT (000000)
-    fieldtag = r.group(1)
-    DT = r.group(2).strip(' ')      #date+time
     
     # Full date/time format example:  20100730000000.000[-4:EDT]
     if DT[8:] == '' or DT[8:14] == '000000':
         #null time given.  Adjust to 120000 value (noon).
         DT = DT[:8] + '120000'
-        nullTimeUpdated = True
         
-    return fieldtag + DT
+    return DT
 
 #--------------------------------    
+#regex captures everything from <DTSTART> up to the next <tag> or white space into group(1)
+_dtstartRe = re.compile(r'(<DTSTART>[^<\s]+)',re.IGNORECASE)
+
 def _scrubDTSTART(ofx):
     # <DTSTART> field for an account statement must have a matching <DTEND> field
     # If DTEND is missing, insert <DTEND>="now"
@@ -178,26 +335,25 @@ def _scrubDTSTART(ofx):
         #we have a dtstart, but no dtend... fix it.
         scrubPrint("  +Scrubber: Fixing missing <DTEND> field")
         
-        #regex p captures everything from <DTSTART> up to the next <tag> or white space into group(1)
-        p = re.compile(r'(<DTSTART>[^<\s]+)',re.IGNORECASE)
-        if Debug: print "DTSTART: findall()=", p.findall(ofx_final)
+        if Debug: print "DTSTART: findall()=", _dtstartRe.findall(ofx_final)
         #replace group1 with (group1 + <DTEND> + datetime)
-        ofx_final = p.sub(r'\1<DTEND>'+nowstr, ofx_final)
+        ofx_final = _dtstartRe.sub(r'\1<DTEND>'+nowstr, ofx_final)
     
     return ofx_final
 
+#regex captures everything from <DTASOF> up to the next <tag> or white-space.
+#produces 2 results:  group(1) = <DTASOF> field, group(2)=dateval
+_shiftRe = re.compile(r'(<DTASOF>)([^<\s]+)',re.IGNORECASE | re.DOTALL)
+
 def _scrubShiftTime(ofx, h):
     #Shift DTASOF time values by (float) h hours
     #Added: 15-Feb-2011, rlc
     
-    #regex p captures everything from <DTASOF> up to the next <tag> or white-space.
-    #p produces 2 results:  group(1) = <DTASOF> field, group(2)=dateval
-    p = re.compile(r'(<DTASOF>)([^<\s]+)',re.IGNORECASE | re.DOTALL)
-    
     #call date correct function (inline lamda, takes regex result = r tuple)
-    if p.search(ofx): 
+    ofx_final = ofx
+    if _shiftRe.search(ofx): 
         scrubPrint("  +Scrubber: Shifting DTASOF time values " + str(h) + " hours.")
-        ofx_final = p.sub(lambda r: _scrubShiftTime_r1(r,h), ofx)    
+        ofx_final = _shiftRe.sub(lambda r: _scrubShiftTime_r1(r,h), ofx)    
 
     return ofx_final
 
@@ -210,6 +366,11 @@ def _scrubShiftTime_r1(r,h):
 
     if Debug: print "fieldtag=", fieldtag, "| DT=" + DT
     
+    return fieldtag + _shiftTime(DT, h)
+
+def _shiftTime(DT, h):
+    #Shift date+time string DT by (float) h hours
+    
     # Full date/time format example:  20100730120000.000[-4:EDT]
     #separate into date/time + timezone
     tz = ""
@@ -231,7 +392,9 @@ def _scrubShiftTime_r1(r,h):
     tval += deltaT                                        #add hours
     DT = tval.strftime("%Y%m%d%H%M%S") + tz               #convert new datetime to str
         
-    return fieldtag + DT
+    return DT
+
+_invRe = re.compile(r'(<INVBUY>|<INVSELL>)(.+?<UNITS>)(.+?)(<.+?<TOTAL>)([^<\r\n]+)', re.IGNORECASE)
 
 def _scrubINVsign(ofx):
     #Fix malformed parameters in Investment buy/sell sections, if they exist
@@ -246,8 +409,7 @@ def _scrubINVsign(ofx):
     #   TOTAL must be positive
     
     stat=False
-    p = re.compile(r'(<INVBUY>|<INVSELL>)(.+?<UNITS>)(.+?)(<.+?<TOTAL>)([^<\r\n]+)', re.IGNORECASE)
-    ofx_final=p.sub(lambda r: _scrubINVsign_r1(r), ofx)
+    ofx_final=_invRe.sub(lambda r: _scrubINVsign_r1(r), ofx)
     if stat:
         scrubPrint("  +Scrubber: Invalid investment sign (pos/neg) found.  Corrected.")
     
@@ -279,20 +441,76 @@ def _scrubINVsign_r1(r):
   
     return rtn
 
+#define unsupported tags that we've had trouble with
+_uTags = []
+for _tag in ['CORRECTACTION', 'CORRECTFITID']:
+    _uTags.append((_tag, re.compile(r'<'+_tag+'>[^<]+',re.IGNORECASE)))
+
 def _scrubGeneral(ofx):    
     # General scrub routine for singular tag substitutions 
     # Remove tag/value pairs that Money doesn't support
     
-    #define unsupported tags that we've had trouble with
-    uTags = []    
-    uTags.append('CORRECTACTION')
-    uTags.append('CORRECTFITID')
-    
     # remove tag/value pairs from ofx
-    for tag in uTags:
-        p = re.compile(r'<'+tag+'>[^<]+',re.IGNORECASE) 
+    for tag, p in _uTags:
         if p.search(ofx):
             ofx = p.sub('',ofx)
             print("  +Scrubber: <"+tag+"> tags removed.  Not supported by Money.")
     
     return ofx
+
+#-----------------------------------------------------------------------------
+# Scrub rules
+#   Each scrub fix is registered as a ScrubRule, compiled once when scrubber is imported.
+#   Every site uses the default rules.  A site entry in sites.dat can add or remove rules by name:
+#       scrub: discover -shifttime      (add the discover rule, don't shift DTASOF values)
+#       scrub: none general             (only remove unsupported tags)
+#   Before a message is scrubbed, each rule's test checks whether it can change anything in the
+#   message.  Rules that can't are skipped.
+#   More rules can be added with addRule().  They run after the built-in rules.
+
+class ScrubRule:
+    """A scrub fix that can be selected per site in sites.dat"""
+    def __init__(self, name, scrubPass, test=None, default=True):
+        self.name = name            #name used by the site "scrub:" field
+        self.scrubPass = scrubPass  #function(ofx, dtHrs): returns the scrubbed ofx message
+        self.test = test            #function(ofx, dtHrs): can this rule change ofx?  (None = always run)
+        self.default = default      #used for every site unless removed in sites.dat
+    
+    def canFire(self, ofx, dtHrs):
+        return self.test is None or self.test(ofx, dtHrs)
+
+scrubRules = []     #in the order they are applied
+
+def addRule(rule):
+    scrubRules.append(rule)
+
+def siteRules(site):
+    #return the scrub rules for site, in the order they are applied
+    names = [r.name for r in scrubRules if r.default]
+    if 'DISCOVERCARD' in FieldVal(site, 'url').upper(): names.append('discover')
+    for name in FieldVal(site, 'scrub').lower().split():
+        if name == 'none': 
+            names = []
+        elif name[:1] == '-':
+            if name[1:] in names: names.remove(name[1:])
+        else:
+            names.append(name.lstrip('+'))
+    return [r for r in scrubRules if r.name in names]
+
+def _hasTag(*tags):
+    #return a rule test: does the message contain one of tags? (case insensitive)
+    p = re.compile('|'.join([_ci(t) for t in tags]))
+    return lambda ofx, dtHrs: p.search(ofx) is not None
+
+_hasDTASOF = _hasTag('<DTASOF>')
+_hasINVSTMT = _hasTag('<INVSTMTTRNRS>')
+_hasBuySell = _hasTag('<INVBUY>', '<INVSELL>')
+
+addRule(ScrubRule('discover', lambda ofx, h: _scrubDiscover(ofx), _hasTag('<FITID>'), default=False))
+addRule(ScrubRule('time', lambda ofx, h: _scrubTime(ofx), _hasTag('<DT')))
+addRule(ScrubRule('shifttime', _scrubShiftTime, lambda ofx, h: h <> 0 and _hasDTASOF(ofx, h)))
+addRule(ScrubRule('dtend', lambda ofx, h: _scrubDTSTART(ofx), lambda ofx, h: ofx.find('<DTSTART>') >= 0 and ofx.find('<DTEND>') < 0))
+addRule(ScrubRule('invsign', lambda ofx, h: _scrubINVsign(ofx), lambda ofx, h: _hasINVSTMT(ofx, h) and _hasBuySell(ofx, h)))
+addRule(ScrubRule('general', lambda ofx, h: _scrubGeneral(ofx), _hasTag('<CORRECTACTION>', '<CORRECTFITID>')))
+
+_tokenRules = [r.name for r in scrubRules]  #built-in rules, applied by _TagScrubber
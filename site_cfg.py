@@ -30,11 +30,106 @@
 #   - Added support for QuoteAccount option
 # 19Jan2014*rlc:  
 #   -Added EnableGoogleFinance option
+# 17Oct2026*nt:
+#   -Added DownloadWorkers and MaxPerHost options (concurrent statement downloads)
+#   -Added AsyncDownloads option
+#   -Added QuoteWorkers and QuoteRate options
+#   -Added YahooBatchSize option
+#   -Added QuoteCacheTTL option
+#   -Added shared_cfg(): one site_cfg per process, rebuilt only when sites.dat changes
+#   -sites.dat is read in a single pass (sites, stocks, funds and options together)
+#   -Parsed contents are saved to sites.snap and reused until sites.dat changes
+#   -Added Scrub site option (scrub rules to add/remove for a site)
+#   -Added IncrementalDownloads and IncrementalOverlap options
+#   -Added FitidFilter and FitidKeepDays options
+#   -Added Compress site option
+#   -Added ConnectTimeout and ReadTimeout site options
 
-import os, glob, re, random
+import os, glob, re, random, threading, cPickle
 from rlib1 import *
 from control2 import *
 
+_snapVersion = 4        #bump when the parsed layout changes, so old snapshots are ignored
+
+def _yes(value):
+    return (value[:1].upper() == 'Y')
+
+def _atLeast1(value):
+    return max(1, int2(value))
+
+def _text(value):
+    return value
+
+#int2 and float2 are looked up when called: rlib1 may still be loading when this module is imported
+def _int(value):
+    return int2(value)
+
+def _float(value):
+    return float2(value)
+
+#site fields: FIELD: conversion
+_siteFields = {
+    'SITENAME': str.upper, 'ACCTTYPE': _text, 'FIORG': _text, 'FID': _text, 'URL': _text,
+    'BANKID': _text, 'BROKERID': _text, 'OFXVER': _text, 'APPID': _text, 'APPVER': _text,
+    'MININTERVAL': int, 'TIMEOFFSET': float, 'SCRUB': _text, 'COMPRESS': _yes,
+    'CONNECTTIMEOUT': float, 'READTIMEOUT': float }
+
+#global options: FIELD: (site_cfg attribute, conversion)
+_options = {
+    'DEFAULTINTERVAL':     ('defaultInterval', _int),
+    'PROMPTINTERVAL':      ('promptInterval', _yes),
+    'SAVETICKERSFIRST':    ('savetickersfirst', _yes),
+    'SAVEQUOTEHISTORY':    ('savequotehistory', _yes),
+    'SHOWQUOTEHTM':        ('showquotehtm', _yes),
+    'ASKQUOTEHTM':         ('askquotehtm', _yes),
+    'ENABLEYAHOOFINANCE':  ('enableYahooFinance', _yes),
+    'ENABLEYAHOOSCRAPE':   ('enableYahooScrape', _yes),
+    'ENABLEGOOGLEFINANCE': ('enableGoogleFinance', _yes),
+    'YAHOOURL':            ('YahooURL', _text),
+    'YAHOOTIMEZONE':       ('YahooTimeZone', _text),
+    'QUOTECURRENCY':       ('quotecurrency', _text),
+    'CLIENTUID':           ('clientuid', _text),
+    'COMBINEOFX':          ('combineofx', _yes),
+    'QUIETSCRUB':          ('quietScrub', _yes),
+    'FORCEQUOTES':         ('forceQuotes', _yes),
+    'QUOTEACCOUNT':        ('quoteAccount', _text),
+    'DOWNLOADWORKERS':     ('downloadWorkers', _atLeast1),
+    'MAXPERHOST':          ('maxPerHost', _atLeast1),
+    'ASYNCDOWNLOADS':      ('asyncDownloads', _yes),
+    'QUOTEWORKERS':        ('quoteWorkers', _atLeast1),
+    'QUOTERATE':           ('quoteRate', _float),
+    'YAHOOBATCHSIZE':      ('yahooBatchSize', _int),
+    'QUOTECACHETTL':       ('quoteCacheTTL', _float),
+    'INCREMENTALDOWNLOADS':('incrementalDownloads', _yes),
+    'INCREMENTALOVERLAP':  ('incrementalOverlap', _int),
+    'FITIDFILTER':         ('fitidFilter', _yes),
+    'FITIDKEEPDAYS':       ('fitidKeepDays', _int) }
+
+parseCount = 0          #number of times sites.dat has been parsed by this process
+_shared = None          #site_cfg object returned by shared_cfg()
+_sharedStamp = None     #(mtime, size) of sites.dat when _shared was built
+_sharedLock = threading.Lock()
+
+def _datStamp(datfile):
+    try:
+        st = os.stat(datfile)
+        return (st.st_mtime, st.st_size)
+    except OSError:
+        return None
+
+def shared_cfg():
+    #return the process-wide site_cfg object.  It is built on first use, and rebuilt only if
+    #sites.dat has changed (mtime or size) since it was last read.  Treat it as read-only.
+    global _shared, _sharedStamp
+    _sharedLock.acquire()
+    try:
+        if _shared is None or _datStamp(_shared.datfile) <> _sharedStamp:
+            _shared = site_cfg()
+            _sharedStamp = _datStamp(_shared.datfile)   #after load_cfg(), which may append a ClientUID
+        return _shared
+    finally:
+        _sharedLock.release()
+
 class site_cfg:
     """read-in site and ticker data from sites.dat and define the data structures used by ofx.py"""
     
@@ -77,6 +172,7 @@ class site_cfg:
         self.datfile= 'sites.dat'
         self.bakfile= 'sites.bak'
         self.tmplfile = 'sites.template'
+        self.snapfile = 'sites.snap'    #parsed copy of sites.dat
         self.savetickersfirst = False
         self.savequotehistory = False
         self.showquotehtm = False
@@ -91,6 +187,17 @@ class site_cfg:
         self.quoteAccount = '0123456789'
         self.enableYahooFinance = True
         self.enableGoogleFinance = True
+        self.downloadWorkers = 1
+        self.maxPerHost = 2
+        self.asyncDownloads = False
+        self.quoteWorkers = 1
+        self.quoteRate = 10.0
+        self.yahooBatchSize = 50
+        self.quoteCacheTTL = 0
+        self.incrementalDownloads = False
+        self.incrementalOverlap = 2
+        self.fitidFilter = False
+        self.fitidKeepDays = 400
     
         if glob.glob(self.datfile) == []:
             if glob.glob(self.bakfile) <> []:
@@ -101,13 +208,14 @@ class site_cfg:
                 copy_txt_file(self.tmplfile, self.datfile)
 
         if glob.glob(self.datfile) <> []:
-            self.load_cfg()
+            if not self.load_snapshot():
+                self.load_cfg()
         
     def load_cfg(self):
         #read in sites.dat
-        self.load_sites()
-        self.load_stocks()
-        self.load_funds()
+        global parseCount
+        parseCount += 1
+        self.parse_dat()
         
         #sanity check: alternate Yahoo URL should only contain site address
         YAHOOURL = self.YahooURL.upper()
@@ -123,177 +231,108 @@ class site_cfg:
             f.write("\nClientUID: " + self.clientuid + "\n")
             f.close()
         
-    def load_sites(self):
+        self.save_snapshot()
+    
+    def _snapKey(self):
+        #a snapshot is only valid for the sites.dat it was built from, and for this parser
+        return (_snapVersion, DefaultAppID, DefaultAppVer, _datStamp(self.datfile))
+    
+    def load_snapshot(self):
+        #reuse the parsed contents of sites.dat saved by an earlier run, if sites.dat hasn't changed since
+        try:
+            f = open(self.snapfile, 'rb')
+            try:
+                key = cPickle.load(f)
+                if key <> self._snapKey(): return False
+                self.__dict__.update(cPickle.load(f))
+            finally:
+                f.close()
+        except Exception:
+            return False
+        return True
+    
+    def save_snapshot(self):
+        #save the parsed contents of sites.dat for the next run.  write to a temp file, so a reader
+        #never sees a partial snapshot
+        tmp = self.snapfile + '.tmp'
+        try:
+            f = open(tmp, 'wb')
+            cPickle.dump(self._snapKey(), f, 2)
+            cPickle.dump(self.__dict__, f, 2)
+            f.close()
+            if os.path.exists(self.snapfile): os.remove(self.snapfile)
+            os.rename(tmp, self.snapfile)
+        except Exception:
+            #not fatal.  we'll parse sites.dat again next time
+            if os.path.exists(tmp): os.remove(tmp)
+        
+    def parse_dat(self):
+        #read sites.dat in a single pass: <site> blocks, <stocks>, <funds> and global options
         f = open(self.datfile, 'r')
-        parsing = False
+        parsing = False         #inside a <site> block
+        inStocks = inFunds = False
+        site = None
 
-        #find each <site> entry and read-in the parameters
         for line in f:
-            line  = self.clean_line(line)    #remove comments, spaces, tabs, newlines, etc
+            i = line.find('#')
+            if i > -1: line = line[:i]
+            line = line.replace('\n','').replace('\t','').replace(',','').strip()
+            if not line: continue
             lineU = line.upper()
 
+            #stock and fund lists
+            if '<STOCKS>' in lineU: inStocks = True
+            elif '</STOCKS>' in lineU: inStocks = False
+            elif inStocks:
+                entry = self.parseTicker(lineU)
+                if entry['ticker'] <> "err":
+                    self.stocks.append(entry)
+
+            if '<FUNDS>' in lineU: inFunds = True
+            elif '</FUNDS>' in lineU: inFunds = False
+            elif inFunds:
+                entry = self.parseTicker(lineU)
+                if entry['ticker'] <> "err":
+                    self.funds.append(entry)
+
             #reset parameters between sites
             if not parsing:
-                sitename=''
-                accttype=''
-                fiorg=''
-                fid =''
-                url=''
-                bankid=''
-                brokerid=''
-                ofxver = '102'
-                appid  = DefaultAppID       #defined in control2.py
-                appver = DefaultAppVer
-                mininterval = 0
-                timeOffset = 0.0
+                site = {'SITENAME': '', 'ACCTTYPE': '', 'FIORG': '', 'FID': '', 'URL': '',
+                        'BANKID': '', 'BROKERID': '', 'OFXVER': '102', 
+                        'APPID': DefaultAppID, 'APPVER': DefaultAppVer,   #defined in control2.py
+                        'MININTERVAL': 0, 'TIMEOFFSET': 0.0, 'SCRUB': '', 'COMPRESS': False,
+                        'CONNECTTIMEOUT': 0.0, 'READTIMEOUT': 0.0}
                 
             if '<SITE>' in lineU:
                 parsing = True
         
             if '</SITE>' in lineU:
                 parsing = False    #end parsing site
-                if sitename <> '' and url <> '':
-                    X = {sitename: {
-                               'CAPS': ['SIGNON', accttype],
-                              'FIORG': fiorg,
-                                'URL': url,
-                                'FID': fid, 
-                             'BANKID': bankid,
-                           'BROKERID': brokerid,
-                             'OFXVER': ofxver,
-                              'APPID': appid,
-                             'APPVER': appver,
-                        'MININTERVAL': mininterval,
-                         'TIMEOFFSET': timeOffset }}
-                    self.sites.update(X)
+                if site['SITENAME'] <> '' and site['URL'] <> '':
+                    site['CAPS'] = ['SIGNON', site.pop('ACCTTYPE')]
+                    self.sites[site.pop('SITENAME')] = site
                 
-            #parse the site parameters for the current site
-            field = self.get_fieldname(line).upper()
-            value = self.get_paramval(line)
+            #field : value pair
+            i = line.find(':')
+            field = lineU[:i].strip()
+            value = line[i+1:].strip()
 
             if value:
                 if parsing:
-                    if field == 'SITENAME': sitename = value.upper()
-                    elif field == 'ACCTTYPE': accttype = value
-                    elif field == 'FIORG': fiorg = value
-                    elif field == 'FID': fid = value
-                    elif field == 'URL': url = value
-                    elif field == 'BANKID': bankid = value
-                    elif field == 'BROKERID': brokerid = value
-                    elif field == 'OFXVER': ofxver = value
-                    elif field == 'APPID': appid = value
-                    elif field == 'APPVER': appver = value
-                    elif field == 'MININTERVAL': mininterval = int(value)
-                    elif field == 'TIMEOFFSET': timeOffset = float(value)
-                
-                else:
+                    if field in _siteFields:
+                        site[field] = _siteFields[field](value)
+                elif field in _options:
                     #look for individual parameters while we're NOT parsing site info
-                    if field == 'DEFAULTINTERVAL':
-                        self.defaultInterval = int2(value)
-                    
-                    if field == 'PROMPTINTERVAL':
-                        self.promptInterval = (value[:1].upper() == 'Y')
-                        
-                    if field == 'SAVETICKERSFIRST':
-                        self.savetickersfirst = (value[:1].upper() == 'Y')
-
-                    if field == 'SAVEQUOTEHISTORY':
-                        self.savequotehistory = (value[:1].upper() == 'Y')
-                    
-                    if field == 'SHOWQUOTEHTM':
-                        self.showquotehtm = (value[:1].upper() == 'Y')
-                    
-                    if field == 'ASKQUOTEHTM':
-                        self.askquotehtm = (value[:1].upper() == 'Y')
-
-                    if field == 'ENABLEYAHOOFINANCE':
-                        self.enableYahooFinance = (value[:1].upper() == 'Y')
-                        
-                    if field == 'ENABLEYAHOOSCRAPE':
-                        self.enableYahooScrape = (value[:1].upper() == 'Y')
-                    
-                    if field == 'ENABLEGOOGLEFINANCE':
-                        self.enableGoogleFinance = (value[:1].upper() == 'Y')
-                                        
-                    if field == 'YAHOOURL':
-                        self.YahooURL = value
-                    
-                    if field == 'YAHOOTIMEZONE':
-                        self.YahooTimeZone = value
-                        
-                    if field == 'QUOTECURRENCY':
-                        self.quotecurrency = value
-                        
-                    if field == 'CLIENTUID':
-                        self.clientuid = value
-            
-                    if field == 'COMBINEOFX':
-                        self.combineofx = (value[:1].upper() == 'Y')
-                        
-                    if field == 'QUIETSCRUB':
-                        self.quietScrub = (value[:1].upper() == 'Y')
-                        
-                    if field == 'FORCEQUOTES':
-                        self.forceQuotes = (value[:1].upper() == 'Y')
-            
-                    if field == 'QUOTEACCOUNT':
-                        self.quoteAccount = value
+                    attr, conv = _options[field]
+                    setattr(self, attr, conv(value))
            
-           #end_for line
+        #end_for line
         
         f.close()
         
         if self.askquotehtm: self.showquotehtm = False  #can't have both.  Asking overrides "always"
         
         return
-        
-    def load_stocks(self):
-        f = open(self.datfile, 'r')
-        parsing = False
-
-        #find each stock entry and read-in the parameters
-        for line in f:
-            line = line.upper()
-            line = self.clean_line(line)
-            
-            if '<STOCKS>' in line:
-                parsing = True
-        
-            elif '</STOCKS>' in line:
-                parsing = False
-                
-            elif parsing and len(line) > 0:
-                entry = self.parseTicker(line)
-                if entry['ticker'] <> "err":
-                    self.stocks.append(entry)
-        #end_for    
-        
-        f.close()
-        return
-        
-    def load_funds(self):
-        f = open(self.datfile, 'r')
-        parsing = False
-
-        #find each stock entry and read-in the parameters
-        for line in f:
-            line = line.upper()
-            line = self.clean_line(line)
-            
-            if '<FUNDS>' in line:
-                parsing = True
-        
-            elif '</FUNDS>' in line:
-                parsing = False
-                
-            elif parsing and len(line) > 0:
-                entry = self.parseTicker(line)
-                if entry['ticker']  <> "err":
-                    self.funds.append(entry)
-        #end_for    
-        
-        f.close()
-        return
     
     def parseTicker(self, line):
         t = re.compile("(.+?) ")        #ticker symbol is first option
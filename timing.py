@@ -0,0 +1,134 @@
+# timing.py
+# http://sites.google.com/site/pocketsense/
+# time spent (and bytes handled) in each phase of a Getdata run, saved as JSON and as a Prometheus textfile
+# Intial version: nt: Oct-2026
+
+# Notes
+# -----
+#   - Each unit of work (an account download, the quotes, the combined file) keeps a Phases list.
+#     Downloads record: setup, connect (TCP), tls, send, wait (server), read, acctid, validate,
+#     scrub, fitid, write, and total.  Quotes record fetch, statement, htm and total.  combineOfx
+#     records split and write.
+#   - Finished units are added to run, and run.save() writes timingJsonFile and timingPromFile
+#     (control2.py) at the end of Getdata.py.  Both files are replaced, not appended to.
+#   - Point the node_exporter textfile collector at the directory holding timingPromFile to
+#     graph the nightly runs.  Only the last 4 characters of an account# (and a short hash of it,
+#     to keep the labels unique) are used in either file.
+#   - Safe to use from several download threads.
+
+import os, time, json, hashlib, threading
+from control2 import *
+
+class Phases:
+    """Timings for one unit of work"""
+
+    def __init__(self, site, acct=''):
+        self.site = site
+        self.acct = acct
+        self.phases = []        #[(phase, secs, bytes), ...] in the order they finished
+
+    def add(self, phase, started, nbytes=0):
+        #record phase as running from started to now.  returns now, to start the next phase
+        now = time.time()
+        self.phases.append((phase, now - started, nbytes))
+        return now
+
+    def addSecs(self, phase, secs, nbytes=0):
+        #record a phase timed elsewhere
+        self.phases.append((phase, secs, nbytes))
+
+    def label(self):
+        #account# is shortened to its last 4 characters, plus a hash of the full account#, so two
+        #accounts at a site that end the same way still get their own label
+        if not self.acct: return self.site
+        tag = hashlib.sha1(self.site + ':' + self.acct).hexdigest()[:6]
+        if len(self.acct) > 4: return self.site + ':..' + self.acct[-4:] + '#' + tag
+        return self.site + ':' + self.acct + '#' + tag
+
+class RunTimings:
+    """Every unit timed by this process"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.units = []
+        self.lock = threading.Lock()
+
+    def add(self, phases):
+        self.lock.acquire()
+        try:
+            self.units.append(phases)
+        finally:
+            self.lock.release()
+
+    def summary(self):
+        #return the run as a dict: totals by phase, by site, and for each unit
+        byPhase = {}
+        bySite = {}
+        units = []
+        self.lock.acquire()
+        try:
+            for u in self.units:
+                entry = {}
+                for phase, secs, nbytes in u.phases:
+                    for d in (byPhase, bySite.setdefault(u.site, {}), entry):
+                        t = d.setdefault(phase, {'seconds': 0.0, 'bytes': 0, 'count': 0})
+                        t['seconds'] += secs
+                        t['bytes'] += nbytes
+                        t['count'] += 1
+                units.append({'unit': u.label(), 'site': u.site, 'phases': entry})
+        finally:
+            self.lock.release()
+        return {'started': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                'seconds': time.time() - self.started,
+                'phases': byPhase, 'sites': bySite, 'units': units}
+
+    def prometheus(self, summary):
+        #return summary in the Prometheus text exposition format
+        lines = ['# HELP pocketsense_run_seconds Duration of the last Getdata run.',
+                 '# TYPE pocketsense_run_seconds gauge',
+                 'pocketsense_run_seconds %.6f' % summary['seconds'],
+                 '# HELP pocketsense_run_timestamp_seconds Start time of the last Getdata run.',
+                 '# TYPE pocketsense_run_timestamp_seconds gauge',
+                 'pocketsense_run_timestamp_seconds %d' % self.started]
+        for metric, field, fmt, text in [
+                ('pocketsense_phase_seconds', 'seconds', '%.6f', 'Time spent in each phase, per unit, in the last run.'),
+                ('pocketsense_phase_bytes', 'bytes', '%d', 'Bytes handled in each phase, per unit, in the last run.')]:
+            lines.append('# HELP ' + metric + ' ' + text)
+            lines.append('# TYPE ' + metric + ' gauge')
+            #a unit timed twice (e.g., an account listed twice) is summed: the textfile collector
+            #rejects a file with duplicate series
+            series = {}
+            for u in summary['units']:
+                for phase in u['phases']:
+                    key = (u['site'], u['unit'], phase)
+                    series[key] = series.get(key, 0) + u['phases'][phase][field]
+            for site, unit, phase in sorted(series):
+                labels = 'site="%s",unit="%s",phase="%s"' % (_escape(site), _escape(unit), _escape(phase))
+                lines.append(metric + '{' + labels + '} ' + fmt % series[(site, unit, phase)])
+        return '\n'.join(lines) + '\n'
+
+    def save(self, jsonFile=timingJsonFile, promFile=timingPromFile):
+        #write the JSON summary and the Prometheus textfile.  returns the summary
+        summary = self.summary()
+        _replace(jsonFile, json.dumps(summary, indent=1, sort_keys=True))
+        _replace(promFile, self.prometheus(summary))
+        return summary
+
+def _escape(value):
+    #prometheus label value
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _replace(filename, text):
+    #write to a temp file and rename it, so a reader (e.g., node_exporter) never sees a partial file
+    tmp = filename + '.tmp'
+    try:
+        f = open(tmp, 'w')
+        f.write(text)
+        f.close()
+        if os.path.exists(filename): os.remove(filename)
+        os.rename(tmp, filename)
+    except Exception as inst:
+        print "** Could not save", filename, ":", inst
+
+#process-wide run
+run = RunTimings()